@@ -1,4 +1,46 @@
-import json
+from .serialization import dumps
+import functools
+import weakref
+
+# Attributes used for bookkeeping of the serialization cache, which never invalidate it
+_CACHE_ATTRIBUTES = ('_dict_cache', '_json_cache', '_parents')
+
+
+def _cached_to_dict(to_dict):
+    """
+    Wrap a `to_dict` method so that its result is reused until the object, or one of the
+    objects it contains, changes
+    """
+    @functools.wraps(to_dict)
+    def wrapper(self):
+        # Only the most derived `to_dict` is cached, so that subclasses calling
+        # `super().to_dict()` do not share a cache entry with their parent class
+        if not BaseObject._cache_enabled or type(self).to_dict is not wrapper:
+            return to_dict(self)
+        cached = self._get_cache('_dict_cache')
+        if cached is None:
+            self._adopt_children()
+            cached = to_dict(self)
+            object.__setattr__(
+                self, '_dict_cache', (BaseObject._cache_epoch, cached))
+        return cached
+    return wrapper
+
+
+def _contained(value):
+    """
+    Yield the objects held by a value, directly or at any depth of nested lists, tuples, and
+    dictionary values
+    """
+    pending = [value]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, BaseObject):
+            yield value
+        elif isinstance(value, (list, tuple)):
+            pending.extend(value)
+        elif isinstance(value, dict):
+            pending.extend(value.values())
 
 
 class BaseObject:
@@ -6,19 +48,144 @@ class BaseObject:
     Base class used for all other classes within the aisquared package. This class is not meant
     to be used by any end user of this package, but is rather used throughout this package as a
     parent class.
+
+    Serialization can optionally be cached with `BaseObject.enable_cache()`. When enabled, the
+    results of `to_dict` and `to_json` are reused until an attribute of the object, or of any
+    object it contains, is set. Lists held by an object should then be replaced rather than
+    mutated in place, or `invalidate` should be called after mutating them. Dictionaries
+    returned by `to_dict` are shared with the cache and should not be modified.
     """
 
+    _cache_enabled = False
+
+    # Incremented whenever caching is enabled, so that entries cached before caching was last
+    # disabled, which changes made meanwhile did not invalidate, are never reused
+    _cache_epoch = 0
+
     def __init__(self):
         pass
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if 'to_dict' in cls.__dict__:
+            cls.to_dict = _cached_to_dict(cls.__dict__['to_dict'])
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        # Nothing is cached while caching is disabled, so there is nothing to invalidate
+        if BaseObject._cache_enabled and name not in _CACHE_ATTRIBUTES:
+            self.invalidate()
+
+    def __getstate__(self):
+        return {
+            k: v for k, v in self.__dict__.items() if k not in _CACHE_ATTRIBUTES
+        }
+
+    @classmethod
+    def enable_cache(cls, enabled: bool = True) -> None:
+        """
+        Enable or disable caching of `to_dict` and `to_json` for all objects
+
+        Parameters
+        ----------
+        enabled : bool (default True)
+            Whether serialization should be cached
+        """
+        if not isinstance(enabled, bool):
+            raise TypeError('enabled must be bool')
+        if enabled and not BaseObject._cache_enabled:
+            BaseObject._cache_epoch += 1
+        BaseObject._cache_enabled = enabled
+
+    def _get_cache(self, name: str):
+        """
+        Get a cached value, if it was cached since caching was last enabled
+        """
+        entry = self.__dict__.get(name)
+        if entry is None or entry[0] != BaseObject._cache_epoch:
+            return None
+        return entry[1]
+
+    def _adopt_children(self, seen: set = None) -> None:
+        """
+        Register this object as a parent of the objects it contains, directly or inside nested
+        lists, tuples, and dictionaries, and those objects as parents of the objects they
+        contain, so that changing any of them invalidates this object. Parents are only
+        registered when a serialization is cached, so that setting attributes costs nothing
+        while caching is disabled
+        """
+        seen = set() if seen is None else seen
+        if id(self) in seen:
+            return
+        seen.add(id(self))
+        for name, value in self.__dict__.items():
+            if name in _CACHE_ATTRIBUTES:
+                continue
+            for child in _contained(value):
+                parents = child.__dict__.get('_parents')
+                if parents is None:
+                    parents = weakref.WeakSet()
+                    object.__setattr__(child, '_parents', parents)
+                parents.add(self)
+                # Objects with a current cache registered their own children when caching it
+                if child._get_cache('_dict_cache') is None:
+                    child._adopt_children(seen)
+
+    def invalidate(self) -> None:
+        """
+        Discard the cached serialization of this object and of every object containing it
+        """
+        pending, seen = [self], set()
+        while pending:
+            obj = pending.pop()
+            if id(obj) in seen:
+                continue
+            seen.add(id(obj))
+            object.__setattr__(obj, '_dict_cache', None)
+            object.__setattr__(obj, '_json_cache', None)
+            pending.extend(obj.__dict__.get('_parents') or [])
+
     def to_dict(self) -> dict:
         """
         Get the object as a dictionary
         """
         raise NotImplementedError
 
-    def to_json(self) -> str:
+    def get_archive_members(self) -> list:
+        """
+        Get the files, other than models, to be written into a compiled '.air' archive
+
+        Returns
+        -------
+        members : list
+            List of (archive name, source) or (archive name, source, compress) tuples, as
+            accepted by `AirWriter.write_members`
+        """
+        return []
+
+    def has_archive_members(self) -> bool:
+        """
+        Whether the object has files to be written into a compiled '.air' archive, checked
+        without reading or hashing them
+        """
+        return False
+
+    def to_json(self, compact: bool = False) -> str:
         """
         Return the object as a json string
+
+        Parameters
+        ----------
+        compact : bool (default False)
+            Whether to omit whitespace. Compact output uses the fastest installed JSON backend
         """
-        return json.dumps(self.to_dict())
+        if not BaseObject._cache_enabled:
+            return dumps(self.to_dict(), compact)
+        cached = self._get_cache('_json_cache')
+        if cached is None:
+            cached = {}
+            object.__setattr__(
+                self, '_json_cache', (BaseObject._cache_epoch, cached))
+        if compact not in cached:
+            cached[compact] = dumps(self.to_dict(), compact)
+        return cached[compact]
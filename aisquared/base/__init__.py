@@ -3,6 +3,7 @@ The aisquared.base package contains both some basic objects that are used across
 """
 
 from .BaseObject import BaseObject
+from .serialization import JSON_BACKENDS, get_available_json_backends, get_json_backend, set_json_backend
 from .rendering import LOCATIONS, COLORS, BADGES, WORD_LISTS, QUALIFIERS, POSITIONS, STATIC_POSITIONS
 from .stages import ALLOWED_STAGES
 from .harvesting import ALLOWED_INPUT_TYPES, ALLOWED_HOWS
@@ -0,0 +1,146 @@
+"""
+Helpers shared by the binary formats of vocabularies and lookup tables.
+
+Both formats start with a fixed-size header followed by sections which are each aligned to
+`ALIGNMENT` bytes, so that every section can be memory-mapped as a numpy array. Keys are stored
+as a sorted array of fixed-width UTF-8 strings and are found with a vectorized binary search.
+"""
+
+import numpy as np
+import hashlib
+
+ALIGNMENT = 32
+CHUNK_SIZE = 1024 ** 2
+
+
+def aligned(offset: int) -> int:
+    """
+    Round an offset up to the next multiple of `ALIGNMENT`
+    """
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def section_offsets(header_size: int, sizes: list) -> list:
+    """
+    Get the offset of each section following a header, given the size of each section in bytes
+
+    Parameters
+    ----------
+    header_size : int
+        The size of the header in bytes
+    sizes : list of int
+        The size of each section in bytes. The size of the last section is not needed to place
+        it, so only the sizes of the sections before it may be given
+
+    Returns
+    -------
+    offsets : list
+        The aligned offset of each section, one more than the number of sizes given
+    """
+    offsets = [aligned(header_size)]
+    for size in sizes:
+        offsets.append(aligned(offsets[-1] + size))
+    return offsets
+
+
+def pack_sections(header: bytes, sections: list) -> bytes:
+    """
+    Join a header and its sections, padding each section to its aligned offset
+
+    Parameters
+    ----------
+    header : bytes
+        The packed header
+    sections : list of bytes-like
+        The sections, in order
+    """
+    parts = [header]
+    position = len(header)
+    for section in sections:
+        start = aligned(position)
+        parts.extend([b'\0' * (start - position), section])
+        position = start + memoryview(section).nbytes
+    return b''.join(parts)
+
+
+def has_magic(path: str, magic: bytes) -> bool:
+    """
+    Check whether a file starts with the given magic bytes
+    """
+    with open(path, 'rb') as f:
+        return f.read(len(magic)) == magic
+
+
+def encode_strings(strings: np.ndarray) -> np.ndarray:
+    """
+    Encode an array of strings as UTF-8, using a direct cast when every string is ASCII
+    """
+    try:
+        return strings.astype(f'S{max(strings.dtype.itemsize // 4, 1)}')
+    except UnicodeEncodeError:
+        return np.char.encode(strings, 'utf-8')
+
+
+def is_sorted_unique(keys: np.ndarray) -> bool:
+    """
+    Check whether an array of keys is sorted, without repeated keys
+    """
+    return keys.size < 2 or bool((keys[1:] > keys[:-1]).all())
+
+
+def sort_keys(strings: np.ndarray) -> tuple:
+    """
+    Encode an array of strings as UTF-8 keys and sort them
+
+    Parameters
+    ----------
+    strings : np.ndarray
+        Array of strings
+
+    Returns
+    -------
+    keys : np.ndarray
+        The sorted, fixed-width bytes array of encoded keys. Keys which are equal once encoded
+        are kept, and can be detected with `is_sorted_unique`
+    order : np.ndarray
+        The position in `strings` of each key
+    """
+    keys = encode_strings(strings)
+    order = np.argsort(keys, kind='stable')
+    return keys[order], order
+
+
+def search_keys(keys: np.ndarray, strings: np.ndarray) -> np.ndarray:
+    """
+    Find strings in a sorted array of keys
+
+    Parameters
+    ----------
+    keys : np.ndarray
+        Sorted, non-empty, fixed-width bytes array of UTF-8 encoded keys
+    strings : np.ndarray
+        Array of strings to find
+
+    Returns
+    -------
+    positions : np.ndarray
+        The position of each string in `keys`, or -1 for strings which are not in `keys`
+    """
+    encoded = encode_strings(strings)
+    # Strings are searched for after being cut to the stored width, so matches are confirmed
+    # against the full string
+    positions = np.searchsorted(keys, encoded.astype(keys.dtype))
+    positions = np.minimum(positions, keys.size - 1)
+    return np.where(keys[positions] == encoded, positions, -1)
+
+
+def file_digest(path: str) -> str:
+    """
+    Get the SHA-256 digest of a file, read in chunks so that it is never held in memory as a
+    whole
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
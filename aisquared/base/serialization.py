@@ -0,0 +1,174 @@
+"""
+JSON serialization used when writing configurations.
+
+The fastest available encoder is used for compact output: orjson, then ujson, then the
+standard library. Non-compact output always uses the standard library, so that its
+formatting stays identical to `json.dumps`.
+
+Non-finite floats are written as `NaN`, `Infinity`, and `-Infinity` by every backend, as by
+`json.dumps`. orjson writes them as `null`, so objects containing them are left to the
+standard library.
+"""
+
+import json
+import math
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+JSON_BACKENDS = ['orjson', 'ujson', 'json']
+
+_backend = None
+
+
+def get_available_json_backends() -> list:
+    """
+    Get the names of all installed JSON backends, fastest first
+    """
+    available = {
+        'orjson': orjson is not None,
+        'ujson': ujson is not None,
+        'json': True
+    }
+    return [backend for backend in JSON_BACKENDS if available[backend]]
+
+
+def get_json_backend() -> str:
+    """
+    Get the name of the JSON backend used for compact serialization
+    """
+    if _backend is not None:
+        return _backend
+    return get_available_json_backends()[0]
+
+
+def set_json_backend(backend: str = None) -> None:
+    """
+    Set the JSON backend used for compact serialization
+
+    Parameters
+    ----------
+    backend : str or None (default None)
+        One of 'orjson', 'ujson', or 'json'. If None, the fastest installed backend is used
+    """
+    global _backend
+    if backend is not None:
+        if backend not in JSON_BACKENDS:
+            raise ValueError(
+                f'backend must be one of {JSON_BACKENDS} or None, got {backend}')
+        if backend not in get_available_json_backends():
+            raise ImportError(f'{backend} is not installed')
+    _backend = backend
+
+
+def _has_non_finite(obj) -> bool:
+    """
+    Check whether an object contains a NaN or infinite float at any depth
+    """
+    pending = [obj]
+    while pending:
+        obj = pending.pop()
+        if isinstance(obj, float):
+            if not math.isfinite(obj):
+                return True
+        elif isinstance(obj, (list, tuple)):
+            pending.extend(obj)
+        elif isinstance(obj, dict):
+            pending.extend(obj.values())
+    return False
+
+
+def _orjson_dumps(obj) -> bytes:
+    """
+    Serialize an object with orjson, unless it contains non-finite floats, which orjson would
+    write as `null`
+    """
+    data = orjson.dumps(obj)
+    # Non-finite floats can only be present where orjson wrote null
+    if b'null' in data and _has_non_finite(obj):
+        raise ValueError('non-finite floats are left to the standard library')
+    return data
+
+
+def dumpb(obj, compact: bool = False) -> bytes:
+    """
+    Serialize an object to UTF-8 encoded JSON
+
+    Parameters
+    ----------
+    obj : JSON-serializable object
+        The object to serialize
+    compact : bool (default False)
+        Whether to omit whitespace and use the fastest available backend
+    """
+    if compact:
+        backend = get_json_backend()
+        try:
+            if backend == 'orjson':
+                return _orjson_dumps(obj)
+            elif backend == 'ujson':
+                return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False).encode('utf-8')
+        except (TypeError, ValueError, OverflowError):
+            # Objects the fast encoders cannot handle, such as integers larger than 64 bits or
+            # non-finite floats, are left to the standard library
+            pass
+        return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return json.dumps(obj).encode('utf-8')
+
+
+def dumpb_each(objs) -> list:
+    """
+    Serialize each object of an iterable to compact UTF-8 encoded JSON, choosing the backend
+    once rather than once per object
+
+    Parameters
+    ----------
+    objs : iterable
+        The JSON-serializable objects to serialize
+    """
+    objs = list(objs)
+    if get_json_backend() == 'orjson':
+        try:
+            return list(map(_orjson_dumps, objs))
+        except (TypeError, ValueError):
+            pass
+    return [dumpb(obj, compact=True) for obj in objs]
+
+
+def dumps(obj, compact: bool = False) -> str:
+    """
+    Serialize an object to a JSON string
+
+    Parameters
+    ----------
+    obj : JSON-serializable object
+        The object to serialize
+    compact : bool (default False)
+        Whether to omit whitespace and use the fastest available backend
+    """
+    if not compact:
+        return json.dumps(obj)
+    return dumpb(obj, compact).decode('utf-8')
+
+
+def loads(data):
+    """
+    Deserialize JSON, using orjson if it is installed
+
+    Parameters
+    ----------
+    data : bytes, bytearray, memoryview, or str
+        The JSON to deserialize
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
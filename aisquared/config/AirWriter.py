@@ -0,0 +1,260 @@
+from typing import Union
+from aisquared.base.serialization import dumpb
+import zipfile
+import hashlib
+import shutil
+import os
+
+# Fixed timestamp for archive members, so that compiling the same configuration twice
+# produces byte-identical files
+_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+_CHUNK_SIZE = 1024 ** 2
+
+
+def _digest(source) -> str:
+    """
+    Get the SHA-256 digest of bytes, or of a file read in chunks
+    """
+    if isinstance(source, bytes):
+        return hashlib.sha256(source).hexdigest()
+    digest = hashlib.sha256()
+    with open(source, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AirWriter:
+    """
+    Streaming writer for '.air' archives
+
+    Configuration and model artifacts are written directly into the archive, without being
+    staged in a temporary directory first. The destination can be a filename or any writable
+    file object, including `io.BytesIO`.
+
+    Example usage:
+
+    >>> import io
+    >>> import aisquared
+    >>> buffer = io.BytesIO()
+    >>> with aisquared.config.AirWriter(buffer) as writer:
+    ...     writer.write_config(config.to_dict())
+    ...     writer.write_file('model.onnx')
+    """
+
+    def __init__(
+            self,
+            file,
+            compression_level: int = None
+    ):
+        """
+        Parameters
+        ----------
+        file : path-like or file-like
+            The filename or writable file object to write the archive to
+        compression_level : int or None (default None)
+            The deflate compression level, from 0 to 9. A level of 0 stores members without
+            compression. If None, the default deflate level is used
+        """
+        self.compression_level = compression_level
+        self._filename = os.fspath(file) if isinstance(
+            file, (str, os.PathLike)) else None
+        if self.compression_level == 0:
+            compression, compresslevel = zipfile.ZIP_STORED, None
+        else:
+            compression, compresslevel = zipfile.ZIP_DEFLATED, self.compression_level
+        self._compression = compression
+        self._zipfile = zipfile.ZipFile(
+            file,
+            'w',
+            compression=compression,
+            compresslevel=compresslevel
+        )
+        self._names = set()
+        # The source of each member written from a file or by `write_members`, either
+        # ('file', real path) or ('bytes', digest), to tell repeated members from collisions
+        self._sources = {}
+
+    @property
+    def compression_level(self):
+        return self._compression_level
+
+    @compression_level.setter
+    def compression_level(self, value):
+        if value is not None:
+            if not isinstance(value, int):
+                raise TypeError('compression_level must be int or None')
+            if value < 0 or value > 9:
+                raise ValueError('compression_level must be between 0 and 9')
+        self._compression_level = value
+
+    @property
+    def names(self) -> list:
+        """
+        The names of all members written to the archive
+        """
+        return self._zipfile.namelist()
+
+    def _zipinfo(self, arcname: str, is_dir: bool = False, compress: bool = True) -> zipfile.ZipInfo:
+        info = zipfile.ZipInfo(arcname, date_time=_DATE_TIME)
+        if is_dir:
+            info.external_attr = (0o40755 << 16) | 0x10
+        else:
+            info.external_attr = 0o644 << 16
+            info.compress_type = self._compression if compress else zipfile.ZIP_STORED
+        return info
+
+    def _add_name(self, arcname: str) -> bool:
+        if arcname in self._names:
+            return False
+        self._names.add(arcname)
+        return True
+
+    def _is_written(self, arcname: str, source) -> bool:
+        """
+        Get whether a member has already been written from the same file or identical data
+
+        Raises
+        ------
+        ValueError
+            If a different file or different data has already been written under `arcname`
+        """
+        if arcname not in self._names:
+            return False
+        if arcname in self._sources:
+            kind, written = self._sources[arcname]
+            if kind == 'file' and not isinstance(source, bytes) and written == os.path.realpath(source):
+                return True
+            if (written if kind == 'bytes' else _digest(written)) == _digest(source):
+                return True
+        raise ValueError(
+            f'{arcname} has already been written to the archive from a different source')
+
+    def write_bytes(self, arcname: str, data: Union[bytes, str], compress: bool = True) -> None:
+        """
+        Write in-memory data to the archive
+
+        Parameters
+        ----------
+        arcname : str
+            The name of the member within the archive
+        data : bytes or str
+            The data to write
+        compress : bool (default True)
+            Whether to compress the member. Uncompressed members can be memory-mapped
+            directly from the archive
+        """
+        if not self._add_name(arcname):
+            raise ValueError(f'{arcname} has already been written to the archive')
+        self._zipfile.writestr(self._zipinfo(arcname, compress=compress), data)
+
+    def write_config(self, config: dict, compact: bool = True) -> None:
+        """
+        Write a configuration dictionary to the archive as 'config.json'
+
+        Parameters
+        ----------
+        config : dict
+            The configuration dictionary
+        compact : bool (default True)
+            Whether to omit whitespace and use the fastest installed JSON backend
+        """
+        self.write_bytes('config.json', dumpb(config, compact))
+
+    def write_file(self, path: str, arcname: str = None, compress: bool = True) -> None:
+        """
+        Stream a file from disk into the archive
+
+        Parameters
+        ----------
+        path : path-like
+            The path of the file to write
+        arcname : str or None (default None)
+            The name of the member within the archive. If None, the base name of `path` is used.
+            A file which has already been written under the same name, or a file with the same
+            contents, is skipped
+        compress : bool (default True)
+            Whether to compress the member. Uncompressed members can be memory-mapped
+            directly from the archive
+
+        Raises
+        ------
+        ValueError
+            If a different file has already been written under the same name
+        """
+        if arcname is None:
+            arcname = os.path.basename(path)
+        if self._is_written(arcname, path):
+            return
+        self._add_name(arcname)
+        self._sources[arcname] = ('file', os.path.realpath(path))
+        force_zip64 = os.path.getsize(path) >= zipfile.ZIP64_LIMIT
+        with open(path, 'rb') as src, self._zipfile.open(self._zipinfo(arcname, compress=compress), 'w', force_zip64=force_zip64) as dest:
+            shutil.copyfileobj(src, dest, _CHUNK_SIZE)
+
+    def write_members(self, members: list) -> None:
+        """
+        Stream several files into the archive
+
+        Parameters
+        ----------
+        members : list
+            List of (archive name, source) or (archive name, source, compress) tuples, where
+            each source is a file path or bytes. Members repeating an earlier member with the
+            same name and contents are only written once
+
+        Raises
+        ------
+        ValueError
+            If different contents have already been written under the same name
+        """
+        for arcname, source, *compress in members:
+            compress = compress[0] if compress else True
+            if isinstance(source, bytes):
+                if not self._is_written(arcname, source):
+                    self.write_bytes(arcname, source, compress)
+                    self._sources[arcname] = ('bytes', _digest(source))
+            else:
+                self.write_file(source, arcname, compress)
+
+    def write_directory(self, path: str, arcname: str = None) -> None:
+        """
+        Stream the contents of a directory into the archive
+
+        Parameters
+        ----------
+        path : path-like
+            The path of the directory to write
+        arcname : str or None (default None)
+            The name of the directory within the archive. If None, the base name of `path` is used
+        """
+        if arcname is None:
+            arcname = os.path.basename(os.path.normpath(path))
+        arcname = arcname.replace(os.sep, '/').strip('/')
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            relative = os.path.relpath(root, path).replace(os.sep, '/')
+            member_dir = arcname if relative == '.' else f'{arcname}/{relative}'
+            if self._add_name(member_dir + '/'):
+                self._zipfile.writestr(
+                    self._zipinfo(member_dir + '/', is_dir=True), b'')
+            for f in sorted(files):
+                self.write_file(os.path.join(root, f), f'{member_dir}/{f}')
+
+    def close(self) -> None:
+        """
+        Finish writing the archive
+        """
+        self._zipfile.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        if exc_type is not None and self._filename is not None:
+            # Do not leave a partially written archive behind
+            try:
+                os.remove(self._filename)
+            except OSError:
+                pass
@@ -0,0 +1,209 @@
+from typing import Union
+import tensorflowjs as tfjs
+import tensorflow as tf
+import hashlib
+import shutil
+import json
+import uuid
+import os
+
+DEFAULT_MAX_SIZE = 2 * 1024 ** 3
+_CHUNK_SIZE = 1024 ** 2
+
+
+def _directory_size(path: str) -> int:
+    """
+    Get the total size, in bytes, of all files within a directory
+    """
+    size = 0
+    for root, _, files in os.walk(path):
+        for f in files:
+            try:
+                size += os.path.getsize(os.path.join(root, f))
+            except OSError:
+                pass
+    return size
+
+
+class BuildCache:
+    """
+    Content-addressed cache of converted TensorFlow.js models, shared across calls to
+    `ModelConfiguration.compile` and `GraphConfiguration.compile`
+
+    Entries are keyed by a hash of the model file contents, the quantization dtype map,
+    and the installed tensorflowjs version. On a cache hit the previously converted weight
+    shards are reused and the Keras model is never loaded. When the total size of the cache
+    exceeds `max_size`, the least recently used entries are evicted.
+
+    Example usage:
+
+    >>> import aisquared
+    >>> cache = aisquared.config.BuildCache('.air_cache', max_size=1024 ** 3)
+    >>> config.compile('my_model.air', cache_dir=cache)
+    """
+
+    def __init__(
+            self,
+            cache_dir: str,
+            max_size: int = DEFAULT_MAX_SIZE
+    ):
+        """
+        Parameters
+        ----------
+        cache_dir : path-like
+            Directory in which converted models are stored. Created if it does not exist
+        max_size : int or None (default 2 GiB)
+            The maximum total size of the cache, in bytes. If None, the cache is unbounded
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @property
+    def cache_dir(self):
+        return self._cache_dir
+
+    @cache_dir.setter
+    def cache_dir(self, value):
+        if not isinstance(value, (str, os.PathLike)):
+            raise TypeError('cache_dir must be path-like')
+        self._cache_dir = os.fspath(value)
+
+    @property
+    def max_size(self):
+        return self._max_size
+
+    @max_size.setter
+    def max_size(self, value):
+        if value is not None:
+            if not isinstance(value, int):
+                raise TypeError('max_size must be int or None')
+            if value <= 0:
+                raise ValueError('max_size must be greater than 0')
+        self._max_size = value
+
+    def key(self, filename: str, dtype_map: dict = None) -> str:
+        """
+        Get the cache key for a model file and quantization dtype map
+
+        Parameters
+        ----------
+        filename : path-like
+            The path to the Keras model file
+        dtype_map : dict or None (default None)
+            The quantization dtype map used for conversion
+        """
+        digest = hashlib.sha256()
+        with open(filename, 'rb') as f:
+            for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        digest.update(json.dumps(dtype_map, sort_keys=True).encode('utf-8'))
+        digest.update(tfjs.__version__.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> str:
+        """
+        Get the directory of a converted model, or None if it is not cached
+
+        Parameters
+        ----------
+        key : str
+            The cache key of the entry
+        """
+        entry = os.path.join(self.cache_dir, key)
+        if not os.path.isdir(entry):
+            return None
+
+        # Mark the entry as recently used
+        os.utime(entry)
+        return entry
+
+    def convert(self, filename: str, dtype_map: dict = None, evict: bool = True) -> str:
+        """
+        Get the directory of the converted TensorFlow.js model for a Keras model file,
+        converting and caching it if it is not already present
+
+        Parameters
+        ----------
+        filename : path-like
+            The path to the Keras model file
+        dtype_map : dict or None (default None)
+            The quantization dtype map to use for conversion
+        evict : bool (default True)
+            Whether to evict least recently used entries after storing a new entry. Builds
+            which convert several models before reading them back evict once at the end instead
+        """
+        key = self.key(filename, dtype_map)
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+
+        # Convert into a scratch directory first so that a partially written entry
+        # is never visible to concurrent builds
+        scratch = os.path.join(self.cache_dir, f'.{key}.{uuid.uuid4().hex}')
+        try:
+            model = tf.keras.models.load_model(filename)
+            tfjs.converters.save_keras_model(
+                model, scratch, quantization_dtype_map=dtype_map)
+            entry = os.path.join(self.cache_dir, key)
+            try:
+                os.rename(scratch, entry)
+            except OSError:
+                # Another build stored the same entry first
+                if not os.path.isdir(entry):
+                    raise
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+        if evict:
+            self.evict(keep=key)
+        return entry
+
+    def evict(self, keep: Union[str, list] = None) -> list:
+        """
+        Evict least recently used entries until the cache is no larger than `max_size`
+
+        Parameters
+        ----------
+        keep : str, list, or None (default None)
+            Key or keys of entries which should not be evicted
+
+        Returns
+        -------
+        evicted : list
+            The keys of all evicted entries
+        """
+        if self.max_size is None:
+            return []
+        if isinstance(keep, str):
+            keep = [keep]
+        keep = set(keep or [])
+
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            entry = os.path.join(self.cache_dir, key)
+            if key.startswith('.') or not os.path.isdir(entry):
+                continue
+            entries.append(
+                (os.path.getmtime(entry), key, _directory_size(entry)))
+
+        total = sum(size for _, _, size in entries)
+        evicted = []
+        for _, key, size in sorted(entries):
+            if total <= self.max_size:
+                break
+            if key in keep:
+                continue
+            shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+            total -= size
+            evicted.append(key)
+        return evicted
+
+    def clear(self) -> None:
+        """
+        Remove all entries from the cache
+        """
+        for key in os.listdir(self.cache_dir):
+            entry = os.path.join(self.cache_dir, key)
+            if os.path.isdir(entry):
+                shutil.rmtree(entry, ignore_errors=True)
@@ -1,11 +1,12 @@
 from typing import Union
-from aisquared.base import BaseObject, ALLOWED_STAGES
+from aisquared.base import BaseObject, ALLOWED_STAGES, HARVESTING_CLASSES, RENDERING_CLASSES, FEEDBACK_CLASSES
 from .CustomObject import CustomObject
-import tensorflowjs as tfjs
-import tensorflow as tf
-import shutil
-import json
-import os
+from .BuildCache import BuildCache
+from .AirWriter import AirWriter
+from .conversion import write_models, get_cache, get_dtype_map
+from .Pipeline import get_step_function, run_step
+from .scheduling import topological_order, critical_path, run_graph, pass_through
+import functools
 
 LOCAL_CLASSES = ['LocalModel', 'LocalAnalytic', 'CustomObject']
 
@@ -13,6 +14,21 @@ LOCAL_CLASSES = ['LocalModel', 'LocalAnalytic', 'CustomObject']
 class GraphConfiguration(BaseObject):
     """
     Configuration object for deploying a set of processing steps and/or analytics as a dependency graph
+
+    The graph is validated as nodes are added and again when it is compiled. It can also be run
+    in Python with `run`, which runs independent nodes concurrently, and analyzed with
+    `get_critical_path`, to measure and reduce the latency of graphs with several branches.
+
+    Example usage:
+
+    >>> import aisquared
+    >>> config = aisquared.config.GraphConfiguration('Graph')
+    >>> preprocesser_id = config.add_node(preprocesser)
+    >>> first_id = config.add_node(first_model, preprocesser_id)
+    >>> second_id = config.add_node(second_model, preprocesser_id)
+    >>> results, timings = config.run(X)
+    >>> config.get_critical_path(timings)
+    ([0, 2], 0.0871)
     """
 
     def __init__(
@@ -68,6 +84,8 @@ class GraphConfiguration(BaseObject):
         self.auto_run = auto_run
         self.documentation_link = documentation_link
         self.nodes = []
+        self._steps = []
+        self._archive_members = []
 
     # name
     @property
@@ -187,7 +205,7 @@ class GraphConfiguration(BaseObject):
             The step to add
         dependencies : int, list of int, or None
             The ids of nodes which must be run before the
-            added node
+            added node, which must already be in the graph
 
         Returns
         -------
@@ -203,25 +221,167 @@ class GraphConfiguration(BaseObject):
                     'dependencies must be integer or list of integers')
 
         id = len(self.nodes)
-        self.nodes.append(
+        existing = set([node['id'] for node in self.nodes])
+        for dependency in [dependencies] if isinstance(dependencies, int) else dependencies or []:
+            if dependency not in existing:
+                raise ValueError(
+                    f'Node {id} cannot depend on node {dependency}, which has not been added')
+        self.nodes = self.nodes + [
             {
                 'id': id,
                 'dependencies': dependencies,
                 'step': step.to_dict()
             }
-        )
+        ]
+        self._steps.append(step)
+        self._archive_members.extend(step.get_archive_members())
         return id
 
+    def validate(self) -> list:
+        """
+        Check that the nodes form a valid dependency graph
+
+        Returns
+        -------
+        order : list
+            The node ids in an order in which every node comes after its dependencies
+
+        Raises
+        ------
+        ValueError
+            If a node depends on a node which does not exist, or if the graph contains a cycle
+        """
+        return topological_order(self.nodes)
+
+    def get_critical_path(self, costs: dict = None) -> tuple:
+        """
+        Get the critical path of the graph, the chain of dependent nodes with the highest total
+        cost, which bounds the latency of the graph however many nodes run concurrently
+
+        Parameters
+        ----------
+        costs : dict or None (default None)
+            The cost of each node keyed by node id, such as the timings returned by `run`. If
+            None, every node costs 1 and the longest chain of nodes is returned
+
+        Returns
+        -------
+        path : list
+            The ids of the nodes on the critical path, in order
+        length : float
+            The total cost of the critical path
+        """
+        return critical_path(self.nodes, costs)
+
+    def _check_steps(self) -> None:
+        """
+        Check that the nodes still describe the steps added with `add_node`, which are the
+        steps run by `run`, so that a graph is never run differently from how it compiles
+        """
+        if len(self.nodes) != len(self._steps):
+            raise ValueError(
+                f'The graph has {len(self.nodes)} nodes but {len(self._steps)} steps were added with add_node')
+        for node_id, (node, step) in enumerate(zip(self.nodes, self._steps)):
+            if node['id'] != node_id or node['step'] != step.to_dict():
+                raise ValueError(
+                    f'Node {node_id} no longer matches the step added with add_node. Nodes and their steps must not be changed after being added')
+
+    def _get_node_function(self, node_id: int, executor: str):
+        step = self._steps[node_id]
+        if isinstance(step, CustomObject):
+            raise ValueError(
+                f'Node {node_id} is a CustomObject, so a function must be provided to run it')
+        if isinstance(step, HARVESTING_CLASSES + RENDERING_CLASSES + FEEDBACK_CLASSES):
+            return pass_through
+        try:
+            function = get_step_function(step)
+        except TypeError:
+            raise ValueError(
+                f'Node {node_id} cannot be run in Python, so a function must be provided to run it')
+        if executor == 'process':
+            # Closures cannot be pickled, so each process compiles the step itself
+            return functools.partial(run_step, step)
+        return function
+
+    def run(self, inputs, workers: int = None, executor: str = 'thread', functions: dict = None, costs: dict = None) -> tuple:
+        """
+        Run the graph in Python, running each node as soon as all of its dependencies have
+        finished, so that independent branches run concurrently
+
+        A node without dependencies is passed `inputs`, a node with one dependency is passed
+        its result, and a node with several dependencies is passed a list of their results.
+        Preprocessing, DeployedModel, LocalModel, OnnxModel, LocalAnalytic, and postprocessing
+        steps are run as with `ModelConfiguration.run`, while harvesting, rendering, and
+        feedback steps pass their inputs through unchanged
+
+        Parameters
+        ----------
+        inputs : any
+            The inputs to the nodes without dependencies
+        workers : int or None (default None)
+            The maximum number of nodes to run at once
+        executor : str (default 'thread')
+            Either 'thread', to run nodes in a thread pool, passing results between nodes
+            without copying them, or 'process', to run nodes in a pool of processes, passing
+            results between nodes by pickling them
+        functions : dict or None (default None)
+            Functions to run instead of the steps of some nodes, keyed by node id. Required for
+            nodes which cannot be run in Python, such as CustomObject or deployed analytics
+        costs : dict or None (default None)
+            The expected cost of each node keyed by node id, such as the timings of a previous
+            run, used to start nodes on the critical path first
+
+        Returns
+        -------
+        results : dict
+            The result of each node, keyed by node id
+        timings : dict
+            The number of seconds each node took to run, keyed by node id
+
+        Raises
+        ------
+        ValueError
+            If the graph is not valid, or if `nodes` or any step was changed after being added
+        """
+        self.validate()
+        self._check_steps()
+        functions = dict(functions or {})
+        for node in self.nodes:
+            if node['id'] not in functions:
+                functions[node['id']] = self._get_node_function(
+                    node['id'], executor)
+        return run_graph(self.nodes, functions, inputs, workers, executor, costs)
+
     def get_filenames(self) -> list:
         """
         Get filenames for all models in the configuration
         """
         filenames = []
         for node in self.nodes:
-            if node['step']['className'] in LOCAL_CLASSES:
+            # Binary lookup tables are written as archive members instead
+            if node['step']['className'] in LOCAL_CLASSES and not node['step']['params'].get('lookupFile'):
                 filenames.append(node['step']['params']['path'])
         return filenames
 
+    def get_archive_members(self) -> list:
+        """
+        Get the files, other than models, to be written into a compiled '.air' archive
+
+        Returns
+        -------
+        members : list
+            List of (archive name, source) or (archive name, source, compress) tuples, as
+            accepted by `AirWriter.write_members`
+        """
+        return list(self._archive_members)
+
+    def has_archive_members(self) -> bool:
+        """
+        Whether any node has files, other than models, to be written into a compiled '.air'
+        archive
+        """
+        return bool(self._archive_members)
+
     def to_dict(self) -> dict:
         """
         Get the object as a dictionary
@@ -244,50 +404,36 @@ class GraphConfiguration(BaseObject):
             'nodes': self.nodes
         }
 
-    def compile(self, filename: str = None, dtype: str = None) -> None:
+    def compile(self, filename: str = None, dtype: str = None, cache_dir: Union[str, BuildCache] = None, workers: int = None, compression_level: int = None) -> None:
         """
         Compile the object into a '.air' file, which can then be dragged and dropped into applications using the AI Squared JavaScript SDK
 
         Parameters
         ----------
-        filename : path-like or None (default None)
-            Filename to compile to. If None, defaults to '{NAME}.air', where {NAME} is the name of the analytic
+        filename : path-like, file-like, or None (default None)
+            Filename or writable file object to compile to. If None, defaults to '{NAME}.air', where {NAME} is the
+            name of the analytic
         dtype : str or None (default None)
             The datatype to use for the model weights when using a Keras model. If None, defaults to 'float32'
+        cache_dir : path-like, BuildCache, or None (default None)
+            If provided, the build cache to reuse converted Keras models from. Models which have not changed since
+            they were last converted are not reloaded
+        workers : int or None (default None)
+            The number of processes used to convert Keras models. Other model files are copied one after
+            another. If None or 1, Keras models are also converted one after another
+        compression_level : int or None (default None)
+            The deflate compression level of the archive, from 0 (no compression) to 9. If None, the default level is
+            used
         """
+        self.validate()
         if filename is None:
             filename = self.name + '.air'
 
-        if dtype is None:
-            dtype_map = None
-        else:
-            dtype_map = {dtype: '*'}
-
-        dirname = os.path.join('.', os.path.splitext(filename)[0])
-
-        # write the object as json config
-        os.makedirs(dirname, exist_ok=True)
-        with open(os.path.join(dirname, 'config.json'), 'w') as f:
-            json.dump(self.to_dict(), f)
-
-        # go through the files and copy them/make them tfjs files
-        filenames = self.get_filenames()
-        if len(filenames) != 0:
-            for f in filenames:
-                if os.path.splitext(f)[-1] in ['.h5', '.keras']:
-                    model = tf.keras.models.load_model(f)
-                    model_dir = os.path.join(dirname, os.path.split(f)[-1])
-                    tfjs.converters.save_keras_model(
-                        model, model_dir, quantization_dtype_map=dtype_map)
-                else:
-                    shutil.copy(f, dirname)
-
-        # go through the entire directory of dirname, grab all files, and make
-        # the archive file
-        shutil.make_archive(filename, 'zip', dirname)
-
-        # Move the archive file to just have .air
-        shutil.move(filename + '.zip', filename)
-
-        # Remove the temp directory
-        shutil.rmtree(dirname, ignore_errors=True)
+        dtype_map = get_dtype_map(dtype)
+        cache = get_cache(cache_dir)
+
+        # stream the config and the converted/copied model files into the archive
+        with AirWriter(filename, compression_level) as writer:
+            writer.write_config(self.to_dict())
+            write_models(writer, self.get_filenames(), dtype_map, cache, workers)
+            writer.write_members(self.get_archive_members())
@@ -1,10 +1,9 @@
 from typing import Union
 from aisquared.base import BaseObject, ALLOWED_STAGES, HARVESTING_CLASSES, PREPROCESSING_CLASSES, ANALYTIC_CLASSES, POSTPROCESSING_CLASSES, RENDERING_CLASSES, FEEDBACK_CLASSES, LOCAL_CLASSES
-import tensorflowjs as tfjs
-import tensorflow as tf
-import shutil
-import json
-import os
+from .BuildCache import BuildCache
+from .AirWriter import AirWriter
+from .conversion import write_models, get_cache, get_dtype_map
+from .Pipeline import Pipeline
 
 
 class ModelConfiguration(BaseObject):
@@ -419,34 +418,160 @@ class ModelConfiguration(BaseObject):
         Get filenames for all models in the configuration
         """
         filenames = []
-        if self.harvesting_steps is None or (isinstance(self.harvesting_steps, list) and all([val is None for val in self.harvesting_steps])):
-            harvesting_list = []
-        elif isinstance(self.harvesting_steps[0], list):
-            harvesting_list = [
-                h for harvester in self.harvesting_steps for h in harvester]
-        else:
-            harvesting_list = self.harvesting_steps
-        for harvester in harvesting_list:
+        for harvester in self._get_harvesting_list():
             if isinstance(harvester, ModelConfiguration):
                 filenames.extend(harvester.get_model_filenames())
 
-        if isinstance(self.analytic[0], ANALYTIC_CLASSES):
-            for a in self.analytic:
-                if isinstance(a, LOCAL_CLASSES):
-                    try:
-                        filenames.append(a.path)
-                    except Exception:
-                        pass
-        else:
-            for analytic in self.analytic:
-                for a in analytic:
-                    if isinstance(a, LOCAL_CLASSES):
-                        try:
-                            filenames.append(a.path)
-                        except Exception:
-                            pass
+        for a in self._get_analytic_list():
+            if isinstance(a, LOCAL_CLASSES) and not a.has_archive_members():
+                try:
+                    filenames.append(a.path)
+                except Exception:
+                    pass
         return [f for f in filenames if f is not None]
 
+    def _get_harvesting_list(self) -> list:
+        if self.harvesting_steps is None or (isinstance(self.harvesting_steps, list) and all([val is None for val in self.harvesting_steps])):
+            return []
+        elif isinstance(self.harvesting_steps[0], list):
+            return [h for harvester in self.harvesting_steps for h in harvester]
+        return self.harvesting_steps
+
+    def _get_preprocessing_list(self) -> list:
+        if self.preprocessing_steps is None:
+            return []
+        elif isinstance(self.preprocessing_steps[0], list):
+            return [p for preprocesser in self.preprocessing_steps for p in preprocesser]
+        return self.preprocessing_steps
+
+    def _get_analytic_list(self) -> list:
+        if self.analytic is None:
+            return []
+        elif isinstance(self.analytic[0], ANALYTIC_CLASSES):
+            return self.analytic
+        return [a for analytic in self.analytic for a in analytic]
+
+    def get_archive_members(self) -> list:
+        """
+        Get the files, other than models, to be written into a compiled '.air' archive
+
+        Returns
+        -------
+        members : list
+            List of (archive name, source) or (archive name, source, compress) tuples, as
+            accepted by `AirWriter.write_members`
+        """
+        members = []
+        for harvester in self._get_harvesting_list():
+            if isinstance(harvester, ModelConfiguration):
+                members.extend(harvester.get_archive_members())
+        for preprocesser in self._get_preprocessing_list():
+            members.extend(preprocesser.get_archive_members())
+        for a in self._get_analytic_list():
+            members.extend(a.get_archive_members())
+        return members
+
+    def has_archive_members(self) -> bool:
+        """
+        Whether any step has files, other than models, to be written into a compiled '.air'
+        archive, checked without reading or hashing them
+        """
+        harvesters = [h for h in self._get_harvesting_list()
+                      if isinstance(h, ModelConfiguration)]
+        steps = harvesters + self._get_preprocessing_list() + self._get_analytic_list()
+        return any(step.has_archive_members() for step in steps)
+
+    def optimize(self) -> list:
+        """
+        Optimize the steps of every preprocesser in place, so that the optimized steps are
+        written into the configuration
+
+        Returns
+        -------
+        changes : list
+            Descriptions of each change made
+        """
+        changes = []
+        for preprocesser in self._get_preprocessing_list():
+            for change in preprocesser.optimize():
+                changes.append(f'{type(preprocesser).__name__}: {change}')
+        return changes
+
+    def get_pipeline(self, sparse: bool = False) -> Pipeline:
+        """
+        Get a Pipeline which runs the preprocessing, analytic, and postprocessing steps of the
+        configuration in Python. Harvesting and rendering steps are not run
+
+        Only configurations with a single chain of steps, one DeployedModel, LocalModel,
+        OnnxModel, or LocalAnalytic analytic, and at most one postprocesser can be run
+
+        Parameters
+        ----------
+        sparse : bool (default False)
+            Whether the last preprocesser, which must then be a TabularPreprocesser, passes
+            its output to the analytic as a sparse matrix. See `Pipeline`
+        """
+        stages = (self.preprocessing_steps, self.analytic,
+                  self.postprocessing_steps)
+        if any([steps is not None and isinstance(steps[0], list) for steps in stages]):
+            raise ValueError(
+                'Only configurations with a single list of steps for each stage can be run')
+        if self.analytic is None or len(self.analytic) != 1:
+            raise ValueError(
+                'Only configurations with exactly one analytic can be run')
+        if self.postprocessing_steps is not None and len(self.postprocessing_steps) > 1:
+            raise ValueError(
+                'Only configurations with at most one postprocesser can be run')
+        return Pipeline(
+            self.preprocessing_steps,
+            self.analytic[0],
+            self.postprocessing_steps[0] if self.postprocessing_steps else None,
+            sparse
+        )
+
+    def run(self, inputs) -> tuple:
+        """
+        Run the configuration on a batch of inputs in Python, to check its outputs or measure
+        its throughput before it is compiled. See `get_pipeline`
+
+        Example usage:
+
+        >>> outputs, timings = config.run(X)
+
+        Parameters
+        ----------
+        inputs : array-like, pd.DataFrame, or list
+            Batch of inputs, as they would be harvested
+
+        Returns
+        -------
+        outputs : np.ndarray, list, or dict
+            The postprocessed outputs
+        timings : dict
+            The number of seconds spent in each of the 'preprocessing', 'analytic', and
+            'postprocessing' stages
+        """
+        return self.get_pipeline().run(inputs)
+
+    def run_batches(self, batches):
+        """
+        Run the configuration over an iterable of batches of inputs in Python, compiling the
+        preprocessing steps and loading the model only once. See `get_pipeline`
+
+        Parameters
+        ----------
+        batches : iterable
+            Iterable of batches of inputs, each of which is accepted by `run`
+
+        Yields
+        ------
+        outputs : np.ndarray, list, or dict
+            The postprocessed outputs of each batch
+        timings : dict
+            The number of seconds spent in each stage for each batch
+        """
+        return self.get_pipeline().run_batches(batches)
+
     def to_dict(self) -> dict:
         """
         Get the object as a dictionary
@@ -475,55 +600,37 @@ class ModelConfiguration(BaseObject):
             }
         }
 
-    def compile(self, filename: str = None, dtype: str = None) -> None:
+    def compile(self, filename: str = None, dtype: str = None, cache_dir: Union[str, BuildCache] = None, workers: int = None, compression_level: int = None) -> None:
         """
         Compile the object into a '.air' file, which can then be dragged and
         dropped into applications using the AI Squared JavaScript SDK
 
         Parameters
         ----------
-        filename : path-like or None (default None)
-            Filename to compile to. If None, defaults to '{NAME}.air', where {NAME} is the
-            name of the analytic
+        filename : path-like, file-like, or None (default None)
+            Filename or writable file object to compile to. If None, defaults to '{NAME}.air',
+            where {NAME} is the name of the analytic
         dtype : str or None (default None)
             The datatype to use for the model weights. If None, defaults to 'float32'
+        cache_dir : path-like, BuildCache, or None (default None)
+            If provided, the build cache to reuse converted Keras models from. Models which
+            have not changed since they were last converted are not reloaded
+        workers : int or None (default None)
+            The number of processes used to convert Keras models. Other model files are
+            copied one after another. If None or 1, Keras models are also converted one after
+            another
+        compression_level : int or None (default None)
+            The deflate compression level of the archive, from 0 (no compression) to 9. If None,
+            the default level is used
         """
         if filename is None:
             filename = self.name + '.air'
 
-        if dtype is None:
-            dtype_map = None
-        else:
-            dtype_map = {dtype: '*'}
-
-        dirname = os.path.join('.', os.path.splitext(filename)[0])
-
-        # write the object as json config
-        os.makedirs(dirname, exist_ok=True)
-        with open(os.path.join(dirname, 'config.json'), 'w') as f:
-            json.dump(self.to_dict(), f)
-
-        # go through the files and copy them/make them tfjs files
-        filenames = self.get_model_filenames()
-        if len(filenames) != 0:
-            for f in filenames:
-                if os.path.splitext(f)[-1] in ['.h5', '.keras']:
-                    model = tf.keras.models.load_model(f)
-                    model_dir = os.path.join(dirname, os.path.split(f)[-1])
-                    tfjs.converters.save_keras_model(
-                        model, model_dir, quantization_dtype_map=dtype_map)
-                else:
-                    if os.path.isdir(f):
-                        shutil.copytree(f, os.path.join(dirname, f))
-                    else:
-                        shutil.copy(f, dirname)
-
-        # go through the entire directory of dirname, grab all files, and make
-        # the archive file
-        shutil.make_archive(filename, 'zip', dirname)
-
-        # Move the archive file to just have .air
-        shutil.move(filename + '.zip', filename)
-
-        # Remove the temp directory
-        shutil.rmtree(dirname, ignore_errors=True)
+        dtype_map = get_dtype_map(dtype)
+        cache = get_cache(cache_dir)
+
+        # stream the config and the converted/copied model files into the archive
+        with AirWriter(filename, compression_level) as writer:
+            writer.write_config(self.to_dict())
+            write_models(writer, self.get_model_filenames(), dtype_map, cache, workers)
+            writer.write_members(self.get_archive_members())
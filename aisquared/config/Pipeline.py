@@ -0,0 +1,241 @@
+from aisquared.config.preprocessing.tabular import TabularPreprocesser
+from aisquared.config.preprocessing.image import ImagePreprocesser
+from aisquared.config.preprocessing.text import TextPreprocesser
+from aisquared.config.analytic import DeployedModel, LocalModel, OnnxModel, LocalAnalytic
+from aisquared.config.postprocessing import BinaryClassification, MulticlassClassification, ObjectDetection, Regression
+import time
+
+try:
+    import scipy.sparse
+except ImportError:
+    scipy = None
+
+ALLOWED_PREPROCESSERS = (
+    TabularPreprocesser,
+    ImagePreprocesser,
+    TextPreprocesser
+)
+
+ALLOWED_ANALYTICS = (
+    DeployedModel,
+    LocalModel,
+    OnnxModel,
+    LocalAnalytic
+)
+
+ALLOWED_POSTPROCESSERS = (
+    BinaryClassification,
+    MulticlassClassification,
+    ObjectDetection,
+    Regression
+)
+
+# Analytics which are passed sparse batches as they are. Other analytics are passed them densified
+SPARSE_ANALYTICS = (LocalModel,)
+
+STAGES = ('preprocessing', 'analytic', 'postprocessing')
+
+
+def to_dense(batch):
+    """
+    Densify a batch if it is a `scipy.sparse` matrix
+    """
+    if scipy is not None and scipy.sparse.issparse(batch):
+        return batch.toarray()
+    return batch
+
+
+def get_step_function(step, sparse: bool = False):
+    """
+    Get a function which runs a preprocessing, analytic, or postprocessing step on a batch.
+    Preprocessing steps are compiled into their execution plans once, when the function is
+    created
+
+    Parameters
+    ----------
+    step : Preprocessing, Analytic, or Postprocessing object
+        The step to run. Must be one of the allowed preprocessers, analytics, or
+        postprocessers
+    sparse : bool (default False)
+        Whether a TabularPreprocesser outputs `scipy.sparse.csr_matrix` batches, so that one
+        hot encoded columns are never expanded. Requires scipy
+
+    Returns
+    -------
+    function : callable
+        Function taking a batch and returning the output of the step
+    """
+    if isinstance(step, TabularPreprocesser):
+        # Tabular plans depend on the number of input columns
+        plans = {}
+
+        def preprocess(batch):
+            num_columns = batch.shape[-1] if hasattr(batch, 'shape') else len(batch[0])
+            if num_columns not in plans:
+                plans[num_columns] = step.get_plan(num_columns)
+            return plans[num_columns].transform(batch, sparse=sparse)
+        return preprocess
+
+    if isinstance(step, TextPreprocesser):
+        plan = step.get_plan()
+
+        def preprocess(batch):
+            batch = list(batch)
+            return next(plan.transform(batch, max(len(batch), 1)))
+        return preprocess
+
+    if isinstance(step, ImagePreprocesser):
+        return step.get_plan().transform
+
+    if isinstance(step, SPARSE_ANALYTICS):
+        return step.predict
+
+    if isinstance(step, ALLOWED_ANALYTICS):
+        def predict(batch):
+            return step.predict(to_dense(batch))
+        return predict
+
+    if isinstance(step, ObjectDetection):
+        def postprocess(outputs):
+            if isinstance(outputs, dict):
+                return step.transform(**outputs)
+            return step.transform(*outputs)
+        return postprocess
+
+    if isinstance(step, ALLOWED_POSTPROCESSERS):
+        return step.transform
+
+    raise TypeError(
+        f'step must be one of {ALLOWED_PREPROCESSERS + ALLOWED_ANALYTICS + ALLOWED_POSTPROCESSERS}')
+
+
+def run_step(step, batch):
+    """
+    Run a preprocessing, analytic, or postprocessing step on a batch. See `get_step_function`
+    """
+    return get_step_function(step)(batch)
+
+
+class Pipeline:
+    """
+    Batched execution of the preprocessing, analytic, and postprocessing steps of a
+    configuration in Python
+
+    Preprocessing steps are compiled into execution plans once, and models are loaded the first
+    time they are used and kept by their analytic objects, so that every batch after the first
+    only pays for the computation itself.
+
+    Example usage:
+
+    >>> import aisquared
+    >>> pipeline = aisquared.config.Pipeline(
+        [aisquared.config.preprocessing.tabular.TabularPreprocesser(...)],
+        aisquared.config.analytic.LocalModel('model.keras', 'tabular'),
+        aisquared.config.postprocessing.BinaryClassification(['no', 'yes'])
+    )
+    >>> outputs, timings = pipeline.run(X)
+    >>> timings
+    {'preprocessing': 0.0012, 'analytic': 0.0251, 'postprocessing': 0.0001}
+    """
+
+    def __init__(
+            self,
+            preprocessers: list,
+            analytic,
+            postprocesser=None,
+            sparse: bool = False
+    ):
+        """
+        Parameters
+        ----------
+        preprocessers : list
+            Preprocessers to apply in order. Custom preprocessers are not supported
+        analytic : DeployedModel, LocalModel, OnnxModel, or LocalAnalytic
+            The analytic to run on the preprocessed inputs
+        postprocesser : Postprocessing object or None (default None)
+            The postprocesser to apply to the analytic outputs
+        sparse : bool (default False)
+            Whether the last preprocesser, which must then be a TabularPreprocesser, outputs
+            `scipy.sparse.csr_matrix` batches. A LocalModel is passed them as sparse tensors,
+            so that wide one hot encoded columns are never expanded, while other analytics are
+            passed them densified. Requires scipy
+        """
+        preprocessers = list(preprocessers or [])
+        if not all([isinstance(p, ALLOWED_PREPROCESSERS) for p in preprocessers]):
+            raise TypeError(
+                f'Each preprocesser must be one of {ALLOWED_PREPROCESSERS}')
+        if not isinstance(analytic, ALLOWED_ANALYTICS):
+            raise TypeError(f'analytic must be one of {ALLOWED_ANALYTICS}')
+        if postprocesser is not None and not isinstance(postprocesser, ALLOWED_POSTPROCESSERS):
+            raise TypeError(
+                f'postprocesser must be None or one of {ALLOWED_POSTPROCESSERS}')
+        if sparse and not (preprocessers and isinstance(preprocessers[-1], TabularPreprocesser)):
+            raise ValueError(
+                'sparse can only be used when the last preprocesser is a TabularPreprocesser')
+        if sparse and scipy is None:
+            raise ImportError('scipy must be installed for sparse output')
+
+        self.preprocessers = preprocessers
+        self.analytic = analytic
+        self.postprocesser = postprocesser
+        self.sparse = sparse
+        self._preprocess_functions = [
+            get_step_function(p, sparse and i == len(preprocessers) - 1) for i, p in enumerate(preprocessers)]
+        self._analytic_function = get_step_function(analytic)
+        self._postprocess_function = None if postprocesser is None else get_step_function(
+            postprocesser)
+
+    def _preprocess(self, batch):
+        for function in self._preprocess_functions:
+            batch = function(batch)
+        return batch
+
+    def _postprocess(self, outputs):
+        if self._postprocess_function is None:
+            return outputs
+        return self._postprocess_function(outputs)
+
+    def run(self, batch) -> tuple:
+        """
+        Run the pipeline on a batch of inputs
+
+        Parameters
+        ----------
+        batch : array-like, pd.DataFrame, or list
+            Batch of inputs, as accepted by the first preprocesser, or by the analytic if
+            there are no preprocessers
+
+        Returns
+        -------
+        outputs : np.ndarray, list, or dict
+            The postprocessed outputs of the batch
+        timings : dict
+            The number of seconds spent in each of the 'preprocessing', 'analytic', and
+            'postprocessing' stages
+        """
+        functions = (self._preprocess, self._analytic_function, self._postprocess)
+        timings = {}
+        for stage, function in zip(STAGES, functions):
+            start = time.perf_counter()
+            batch = function(batch)
+            timings[stage] = time.perf_counter() - start
+        return batch, timings
+
+    def run_batches(self, batches):
+        """
+        Run the pipeline over an iterable of batches
+
+        Parameters
+        ----------
+        batches : iterable
+            Iterable of batches, each of which is accepted by `run`
+
+        Yields
+        ------
+        outputs : np.ndarray, list, or dict
+            The postprocessed outputs of each batch
+        timings : dict
+            The number of seconds spent in each stage for each batch
+        """
+        for batch in batches:
+            yield self.run(batch)
@@ -6,5 +6,9 @@ GitHub repository at https://github.com/AISquaredInc/airFiles
 """
 
 from .ModelConfiguration import ModelConfiguration
+from .Pipeline import Pipeline
 from .GraphConfiguration import GraphConfiguration
 from .CustomObject import CustomObject
+from .BuildCache import BuildCache
+from .AirWriter import AirWriter
+from .compile_many import compile_many
@@ -1,4 +1,5 @@
 from aisquared.base import BaseObject
+from .DeployedModelClient import DeployedModelClient
 
 
 class DeployedModel(BaseObject):
@@ -23,6 +24,9 @@ class DeployedModel(BaseObject):
     'bodySetupReplaceValue': None
     }}
 
+    In Python, the endpoint can be called with `get_client`, which returns a
+    `DeployedModelClient`, or with `predict`.
+
     """
 
     def __init__(
@@ -69,6 +73,7 @@ class DeployedModel(BaseObject):
     @url.setter
     def url(self, value):
         self._url = value
+        self._client = None
 
     @property
     def input_type(self):
@@ -85,6 +90,7 @@ class DeployedModel(BaseObject):
     @headers.setter
     def headers(self, value):
         self._headers = value
+        self._client = None
 
     @property
     def body_key(self):
@@ -93,6 +99,7 @@ class DeployedModel(BaseObject):
     @body_key.setter
     def body_key(self, value):
         self._body_key = value
+        self._client = None
 
     @property
     def return_key(self):
@@ -101,6 +108,7 @@ class DeployedModel(BaseObject):
     @return_key.setter
     def return_key(self, value):
         self._return_key = value
+        self._client = None
 
     @property
     def body_setup(self):
@@ -109,6 +117,7 @@ class DeployedModel(BaseObject):
     @body_setup.setter
     def body_setup(self, value):
         self._body_setup = value
+        self._client = None
 
     @property
     def body_setup_replace_value(self):
@@ -117,6 +126,33 @@ class DeployedModel(BaseObject):
     @body_setup_replace_value.setter
     def body_setup_replace_value(self, value):
         self._body_setup_replace_value = value
+        self._client = None
+
+    def get_client(self, batch_size: int = 1, concurrency: int = 4, timeout: float = 30) -> DeployedModelClient:
+        """
+        Get a client which calls the endpoint with pooled connections and bounded concurrency.
+        See `DeployedModelClient` for the parameters
+        """
+        return DeployedModelClient(self, batch_size, concurrency, timeout)
+
+    def predict(self, inputs) -> list:
+        """
+        Get the predictions of the endpoint for a batch of datapoints, using a client with the
+        default settings which is created the first time it is needed
+
+        Parameters
+        ----------
+        inputs : iterable
+            The datapoints to predict on
+
+        Returns
+        -------
+        predictions : list
+            The prediction of each datapoint, in order
+        """
+        if self._client is None:
+            self._client = self.get_client()
+        return self._client.predict(inputs)
 
     def to_dict(self) -> dict:
         """
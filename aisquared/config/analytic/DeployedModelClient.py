@@ -0,0 +1,320 @@
+from aisquared.base.serialization import dumpb, loads
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+import numpy as np
+import collections
+import threading
+import requests
+import time
+import uuid
+import json
+
+# Latency percentiles reported by `DeployedModelClient.stats`
+LATENCY_PERCENTILES = (50, 90, 95, 99)
+
+
+def _to_json(value):
+    """
+    Convert NumPy arrays and scalars in a datapoint to the equivalent Python values
+    """
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    if isinstance(value, dict):
+        return {k: _to_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(v) for v in value]
+    return value
+
+
+def _mark(value, replace_value, whole: str, part: str):
+    """
+    Replace the values of a body setup equal to the replace value with the `whole` placeholder,
+    and occurrences of a string replace value within longer strings with the `part` placeholder
+    """
+    if isinstance(value, dict):
+        return {k: _mark(v, replace_value, whole, part) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_mark(v, replace_value, whole, part) for v in value]
+    if type(value) is type(replace_value) and value == replace_value:
+        return whole
+    if isinstance(value, str) and isinstance(replace_value, str) and replace_value:
+        return value.replace(replace_value, part)
+    return value
+
+
+class DeployedModelClient:
+    """
+    Batched client for the remote endpoint described by a `DeployedModel`
+
+    Each request body is built the same way as in the browser: the datapoint replaces every
+    occurrence of `body_setup_replace_value` in `body_setup`, or is sent under `body_key` if
+    there is no `body_setup`. The body template is serialized once, so building a request only
+    serializes the datapoint itself. Requests are sent from a bounded pool of threads sharing
+    one session, whose keep-alive connections are reused across requests, and the prediction is
+    read from `return_key` of each response.
+
+    If the endpoint accepts several datapoints at once, `batch_size` datapoints are sent per
+    request as a list in place of a single datapoint, and the endpoint must return a list of as
+    many predictions.
+
+    Example usage:
+
+    >>> import aisquared
+    >>> model = aisquared.config.analytic.DeployedModel(
+        'http://localhost:8080/predict',
+        'text',
+        body_setup={'inputs': '{DATAPOINT}'},
+        return_key='outputs'
+    )
+    >>> with model.get_client(concurrency=8) as client:
+    ...     predictions = client.predict(['first text', 'second text'])
+    >>> client.stats()
+    {'requests': 2, 'errors': 0, 'datapoints': 2, 'mean_ms': 4.1, 'p50_ms': 4.0, ...}
+    """
+
+    def __init__(
+            self,
+            model,
+            batch_size: int = 1,
+            concurrency: int = 4,
+            timeout: float = 30
+    ):
+        """
+        Parameters
+        ----------
+        model : DeployedModel
+            The description of the endpoint
+        batch_size : int (default 1)
+            The number of datapoints to send per request. If greater than 1, the endpoint must
+            accept a list of datapoints and return a list of predictions
+        concurrency : int (default 4)
+            The maximum number of requests in flight at once, which is also the number of
+            connections kept alive
+        timeout : float or None (default 30)
+            The number of seconds to wait for each response
+        """
+        if not isinstance(batch_size, int) or batch_size < 1:
+            raise ValueError('batch_size must be a positive integer')
+        if not isinstance(concurrency, int) or concurrency < 1:
+            raise ValueError('concurrency must be a positive integer')
+        if model.url is None:
+            raise ValueError('The model must have a url')
+
+        self.model = model
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+        self._headers = {'Content-Type': 'application/json'}
+        self._headers.update(model.headers or {})
+        self._template = self._get_template()
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._executor = None
+
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def _get_template(self) -> tuple:
+        """
+        Split the serialized body setup around the places the datapoint is inserted. The
+        replace value is either a whole JSON string, which is replaced by the serialized
+        datapoint, or part of a longer string, which is replaced by the datapoint as text
+        """
+        model = self.model
+        if model.body_setup is None:
+            if model.body_key is None:
+                return None
+            body_setup = {model.body_key: model.body_setup_replace_value}
+        else:
+            body_setup = model.body_setup
+        # Unique placeholders are split on, so that no other text of the body setup is
+        # mistaken for an insertion point
+        whole, part = uuid.uuid4().hex, uuid.uuid4().hex
+        serialized = json.dumps(
+            _mark(body_setup, model.body_setup_replace_value, whole, part), separators=(',', ':'))
+        return tuple([
+            piece.split(part) for piece in serialized.split(json.dumps(whole))
+        ])
+
+    def build_body(self, datapoint) -> bytes:
+        """
+        Build the body of the request for a datapoint, or for a list of datapoints when
+        batching
+
+        Parameters
+        ----------
+        datapoint : any
+            The JSON-serializable datapoint, which may contain NumPy arrays
+        """
+        serialized = dumpb(_to_json(datapoint), compact=True).decode('utf-8')
+        if self._template is None:
+            return serialized.encode('utf-8')
+        text = json.dumps(datapoint if isinstance(datapoint, str) else serialized)[1:-1]
+        return serialized.join(
+            [text.join(pieces) for pieces in self._template]).encode('utf-8')
+
+    def extract(self, response):
+        """
+        Get the prediction from a decoded response. `return_key` is looked up first as a
+        whole, then as a dot-separated path of keys and list indexes
+
+        Parameters
+        ----------
+        response : any
+            The decoded JSON response
+        """
+        return_key = self.model.return_key
+        if return_key is None:
+            return response
+        if isinstance(response, dict) and return_key in response:
+            return response[return_key]
+        for key in return_key.split('.'):
+            if isinstance(response, list):
+                response = response[int(key)]
+            elif isinstance(response, dict) and key in response:
+                response = response[key]
+            else:
+                raise KeyError(
+                    f'Response does not contain return key {return_key}')
+        return response
+
+    def _send(self, datapoint):
+        start = time.perf_counter()
+        try:
+            response = self._session.post(
+                self.model.url,
+                data=self.build_body(datapoint),
+                headers=self._headers,
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            result = self.extract(loads(response.content))
+        except Exception:
+            with self._lock:
+                self._errors += 1
+            raise
+        finally:
+            latency = time.perf_counter() - start
+            with self._lock:
+                self._latencies.append(latency)
+        return result
+
+    def _send_batch(self, datapoints: list) -> list:
+        predictions = self._send(datapoints)
+        if not isinstance(predictions, list) or len(predictions) != len(datapoints):
+            raise ValueError(
+                f'Expected {len(datapoints)} predictions from a batched request')
+        return predictions
+
+    def predict_one(self, datapoint):
+        """
+        Get the prediction of a single datapoint, sent in a request of its own
+
+        Parameters
+        ----------
+        datapoint : any
+            The datapoint to predict on
+        """
+        with self._lock:
+            self._datapoints += 1
+        return self._send(datapoint)
+
+    def predict(self, datapoints) -> list:
+        """
+        Get the predictions of datapoints, sending up to `concurrency` requests at once
+
+        Parameters
+        ----------
+        datapoints : iterable
+            The datapoints to predict on. Only a bounded number of datapoints is read ahead
+
+        Returns
+        -------
+        predictions : list
+            The prediction of each datapoint, in order
+
+        Raises
+        ------
+        requests.HTTPError
+            If any request is unsuccessful
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency)
+
+        def batches():
+            batch = []
+            for datapoint in datapoints:
+                batch.append(datapoint)
+                if len(batch) == self.batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+        predictions = []
+        pending = collections.deque()
+        for batch in batches():
+            with self._lock:
+                self._datapoints += len(batch)
+            if self.batch_size == 1:
+                pending.append(self._executor.submit(self._send, batch[0]))
+            else:
+                pending.append(self._executor.submit(self._send_batch, batch))
+            if len(pending) >= 2 * self.concurrency:
+                self._collect(pending.popleft(), predictions)
+        while pending:
+            self._collect(pending.popleft(), predictions)
+        return predictions
+
+    def _collect(self, future, predictions: list) -> None:
+        if self.batch_size == 1:
+            predictions.append(future.result())
+        else:
+            predictions.extend(future.result())
+
+    def reset_stats(self) -> None:
+        """
+        Forget the latencies and counts of previous requests
+        """
+        with self._lock:
+            self._latencies = []
+            self._errors = 0
+            self._datapoints = 0
+
+    def stats(self) -> dict:
+        """
+        Get the number of requests, errors, and datapoints sent so far, along with the mean,
+        percentiles, and maximum of request latencies in milliseconds
+        """
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000
+            stats = {
+                'requests': latencies.size,
+                'errors': self._errors,
+                'datapoints': self._datapoints
+            }
+        if latencies.size:
+            stats['mean_ms'] = float(latencies.mean())
+            for percentile, value in zip(LATENCY_PERCENTILES, np.percentile(latencies, LATENCY_PERCENTILES)):
+                stats[f'p{percentile}_ms'] = float(value)
+            stats['max_ms'] = float(latencies.max())
+        return stats
+
+    def close(self) -> None:
+        """
+        Stop the request threads and close the pooled connections
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -1,4 +1,5 @@
 from aisquared.base import BaseObject
+from .LookupTable import LookupTable
 
 
 class LocalAnalytic(BaseObject):
@@ -6,6 +7,11 @@ class LocalAnalytic(BaseObject):
     Interaction with an analytic (lookup table) saved to the
     local file system
 
+    By default, the JSON file of the analytic is copied into the '.air' archive as is. If
+    `binary` is True, it is instead indexed into a `LookupTable`, stored as an uncompressed
+    archive member named by the SHA-256 digest of its contents, which can be memory-mapped and
+    searched without being parsed. In Python, keys can be looked up in batches with `lookup`.
+
     Example usage:
 
     >>> import aisquared
@@ -24,7 +30,8 @@ class LocalAnalytic(BaseObject):
         self,
         path: str,
         input_type: str,
-        all: bool = False
+        all: bool = False,
+        binary: bool = False
     ):
         """
         Parameters
@@ -35,11 +42,16 @@ class LocalAnalytic(BaseObject):
             The input type to the analytic. Either one of 'cv', 'text', or 'tabular'
         all : bool (default False)
             Whether the entire analytic will be returned for every call
+        binary : bool (default False)
+            Whether to store the analytic as an indexed binary lookup table instead of copying
+            the JSON file. `path` may also be a binary lookup table saved with
+            `LookupTable.save`
         """
         super().__init__()
         self.path = path
         self.input_type = input_type
         self.all = all
+        self.binary = binary
 
     @property
     def path(self):
@@ -48,6 +60,7 @@ class LocalAnalytic(BaseObject):
     @path.setter
     def path(self, value):
         self._path = value
+        self._table = None
 
     @property
     def input_type(self):
@@ -67,10 +80,106 @@ class LocalAnalytic(BaseObject):
             raise TypeError('all must be Boolean')
         self._all = value
 
+    @property
+    def binary(self):
+        return self._binary
+
+    @binary.setter
+    def binary(self, value):
+        if not isinstance(value, bool):
+            raise TypeError('binary must be Boolean')
+        self._binary = value
+
+    @property
+    def table(self) -> LookupTable:
+        """
+        The indexed lookup table, loaded from `path` the first time it is used
+        """
+        if self._table is None:
+            self._table = LookupTable.from_file(self.path)
+        return self._table
+
+    @property
+    def archive_name(self):
+        """
+        The name of the lookup table within a compiled '.air' archive when stored as binary
+        """
+        if not self.binary:
+            return None
+        return f'{self.table.digest}.lookup'
+
+    def get_archive_members(self) -> list:
+        """
+        Get the files to be written into a compiled '.air' archive
+        """
+        if not self.binary:
+            return []
+        source = self.table.path
+        if source is None:
+            source = self.table.to_bytes()
+        # Stored uncompressed, so that the table can be memory-mapped from the archive
+        return [(self.archive_name, source, False)]
+
+    def has_archive_members(self) -> bool:
+        """
+        Whether the lookup table is written into a compiled '.air' archive as a separate file
+        """
+        return self.binary
+
+    def lookup(self, keys, default=None) -> list:
+        """
+        Look up a batch of keys in the analytic
+
+        Parameters
+        ----------
+        keys : array-like of str
+            The keys to look up
+        default : any (default None)
+            The value to use for keys which are not in the analytic
+
+        Returns
+        -------
+        values : list
+            The value of each key
+        """
+        return self.table.lookup(keys, default)
+
+    def predict(self, inputs) -> list:
+        """
+        Look up a batch of inputs in the analytic
+
+        Parameters
+        ----------
+        inputs : iterable
+            Batch of keys to look up
+
+        Returns
+        -------
+        results : list
+            The value of each key, or None for keys which are not in the analytic. If `all` is
+            True, the entire analytic is returned for every input
+        """
+        if self.all:
+            table = self.table.to_dict()
+            return [table for _ in inputs]
+        return self.lookup(list(inputs))
+
     def to_dict(self) -> dict:
         """
         Get the configuration object as a dictionary
         """
+        if self.binary:
+            return {
+                'className': 'LocalAnalytic',
+                'params': {
+                    'path': self.path,
+                    'inputType': self.input_type,
+                    'all': self.all,
+                    'lookupFile': self.archive_name,
+                    'lookupDigest': self.table.digest,
+                    'lookupSize': len(self.table)
+                }
+            }
         return {
             'className': 'LocalAnalytic',
             'params': {
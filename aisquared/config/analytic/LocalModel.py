@@ -1,4 +1,11 @@
 from aisquared.base import BaseObject
+import tensorflow as tf
+import numpy as np
+
+try:
+    import scipy.sparse
+except ImportError:
+    scipy = None
 
 
 class LocalModel(BaseObject):
@@ -44,6 +51,7 @@ class LocalModel(BaseObject):
     @path.setter
     def path(self, value):
         self._path = value
+        self._model = None
 
     @property
     def input_type(self):
@@ -53,6 +61,43 @@ class LocalModel(BaseObject):
     def input_type(self, value):
         self._input_type = value
 
+    @property
+    def model(self):
+        """
+        The Keras model, loaded from `path` the first time it is used
+        """
+        if self._model is None:
+            self._model = tf.keras.models.load_model(self.path, compile=False)
+        return self._model
+
+    def predict(self, inputs):
+        """
+        Run the model on a batch of inputs
+
+        Parameters
+        ----------
+        inputs : array-like or scipy.sparse matrix
+            Batch of preprocessed inputs. Sparse matrices, such as the output of a
+            TabularPreprocesser with `sparse=True`, are passed to the model as a sparse tensor
+            without being densified
+
+        Returns
+        -------
+        predictions : np.ndarray or list
+            The model outputs, or a list of arrays for models with several outputs
+        """
+        if scipy is not None and scipy.sparse.issparse(inputs):
+            inputs = inputs.tocoo()
+            inputs = tf.sparse.reorder(tf.SparseTensor(
+                np.column_stack([inputs.row, inputs.col]).astype(np.int64),
+                inputs.data,
+                inputs.shape
+            ))
+        predictions = self.model.predict_on_batch(inputs)
+        if isinstance(predictions, (list, tuple)):
+            return [np.asarray(prediction) for prediction in predictions]
+        return np.asarray(predictions)
+
     def to_dict(self) -> dict:
         """
         Get the configuration object as a dictionary
@@ -0,0 +1,248 @@
+from aisquared.base.binary import pack_sections, section_offsets, has_magic, is_sorted_unique, sort_keys, search_keys, file_digest
+from aisquared.base.serialization import dumpb_each, loads
+import numpy as np
+import hashlib
+import struct
+import json
+import os
+
+# Binary layout: magic, version, key width, key count, size of the value store, then the sorted
+# fixed-width UTF-8 keys, the little-endian uint64 offset of each value in the value store
+# followed by its total size, and the value store, which holds each value as compact JSON. Each
+# section is aligned as described in `aisquared.base.binary`
+_MAGIC = b'AISQLKUP'
+_VERSION = 1
+_HEADER = struct.Struct('<8sIIQQ')
+_OFFSET_DTYPE = np.dtype('<u8')
+
+
+class LookupTable:
+    """
+    Indexed binary lookup table, stored as a sorted array of UTF-8 keys and a compact store of
+    JSON values
+
+    Keys are found with a vectorized binary search and only the values of matching keys are
+    decoded, so tables with tens of millions of entries can be memory-mapped and queried in
+    batches without being parsed. Every key takes up as many bytes as the longest key.
+
+    Example usage:
+
+    >>> import aisquared
+    >>> table = aisquared.config.analytic.LookupTable.from_dict(
+        {'11111': {'name': 'John Doe'}, '22222': {'name': 'Jane Doe'}}
+    )
+    >>> table.lookup(['22222', '33333'])
+    [{'name': 'Jane Doe'}, None]
+    """
+
+    def __init__(
+            self,
+            keys: np.ndarray,
+            offsets: np.ndarray,
+            values,
+            path: str = None
+    ):
+        """
+        Parameters
+        ----------
+        keys : np.ndarray
+            Sorted, unique, fixed-width bytes array of UTF-8 encoded keys
+        offsets : np.ndarray
+            Array of one more offset than there are keys, where the JSON value of each key is
+            stored between its offset and the next
+        values : bytes-like
+            The value store
+        path : path-like or None (default None)
+            The binary file the table is stored in, if any
+        """
+        keys = np.asarray(keys)
+        offsets = np.asarray(offsets)
+        if keys.ndim != 1 or keys.dtype.kind != 'S':
+            raise TypeError('keys must be a one-dimensional bytes array')
+        if offsets.shape != (keys.size + 1,):
+            raise ValueError('offsets must have one more entry than keys')
+        if not is_sorted_unique(keys):
+            raise ValueError('keys must be sorted and unique')
+        self._keys = keys
+        self._offsets = offsets.astype(_OFFSET_DTYPE, copy=False)
+        self._values = memoryview(values).cast('B')
+        self._path = None if path is None else os.fspath(path)
+        self._digest = None
+
+    @classmethod
+    def from_dict(cls, table: dict):
+        """
+        Create a lookup table from a dictionary with string keys and JSON-serializable values
+
+        Parameters
+        ----------
+        table : dict
+            The dictionary to index
+        """
+        if not isinstance(table, dict):
+            raise TypeError('table must be dictionary')
+        if not all([issubclass(t, str) for t in set(map(type, table.keys()))]):
+            raise ValueError('All keys in table must be strings')
+        if not table:
+            return cls(np.empty(0, dtype='S1'), np.zeros(1, dtype=_OFFSET_DTYPE), b'')
+
+        keys, order = sort_keys(np.array(list(table.keys()), dtype=str))
+        if not is_sorted_unique(keys):
+            raise ValueError(
+                'All keys must be unique once encoded, and must not end with null characters')
+
+        values = np.empty(len(table), dtype=object)
+        values[:] = list(table.values())
+        encoded = dumpb_each(values[order])
+        offsets = np.zeros(len(encoded) + 1, dtype=_OFFSET_DTYPE)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        return cls(keys, offsets, b''.join(encoded))
+
+    @classmethod
+    def from_file(cls, path: str):
+        """
+        Load a lookup table from a file
+
+        Binary lookup table files are memory-mapped, and any other file is read as a JSON
+        dictionary
+
+        Parameters
+        ----------
+        path : path-like
+            The file to load the lookup table from
+        """
+        if has_magic(path, _MAGIC):
+            return cls._from_buffer(np.memmap(path, dtype=np.uint8, mode='r'), path)
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+    @classmethod
+    def _from_buffer(cls, buffer, path: str = None):
+        magic, version, width, count, size = _HEADER.unpack(
+            bytes(buffer[:_HEADER.size]))
+        if magic != _MAGIC:
+            raise ValueError('Not a binary lookup table')
+        if version != _VERSION:
+            raise ValueError(f'Unsupported binary lookup table version {version}')
+        keys_offset, offsets_offset, values_offset = section_offsets(
+            _HEADER.size, [width * count, _OFFSET_DTYPE.itemsize * (count + 1)])
+        table = cls.__new__(cls)
+        table._keys = np.frombuffer(
+            buffer, dtype=f'S{width}', count=count, offset=keys_offset)
+        table._offsets = np.frombuffer(
+            buffer, dtype=_OFFSET_DTYPE, count=count + 1, offset=offsets_offset)
+        table._values = memoryview(
+            np.frombuffer(buffer, dtype=np.uint8, count=size, offset=values_offset))
+        table._path = None if path is None else os.fspath(path)
+        table._digest = None
+        return table
+
+    @property
+    def keys(self) -> np.ndarray:
+        """
+        The sorted, UTF-8 encoded keys
+        """
+        return self._keys
+
+    @property
+    def path(self):
+        """
+        The binary file the table is stored in, or None if it is only held in memory
+        """
+        return self._path
+
+    def __len__(self) -> int:
+        return self._keys.size
+
+    def to_bytes(self) -> bytes:
+        """
+        Get the lookup table in its binary format
+        """
+        header = _HEADER.pack(_MAGIC, _VERSION, self._keys.dtype.itemsize,
+                              self._keys.size, self._values.nbytes)
+        return pack_sections(header, [self._keys.tobytes(), self._offsets.tobytes(), self._values])
+
+    def save(self, path: str) -> None:
+        """
+        Save the lookup table in its binary format
+
+        Parameters
+        ----------
+        path : path-like
+            The file to save the lookup table to
+        """
+        data = self.to_bytes()
+        with open(path, 'wb') as f:
+            f.write(data)
+        if self._digest is None:
+            self._digest = hashlib.sha256(data).hexdigest()
+
+    @property
+    def digest(self) -> str:
+        """
+        The SHA-256 digest of the lookup table in its binary format. Tables loaded from a
+        binary file are hashed by reading the file in chunks, so that the table is never copied
+        into memory as a whole
+        """
+        if self._digest is None:
+            if self._path is None:
+                self._digest = hashlib.sha256(self.to_bytes()).hexdigest()
+            else:
+                self._digest = file_digest(self._path)
+        return self._digest
+
+    def find(self, keys) -> np.ndarray:
+        """
+        Find the positions of keys in the table
+
+        Parameters
+        ----------
+        keys : array-like of str
+            The keys to find
+
+        Returns
+        -------
+        positions : np.ndarray
+            The position of each key in the table, or -1 for keys which are not in the table
+        """
+        keys = np.asarray(keys, dtype=str)
+        if self._keys.size == 0 or keys.size == 0:
+            return np.full(keys.shape, -1, dtype=np.int64)
+        return search_keys(self._keys, keys)
+
+    def lookup(self, keys, default=None) -> list:
+        """
+        Get the values of a batch of keys
+
+        Parameters
+        ----------
+        keys : array-like of str
+            The keys to look up
+        default : any (default None)
+            The value to use for keys which are not in the table
+
+        Returns
+        -------
+        values : list
+            The value of each key
+        """
+        positions = self.find(keys).ravel()
+        found = np.flatnonzero(positions >= 0)
+        results = [default] * positions.size
+        if found.size:
+            starts = self._offsets[positions[found]].tolist()
+            ends = self._offsets[positions[found] + 1].tolist()
+            # The values of all found keys are decoded at once, as a single JSON array
+            values = self._values
+            decoded = loads(b'[' + b','.join(
+                [values[start:end] for start, end in zip(starts, ends)]) + b']')
+            for i, value in zip(found.tolist(), decoded):
+                results[i] = value
+        return results
+
+    def to_dict(self) -> dict:
+        """
+        Get the lookup table as a dictionary
+        """
+        keys = np.char.decode(self._keys, 'utf-8').tolist()
+        return dict(zip(keys, self.lookup(keys)))
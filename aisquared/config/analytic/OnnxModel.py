@@ -1,10 +1,163 @@
 from aisquared.base import BaseObject
+from aisquared.base.binary import file_digest
+import numpy as np
+import collections
+import threading
 import base64
+import os
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+# Digests of ONNX files, keyed by path, size, and modification time, so that files are only
+# hashed once no matter how many times they are serialized. Only the most recently used
+# digests are kept, least recently used first
+_DIGESTS = collections.OrderedDict()
+_DIGESTS_LOCK = threading.Lock()
+
+# The maximum number of file digests kept at once
+MAX_DIGESTS = 256
+
+
+# Inference sessions, keyed by path, size, modification time, and thread settings, so that
+# each model is only loaded once however many OnnxModel objects refer to it. Only the most
+# recently used sessions are kept, least recently used first
+_SESSIONS = collections.OrderedDict()
+_SESSIONS_LOCK = threading.Lock()
+
+# The maximum number of inference sessions kept loaded at once
+MAX_SESSIONS = 8
+
+# NumPy types of ONNX tensor element types
+_ONNX_DTYPES = {
+    'tensor(float)': np.float32,
+    'tensor(double)': np.float64,
+    'tensor(float16)': np.float16,
+    'tensor(int64)': np.int64,
+    'tensor(int32)': np.int32,
+    'tensor(int16)': np.int16,
+    'tensor(int8)': np.int8,
+    'tensor(uint8)': np.uint8,
+    'tensor(bool)': np.bool_
+}
+
+
+def get_session(path: str, intra_op_threads: int = None, inter_op_threads: int = None):
+    """
+    Get the cached ONNX Runtime inference session of a model, creating it if needed
+
+    Sessions of earlier versions of the same file are released when it has been rewritten, and
+    the least recently used session is released when more than `MAX_SESSIONS` are loaded
+
+    Parameters
+    ----------
+    path : str
+        The file path of the ONNX model
+    intra_op_threads : int or None (default None)
+        The number of threads used within each operator. If None, ONNX Runtime uses one
+        thread per physical core
+    inter_op_threads : int or None (default None)
+        The number of threads used to run independent operators at the same time. If None or
+        1, operators are run one after another, which is fastest for most models on CPU
+    """
+    if onnxruntime is None:
+        raise ImportError('onnxruntime must be installed to run ONNX models')
+    stat = os.stat(path)
+    key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns,
+           intra_op_threads, inter_op_threads)
+    with _SESSIONS_LOCK:
+        if key in _SESSIONS:
+            _SESSIONS.move_to_end(key)
+        else:
+            for stale in [k for k in _SESSIONS if k[0] == key[0] and k[1:3] != key[1:3]]:
+                del _SESSIONS[stale]
+            options = onnxruntime.SessionOptions()
+            options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            if intra_op_threads is not None:
+                options.intra_op_num_threads = intra_op_threads
+            if inter_op_threads is not None and inter_op_threads > 1:
+                options.execution_mode = onnxruntime.ExecutionMode.ORT_PARALLEL
+                options.inter_op_num_threads = inter_op_threads
+            else:
+                options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+                options.inter_op_num_threads = 1
+            _SESSIONS[key] = onnxruntime.InferenceSession(
+                path, options, providers=['CPUExecutionProvider'])
+            while len(_SESSIONS) > MAX_SESSIONS:
+                _SESSIONS.popitem(last=False)
+        return _SESSIONS[key]
+
+
+def clear_sessions(path: str = None) -> None:
+    """
+    Release cached ONNX Runtime inference sessions, along with the cached digests of their
+    model files
+
+    Parameters
+    ----------
+    path : str or None (default None)
+        If provided, only the sessions and digest of this model file are released. If None,
+        every session and digest is released
+    """
+    for cache, lock in [(_SESSIONS, _SESSIONS_LOCK), (_DIGESTS, _DIGESTS_LOCK)]:
+        with lock:
+            if path is None:
+                cache.clear()
+                continue
+            realpath = os.path.realpath(path)
+            for key in [k for k in cache if k[0] == realpath]:
+                del cache[key]
+
+
+def _file_digest(path: str) -> str:
+    stat = os.stat(path)
+    key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+    with _DIGESTS_LOCK:
+        if key in _DIGESTS:
+            _DIGESTS.move_to_end(key)
+            return _DIGESTS[key]
+    # Files are hashed outside the lock, so that hashing a large model does not hold up others
+    digest = file_digest(path)
+    with _DIGESTS_LOCK:
+        # The digests of earlier versions of the same file are never used again
+        for stale in [k for k in _DIGESTS if k[0] == key[0] and k != key]:
+            del _DIGESTS[stale]
+        _DIGESTS[key] = digest
+        while len(_DIGESTS) > MAX_DIGESTS:
+            _DIGESTS.popitem(last=False)
+    return digest
 
 
 class OnnxModel(BaseObject):
     """
     Run an ONNX model locally
+
+    By default, the ONNX model is embedded in the configuration as a base64 string. If
+    `inline` is False, the model is instead stored as a separate member of the '.air'
+    archive, named by the SHA-256 digest of its contents, and the model file is only read
+    when the configuration is compiled.
+
+    Example usage:
+
+    >>> import aisquared
+    >>> analytic = aisquared.config.analytic.OnnxModel(
+        'model.onnx',
+        [1, 128],
+        'output',
+        inline=False
+    )
+    >>> analytic.to_dict()
+    {'className': 'OnnxModel',
+    'params': {'path': 'model.onnx',
+    'inputShape': [1, 128],
+    'outputKey': 'output',
+    'returnKey': None,
+    'inputType': 'text',
+    'onnxData': None,
+    'onnxDigest': '<digest>',
+    'onnxFile': '<digest>.onnx'}}
     """
 
     def __init__(
@@ -13,18 +166,43 @@ class OnnxModel(BaseObject):
             input_shape: list,
             output_key: str,
             return_key: str = None,
-            input_type: str = 'text'
+            input_type: str = 'text',
+            inline: bool = True,
+            intra_op_threads: int = None,
+            inter_op_threads: int = None
     ):
+        """
+        Parameters
+        ----------
+        path : str
+            The file path of the saved ONNX model
+        input_shape : list
+            The shape of the input to the model
+        output_key : str
+            The key of the model output to use
+        return_key : str or None (default None)
+            The key to return the output under
+        input_type : str (default 'text')
+            Input type to the model. Must be one of 'text' or 'cv'
+        inline : bool (default True)
+            Whether to embed the model in the configuration as a base64 string. If False, the
+            model is stored as a separate archive member referenced by its digest
+        intra_op_threads : int or None (default None)
+            The number of threads used within each operator when running the model with
+            `predict`. If None, ONNX Runtime uses one thread per physical core
+        inter_op_threads : int or None (default None)
+            The number of threads used to run independent operators at the same time when
+            running the model with `predict`. If None or 1, operators are run in order
+        """
         super().__init__()
         self.path = path
         self.input_shape = input_shape
         self.output_key = output_key
         self.return_key = return_key
         self.input_type = input_type
-
-        with open(self.path, 'rb') as f:
-            data = f.read()
-        self.onnx_data = base64.b64encode(data).decode('ascii')
+        self.inline = inline
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
 
     @property
     def path(self):
@@ -35,6 +213,7 @@ class OnnxModel(BaseObject):
         if not isinstance(value, str):
             raise TypeError(f'path must be str, got {type(value)}')
         self._path = value
+        self._onnx_data = None
 
     @property
     def input_shape(self):
@@ -77,8 +256,21 @@ class OnnxModel(BaseObject):
                 f'input_type must be one of "text", "cv", got {value}')
         self._input_type = value
 
+    @property
+    def inline(self):
+        return self._inline
+
+    @inline.setter
+    def inline(self, value):
+        if not isinstance(value, bool):
+            raise TypeError('inline must be bool')
+        self._inline = value
+
     @property
     def onnx_data(self):
+        if self._onnx_data is None:
+            with open(self.path, 'rb') as f:
+                self._onnx_data = base64.b64encode(f.read()).decode('ascii')
         return self._onnx_data
 
     @onnx_data.setter
@@ -87,7 +279,181 @@ class OnnxModel(BaseObject):
             raise TypeError('onnx_data must be a string')
         self._onnx_data = value
 
+    @property
+    def intra_op_threads(self):
+        return self._intra_op_threads
+
+    @intra_op_threads.setter
+    def intra_op_threads(self, value):
+        if value is not None and (not isinstance(value, int) or value < 1):
+            raise ValueError('intra_op_threads must be a positive integer or None')
+        self._intra_op_threads = value
+
+    @property
+    def inter_op_threads(self):
+        return self._inter_op_threads
+
+    @inter_op_threads.setter
+    def inter_op_threads(self, value):
+        if value is not None and (not isinstance(value, int) or value < 1):
+            raise ValueError('inter_op_threads must be a positive integer or None')
+        self._inter_op_threads = value
+
+    @property
+    def session(self):
+        """
+        The ONNX Runtime inference session of the model, which is created the first time it is
+        used and shared by every OnnxModel with the same file and thread settings
+        """
+        return get_session(self.path, self.intra_op_threads, self.inter_op_threads)
+
+    def close(self) -> None:
+        """
+        Release the cached inference sessions of the model file, which are created again the
+        next time the model is used
+        """
+        clear_sessions(self.path)
+
+    def _output_shape(self, output, batch_size: int):
+        """
+        Get the shape of an output for a batch, or None if it depends on more than the batch size
+        """
+        shape = list(output.shape)
+        if not shape:
+            return None
+        shape[0] = batch_size
+        if not all([isinstance(dim, int) for dim in shape[1:]]):
+            return None
+        return tuple(shape)
+
+    def _run(self, session, batch: np.ndarray, output, out: np.ndarray = None) -> np.ndarray:
+        """
+        Run the session on one batch, binding the input and output arrays so that ONNX Runtime
+        reads from and writes to them directly
+        """
+        binding = session.io_binding()
+        binding.bind_cpu_input(session.get_inputs()[0].name, batch)
+        shape = self._output_shape(output, batch.shape[0])
+        if shape is None or output.type not in _ONNX_DTYPES:
+            binding.bind_output(output.name, 'cpu')
+            session.run_with_iobinding(binding)
+            result = binding.copy_outputs_to_cpu()[0]
+            if out is not None:
+                out[...] = result
+                return out
+            return result
+
+        if out is None:
+            out = np.empty(shape, dtype=_ONNX_DTYPES[output.type])
+        elif out.shape != shape or out.dtype != _ONNX_DTYPES[output.type] or not out.flags.c_contiguous:
+            raise ValueError(
+                f'out must be a contiguous {_ONNX_DTYPES[output.type].__name__} array of shape {shape}')
+        binding.bind_output(
+            output.name, 'cpu', 0, _ONNX_DTYPES[output.type], shape, out.ctypes.data)
+        session.run_with_iobinding(binding)
+        return out
+
+    def predict(self, inputs, out: np.ndarray = None) -> np.ndarray:
+        """
+        Run the model on a batch of inputs with ONNX Runtime
+
+        Inputs are converted to the input type of the model and bound to the session without
+        being copied again, and the output is written directly into a preallocated array. Any
+        batch size can be used: if the model was exported with a fixed batch size, the batch is
+        run in pieces of that size
+
+        Parameters
+        ----------
+        inputs : array-like
+            Batch of preprocessed inputs to the first input of the model
+        out : np.ndarray or None (default None)
+            If provided, a contiguous array to write the output into, such as the output of a
+            previous batch of the same size, so that no memory is allocated
+
+        Returns
+        -------
+        predictions : np.ndarray
+            The model output named `output_key`
+        """
+        session = self.session
+        model_input = session.get_inputs()[0]
+        outputs = [o for o in session.get_outputs() if o.name == self.output_key]
+        if not outputs:
+            raise ValueError(
+                f'The model has no output named {self.output_key}')
+        output = outputs[0]
+        batch = np.ascontiguousarray(
+            inputs, dtype=_ONNX_DTYPES.get(model_input.type))
+
+        fixed_size = model_input.shape[0] if model_input.shape and isinstance(
+            model_input.shape[0], int) else None
+        if fixed_size is None or fixed_size == batch.shape[0]:
+            return self._run(session, batch, output, out)
+
+        # Models exported with a fixed batch size are run on consecutive pieces of the batch,
+        # writing each piece of the output in place when its shape is known
+        if out is None:
+            shape = self._output_shape(output, batch.shape[0])
+            if shape is not None and output.type in _ONNX_DTYPES:
+                out = np.empty(shape, dtype=_ONNX_DTYPES[output.type])
+        results = []
+        for start in range(0, batch.shape[0], fixed_size):
+            piece = batch[start:start + fixed_size]
+            size = piece.shape[0]
+            if out is not None and size == fixed_size:
+                self._run(session, piece, output, out[start:start + size])
+                continue
+            if size < fixed_size:
+                piece = np.concatenate(
+                    [piece, np.zeros((fixed_size - size,) + piece.shape[1:], dtype=piece.dtype)])
+            result = self._run(session, piece, output)[:size]
+            if out is None:
+                results.append(result)
+            else:
+                out[start:start + size] = result
+        return out if out is not None else np.concatenate(results)
+
+    @property
+    def digest(self):
+        """
+        The SHA-256 digest of the ONNX model file
+        """
+        return _file_digest(self.path)
+
+    @property
+    def archive_name(self):
+        """
+        The name of the ONNX model within a compiled '.air' archive when not inlined
+        """
+        return f'{self.digest}.onnx'
+
+    def get_archive_members(self) -> list:
+        """
+        Get the files to be written into a compiled '.air' archive
+        """
+        if self.inline:
+            return []
+        return [(self.archive_name, self.path)]
+
+    def has_archive_members(self) -> bool:
+        """
+        Whether the model is written into a compiled '.air' archive as a separate file
+        """
+        return not self.inline
+
     def to_dict(self):
+        if self.inline:
+            return {
+                'className': 'OnnxModel',
+                'params': {
+                    'path': self.path,
+                    'inputShape': self.input_shape,
+                    'outputKey': self.output_key,
+                    'returnKey': self.return_key,
+                    'inputType': self.input_type,
+                    'onnxData': self.onnx_data
+                }
+            }
         return {
             'className': 'OnnxModel',
             'params': {
@@ -96,6 +462,8 @@ class OnnxModel(BaseObject):
                 'outputKey': self.output_key,
                 'returnKey': self.return_key,
                 'inputType': self.input_type,
-                'onnxData': self.onnx_data
+                'onnxData': None,
+                'onnxDigest': self.digest,
+                'onnxFile': self.archive_name
             }
         }
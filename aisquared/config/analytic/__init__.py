@@ -4,7 +4,9 @@ The aisquared.config.analytic subpackage contains objects for packaging individu
 
 from .DeployedAnalytic import DeployedAnalytic
 from .DeployedModel import DeployedModel
+from .DeployedModelClient import DeployedModelClient
 from .LocalModel import LocalModel
 from .LocalAnalytic import LocalAnalytic
+from .LookupTable import LookupTable
 from .ReverseMLWorkflow import ReverseMLWorkflow
 from .OnnxModel import OnnxModel
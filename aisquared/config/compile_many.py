@@ -0,0 +1,108 @@
+from typing import Union
+from concurrent.futures import ThreadPoolExecutor
+from .ModelConfiguration import ModelConfiguration
+from .GraphConfiguration import GraphConfiguration
+from .BuildCache import BuildCache
+from .AirWriter import AirWriter
+from .conversion import KERAS_EXTENSIONS, convert_keras_models, get_cache, get_dtype_map, write_models
+import contextlib
+import tempfile
+import time
+import os
+
+
+def _get_filenames(config) -> list:
+    if isinstance(config, ModelConfiguration):
+        return config.get_model_filenames()
+    return config.get_filenames()
+
+
+def compile_many(
+        configs: list,
+        out_dir: str,
+        workers: int = None,
+        dtype: str = None,
+        cache_dir: Union[str, BuildCache] = None,
+        compression_level: int = None
+) -> dict:
+    """
+    Compile many configurations into '.air' files at once
+
+    Every Keras model referenced by any of the configurations is converted exactly once,
+    after which all archives are written in parallel. Each archive is named '{NAME}.air',
+    where {NAME} is the name of its configuration.
+
+    Example usage:
+
+    >>> import aisquared
+    >>> timings = aisquared.config.compile_many(configs, 'build', workers=8)
+    >>> timings
+    {'build/customer-a.air': 0.21, 'build/customer-b.air': 0.19}
+
+    Parameters
+    ----------
+    configs : list
+        List of ModelConfiguration and/or GraphConfiguration objects
+    out_dir : path-like
+        The directory to write the '.air' files to. Created if it does not exist
+    workers : int or None (default None)
+        The number of processes used to convert models and the number of threads used to write
+        archives. If None or 1, everything is done one after another
+    dtype : str or None (default None)
+        The datatype to use for the model weights. If None, defaults to 'float32'
+    cache_dir : path-like, BuildCache, or None (default None)
+        If provided, the build cache to reuse converted Keras models from. If None, converted
+        models are kept in a temporary cache for the duration of the call
+    compression_level : int or None (default None)
+        The deflate compression level of the archives, from 0 (no compression) to 9
+
+    Returns
+    -------
+    timings : dict
+        Mapping from each '.air' filename to the number of seconds taken to write it
+    """
+    if not isinstance(configs, list) or not all([isinstance(config, (ModelConfiguration, GraphConfiguration)) for config in configs]):
+        raise TypeError(
+            'configs must be a list of ModelConfiguration or GraphConfiguration objects')
+    if workers is not None and (not isinstance(workers, int) or workers < 1):
+        raise ValueError('workers must be a positive integer or None')
+
+    names = [config.name for config in configs]
+    duplicates = sorted(set(name for name in names if names.count(name) > 1))
+    if duplicates:
+        raise ValueError(
+            f'Each configuration must have a unique name, got duplicates {duplicates}')
+
+    os.makedirs(out_dir, exist_ok=True)
+    dtype_map = get_dtype_map(dtype)
+    filenames = [_get_filenames(config) for config in configs]
+    keras_files = list(dict.fromkeys(
+        f for files in filenames for f in files if os.path.splitext(f)[-1] in KERAS_EXTENSIONS
+    ))
+
+    if cache_dir is None:
+        cache_context = tempfile.TemporaryDirectory()
+    else:
+        cache_context = contextlib.nullcontext(cache_dir)
+
+    with cache_context as cache_dir:
+        cache = get_cache(cache_dir)
+
+        # Convert each unique model once
+        converted = convert_keras_models(keras_files, dtype_map, cache, workers)
+
+        def _compile(config, files):
+            filename = os.path.join(out_dir, config.name + '.air')
+            start = time.perf_counter()
+            with AirWriter(filename, compression_level) as writer:
+                writer.write_config(config.to_dict())
+                write_models(writer, files, converted=converted)
+                writer.write_members(config.get_archive_members())
+            return filename, time.perf_counter() - start
+
+        with ThreadPoolExecutor(max_workers=workers or 1) as executor:
+            results = list(executor.map(_compile, configs, filenames))
+
+        cache.evict(keep=[os.path.basename(d) for d in converted.values()])
+
+    return dict(results)
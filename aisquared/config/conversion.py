@@ -0,0 +1,177 @@
+from typing import Union
+from .AirWriter import AirWriter
+from .BuildCache import BuildCache
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import tensorflowjs as tfjs
+import tensorflow as tf
+import contextlib
+import tempfile
+import os
+
+KERAS_EXTENSIONS = ['.h5', '.keras']
+
+
+def get_dtype_map(dtype: str = None) -> dict:
+    """
+    Get the quantization dtype map to use when converting Keras models
+    """
+    if dtype is None:
+        return None
+    return {dtype: '*'}
+
+
+def get_cache(cache_dir: Union[str, BuildCache] = None) -> BuildCache:
+    """
+    Get a BuildCache from a cache directory, an existing BuildCache, or None
+    """
+    if cache_dir is None or isinstance(cache_dir, BuildCache):
+        return cache_dir
+    return BuildCache(cache_dir)
+
+
+def convert_keras_model(
+        filename: str,
+        dtype_map: dict = None,
+        cache: BuildCache = None,
+        dirname: str = None
+) -> str:
+    """
+    Convert a Keras model file to TensorFlow.js
+
+    Parameters
+    ----------
+    filename : path-like
+        The path to the Keras model file
+    dtype_map : dict or None (default None)
+        The quantization dtype map to use
+    cache : BuildCache or None (default None)
+        If provided, the cache to reuse converted models from. The cache is not evicted, so that
+        the converted model remains available until it has been written
+    dirname : path-like or None (default None)
+        The directory to save the converted model to when no cache is used
+
+    Returns
+    -------
+    model_dir : str
+        The directory containing the converted model
+    """
+    if cache is not None:
+        return cache.convert(filename, dtype_map, evict=False)
+    model = tf.keras.models.load_model(filename)
+    tfjs.converters.save_keras_model(
+        model, dirname, quantization_dtype_map=dtype_map)
+    return dirname
+
+
+def convert_keras_models(
+        filenames: list,
+        dtype_map: dict = None,
+        cache: BuildCache = None,
+        workers: int = None,
+        dirnames: list = None
+) -> dict:
+    """
+    Convert several Keras model files to TensorFlow.js, optionally in a process pool
+
+    Parameters
+    ----------
+    filenames : list
+        The paths to the Keras model files
+    dtype_map : dict or None (default None)
+        The quantization dtype map to use
+    cache : BuildCache or None (default None)
+        If provided, the cache to reuse converted models from
+    workers : int or None (default None)
+        The number of processes to convert models with. If None or 1, models are converted
+        one after another in the current process
+    dirnames : list or None (default None)
+        The directories to save each converted model to when no cache is used
+
+    Returns
+    -------
+    converted : dict
+        Mapping from each filename to the directory containing its converted model
+    """
+    if workers is not None and (not isinstance(workers, int) or workers < 1):
+        raise ValueError('workers must be a positive integer or None')
+    if dirnames is None:
+        dirnames = [None] * len(filenames)
+
+    args = (
+        filenames,
+        [dtype_map] * len(filenames),
+        [cache] * len(filenames),
+        dirnames
+    )
+    if workers is None or workers == 1 or len(filenames) <= 1:
+        converted = list(map(convert_keras_model, *args))
+    else:
+        # TensorFlow is not fork-safe, so worker processes are always spawned
+        with ProcessPoolExecutor(
+                max_workers=min(workers, len(filenames)),
+                mp_context=multiprocessing.get_context('spawn')
+        ) as executor:
+            converted = list(executor.map(convert_keras_model, *args))
+    return dict(zip(filenames, converted))
+
+
+def write_models(
+        writer: AirWriter,
+        filenames: list,
+        dtype_map: dict = None,
+        cache: BuildCache = None,
+        workers: int = None,
+        converted: dict = None
+) -> None:
+    """
+    Write model and analytic files into an archive, converting Keras models to TensorFlow.js
+
+    Parameters
+    ----------
+    writer : AirWriter
+        The archive to write to
+    filenames : list
+        The paths to the model and analytic files. Duplicate paths are only written once
+    dtype_map : dict or None (default None)
+        The quantization dtype map to use for Keras models
+    cache : BuildCache or None (default None)
+        If provided, the cache to reuse converted Keras models from. Cached models are streamed
+        into the archive directly from the cache
+    workers : int or None (default None)
+        The number of processes to convert Keras models with. If None or 1, models are converted
+        one after another in the current process
+    converted : dict or None (default None)
+        Mapping from Keras model filenames to the directories of models that have already
+        been converted. These models are written as-is rather than converted again
+    """
+    filenames = list(dict.fromkeys(filenames))
+    converted = dict(converted or {})
+    keras_files = [
+        f for f in filenames if os.path.splitext(f)[-1] in KERAS_EXTENSIONS and f not in converted
+    ]
+
+    # Without a cache, converted models are staged in a scratch directory, since
+    # tensorflowjs can only save to disk
+    if cache is None and keras_files:
+        scratch = tempfile.TemporaryDirectory()
+    else:
+        scratch = contextlib.nullcontext()
+
+    with scratch as scratch_dir:
+        dirnames = [
+            os.path.join(scratch_dir, str(i)) if scratch_dir else None for i in range(len(keras_files))
+        ]
+        converted.update(convert_keras_models(
+            keras_files, dtype_map, cache, workers, dirnames))
+
+        for f in filenames:
+            if f in converted:
+                writer.write_directory(converted[f], os.path.split(f)[-1])
+            elif os.path.isdir(f):
+                writer.write_directory(f, f)
+            else:
+                writer.write_file(f)
+
+    if cache is not None:
+        cache.evict(keep=[os.path.basename(d) for d in converted.values()])
@@ -48,8 +48,8 @@ class QualitativeFeedback(BaseObject):
             raise ValueError(
                 'answer_type must be one of "singleChoice", "multiChoice", or "text"')
 
-        self.questions.append(_create_question_dict(
-            question, answer_type, choices))
+        self.questions = self.questions + [_create_question_dict(
+            question, answer_type, choices)]
 
     def to_dict(self) -> dict:
         """
@@ -1,4 +1,6 @@
 from aisquared.base import BaseObject
+from .execution import gather_labels
+import numpy as np
 
 
 class BinaryClassification(BaseObject):
@@ -59,6 +61,30 @@ class BinaryClassification(BaseObject):
             raise ValueError('threshold value must be between 0 and 1')
         self._threshold = value
 
+    def transform(self, predictions) -> np.ndarray:
+        """
+        Get the labels of a batch of predictions
+
+        Parameters
+        ----------
+        predictions : array-like
+            The predicted probabilities of the second value of the label map, with shape
+            (batch,) or (batch, 1), or the probabilities of both values, with shape (batch, 2)
+
+        Returns
+        -------
+        labels : np.ndarray
+            The label of each prediction, which is the second value of the label map if its
+            probability is at least the threshold and the first value otherwise
+        """
+        predictions = np.asarray(predictions)
+        if predictions.ndim == 2 and predictions.shape[1] in (1, 2):
+            predictions = predictions[:, -1]
+        if predictions.ndim != 1:
+            raise ValueError(
+                'predictions must have shape (batch,), (batch, 1), or (batch, 2)')
+        return gather_labels(self.label_map, (predictions >= self.threshold).astype(np.intp))
+
     def to_dict(self) -> dict:
         """
         Get the configuration object as a dictionary
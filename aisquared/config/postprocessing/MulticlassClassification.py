@@ -1,4 +1,6 @@
 from aisquared.base import BaseObject
+from .execution import gather_labels
+import numpy as np
 
 
 class MulticlassClassification(BaseObject):
@@ -43,6 +45,26 @@ class MulticlassClassification(BaseObject):
                 'For multiclass classification, the label map must have more than two values. If there are only two values, use the `BinaryClassification` class')
         self._label_map = value
 
+    def transform(self, predictions) -> np.ndarray:
+        """
+        Get the labels of a batch of predictions
+
+        Parameters
+        ----------
+        predictions : array-like
+            The predicted score of each value of the label map, with shape (batch, classes)
+
+        Returns
+        -------
+        labels : np.ndarray
+            The value of the label map with the highest score for each prediction
+        """
+        predictions = np.asarray(predictions)
+        if predictions.ndim != 2 or predictions.shape[1] != len(self.label_map):
+            raise ValueError(
+                f'predictions must have shape (batch, {len(self.label_map)})')
+        return gather_labels(self.label_map, predictions.argmax(axis=1))
+
     def to_dict(self) -> dict:
         """
         Get the configuration object as a dictionary
@@ -1,4 +1,6 @@
 from aisquared.base import BaseObject
+from .execution import gather_labels, non_max_suppression
+import numpy as np
 
 
 class ObjectDetection(BaseObject):
@@ -56,6 +58,74 @@ class ObjectDetection(BaseObject):
             raise ValueError('threshold must be between 0 and 1')
         self._threshold = value
 
+    def transform(self, boxes, scores, classes=None, iou_threshold: float = 0.5) -> dict:
+        """
+        Get the detections of a batch of images, keeping boxes with a score of at least the
+        threshold and removing overlapping boxes of the same class with non-maximum
+        suppression. All images are processed at once
+
+        Parameters
+        ----------
+        boxes : array-like
+            The predicted boxes, with shape (batch, num_boxes, 4), with the coordinates of each
+            box given as (y_min, x_min, y_max, x_max)
+        scores : array-like
+            The score of each box, with shape (batch, num_boxes), or the score of each box for
+            each value of the label map, with shape (batch, num_boxes, classes)
+        classes : array-like or None (default None)
+            The index into the label map of the class of each box, with shape
+            (batch, num_boxes). Required if `scores` has one score per box, and otherwise
+            taken to be the class with the highest score
+        iou_threshold : float or None (default 0.5)
+            Boxes which overlap a higher-scoring box of the same class by an intersection over
+            union greater than this are removed. If None, no boxes are removed
+
+        Returns
+        -------
+        detections : dict
+            Dictionary of arrays with one entry per kept box, ordered by image and then by
+            decreasing score: 'index', the index of the image in the batch, 'boxes',
+            'scores', 'classes', and 'labels'
+        """
+        boxes = np.asarray(boxes)
+        scores = np.asarray(scores)
+        if boxes.ndim != 3 or boxes.shape[-1] != 4:
+            raise ValueError('boxes must have shape (batch, num_boxes, 4)')
+        if scores.ndim == 3:
+            classes = scores.argmax(axis=-1)
+            scores = np.take_along_axis(
+                scores, classes[..., np.newaxis], axis=-1)[..., 0]
+        elif classes is None:
+            raise ValueError(
+                'classes must be provided if scores has shape (batch, num_boxes)')
+        classes = np.asarray(classes).astype(np.intp)
+        if scores.shape != boxes.shape[:2] or classes.shape != boxes.shape[:2]:
+            raise ValueError(
+                'scores and classes must have shape (batch, num_boxes)')
+
+        keep = scores >= self.threshold
+        if iou_threshold is not None and keep.any():
+            # Only the columns which hold a candidate in some image take part in suppression
+            candidates = keep.any(axis=0)
+            keep[:, candidates] = non_max_suppression(
+                boxes[:, candidates],
+                scores[:, candidates],
+                keep[:, candidates],
+                iou_threshold,
+                classes[:, candidates]
+            )
+
+        index, position = np.nonzero(keep)
+        order = np.lexsort((-scores[index, position], index))
+        index, position = index[order], position[order]
+        return {
+            'index': index,
+            'boxes': boxes[index, position],
+            'scores': scores[index, position],
+            'classes': classes[index, position],
+            'labels': gather_labels(self.label_map, classes[index, position])
+        }
+
     def to_dict(self) -> dict:
         """
         Get the configuration object as a dictionary
@@ -1,5 +1,6 @@
 from typing import Union
 from aisquared.base import BaseObject
+import numpy as np
 
 
 class Regression(BaseObject):
@@ -69,6 +70,33 @@ class Regression(BaseObject):
             raise TypeError('round must be Boolean valued')
         self._round = value
 
+    def transform(self, predictions) -> np.ndarray:
+        """
+        Scale a batch of predictions
+
+        Parameters
+        ----------
+        predictions : array-like
+            The model outputs, of any shape
+
+        Returns
+        -------
+        output : np.ndarray
+            The float64 predictions, with 0 mapped to `min` and 1 mapped to `max`, and rounded
+            if `round` is True. If `min` or `max` is None, 0 or 1 respectively is left unchanged
+        """
+        output = np.array(predictions, dtype=np.float64)
+        low = 0 if self.min is None else self.min
+        high = 1 if self.max is None else self.max
+        if (low, high) != (0, 1):
+            output *= high - low
+            output += low
+        if self.round:
+            # Halves are rounded up, as with JavaScript's Math.round, rather than to even
+            output += 0.5
+            np.floor(output, out=output)
+        return output
+
     def to_dict(self) -> dict:
         """
         Get the configuration object as a dictionary
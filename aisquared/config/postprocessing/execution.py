@@ -0,0 +1,109 @@
+"""
+Vectorized execution of postprocessing steps over batches of model outputs.
+"""
+
+import numpy as np
+
+
+def gather_labels(label_map: list, indexes: np.ndarray) -> np.ndarray:
+    """
+    Map an array of integer indexes to the values of a label map
+
+    Parameters
+    ----------
+    label_map : list
+        The values to map indexes to
+    indexes : np.ndarray
+        Integer indexes into `label_map`
+
+    Returns
+    -------
+    labels : np.ndarray
+        Array of the same shape as `indexes`. Labels of mixed types are returned as an object
+        array, so that each value is kept as is
+    """
+    if len(set([type(label) for label in label_map])) == 1:
+        labels = np.asarray(label_map)
+    else:
+        labels = np.empty(len(label_map), dtype=object)
+        labels[:] = label_map
+    return labels[indexes]
+
+
+def box_iou(boxes: np.ndarray) -> np.ndarray:
+    """
+    Compute the intersection over union of every pair of boxes within each batch
+
+    Parameters
+    ----------
+    boxes : np.ndarray
+        Array of shape (batch, num_boxes, 4), with the coordinates of each box given as
+        (y_min, x_min, y_max, x_max)
+
+    Returns
+    -------
+    iou : np.ndarray
+        Array of shape (batch, num_boxes, num_boxes)
+    """
+    boxes = boxes.astype(np.float64, copy=False)
+    areas = np.clip(boxes[..., 2] - boxes[..., 0], 0, None) * \
+        np.clip(boxes[..., 3] - boxes[..., 1], 0, None)
+    top_left = np.maximum(boxes[:, :, np.newaxis, :2], boxes[:, np.newaxis, :, :2])
+    bottom_right = np.minimum(boxes[:, :, np.newaxis, 2:], boxes[:, np.newaxis, :, 2:])
+    sizes = np.clip(bottom_right - top_left, 0, None)
+    intersections = sizes[..., 0] * sizes[..., 1]
+    unions = areas[:, :, np.newaxis] + areas[:, np.newaxis, :] - intersections
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(unions > 0, intersections / unions, 0)
+
+
+def non_max_suppression(boxes: np.ndarray, scores: np.ndarray, valid: np.ndarray, iou_threshold: float, classes: np.ndarray = None) -> np.ndarray:
+    """
+    Greedy non-maximum suppression over a batch of images at once
+
+    A box is kept if no kept box with a higher score overlaps it by more than `iou_threshold`.
+    Rather than visiting boxes one at a time, every box is updated at once from the boxes
+    currently kept, which is repeated until nothing changes. After `k` updates, the `k`
+    highest-scoring boxes of every image are decided, so the result is exactly that of the
+    greedy algorithm, typically after only a few updates
+
+    Parameters
+    ----------
+    boxes : np.ndarray
+        Array of shape (batch, num_boxes, 4)
+    scores : np.ndarray
+        Array of shape (batch, num_boxes)
+    valid : np.ndarray
+        Boolean array of shape (batch, num_boxes) of the boxes which can be kept
+    iou_threshold : float
+        Boxes overlapping a kept box by more than this are suppressed
+    classes : np.ndarray or None (default None)
+        If provided, array of shape (batch, num_boxes) of the class of each box. Boxes only
+        suppress boxes of the same class
+
+    Returns
+    -------
+    keep : np.ndarray
+        Boolean array of shape (batch, num_boxes) of the boxes which are kept
+    """
+    order = np.argsort(-scores, axis=1, kind='stable')
+    boxes = np.take_along_axis(boxes, order[..., np.newaxis], axis=1)
+    valid = np.take_along_axis(valid, order, axis=1)
+
+    # suppresses[b, i, j] is True if box i would suppress box j when kept
+    suppresses = box_iou(boxes) > iou_threshold
+    suppresses &= np.triu(np.ones(suppresses.shape[1:], dtype=bool), k=1)
+    if classes is not None:
+        classes = np.take_along_axis(classes, order, axis=1)
+        suppresses &= classes[:, :, np.newaxis] == classes[:, np.newaxis, :]
+
+    keep = valid
+    while True:
+        updated = valid & ~np.matmul(keep[:, np.newaxis, :], suppresses)[:, 0]
+        if (updated == keep).all():
+            break
+        keep = updated
+
+    result = np.empty_like(keep)
+    np.put_along_axis(result, order, keep, axis=1)
+    return result
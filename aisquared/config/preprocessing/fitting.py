@@ -0,0 +1,271 @@
+"""
+Streaming statistics used to fit preprocessing steps from data.
+
+Every statistic is computed chunk by chunk and can be merged with the statistics of other
+chunks, so that a dataset is read exactly once, optionally with chunks processed in parallel
+worker processes.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import collections
+import pandas as pd
+import numpy as np
+
+# When a maximum number of values is kept, this many times as many candidates are counted
+COUNT_CAPACITY_FACTOR = 10
+
+
+class Moments:
+    """
+    Running count, mean, variance, minimum, and maximum of each column, using Welford's
+    algorithm as generalized by Chan et al. to merge the moments of separate chunks. Missing
+    values are ignored
+    """
+
+    def __init__(self, num_columns: int):
+        self.count = np.zeros(num_columns)
+        self.mean = np.zeros(num_columns)
+        self.m2 = np.zeros(num_columns)
+        self.min = np.full(num_columns, np.inf)
+        self.max = np.full(num_columns, -np.inf)
+
+    @classmethod
+    def from_chunk(cls, values: np.ndarray):
+        """
+        Compute the moments of a two-dimensional chunk of values
+        """
+        values = np.asarray(values, dtype=np.float64)
+        moments = cls(values.shape[1])
+        valid = ~np.isnan(values)
+        moments.count = valid.sum(axis=0).astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            moments.mean = np.where(
+                moments.count > 0, np.nansum(values, axis=0) / moments.count, 0)
+        moments.m2 = np.nansum((values - moments.mean) ** 2, axis=0)
+        moments.min = np.where(valid, values, np.inf).min(axis=0, initial=np.inf)
+        moments.max = np.where(valid, values, -np.inf).max(axis=0, initial=-np.inf)
+        return moments
+
+    def merge(self, other) -> None:
+        """
+        Merge the moments of another chunk into these moments
+        """
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = np.where(count > 0, other.count / count, 0)
+        self.mean = self.mean + delta * weight
+        self.m2 = self.m2 + other.m2 + delta ** 2 * self.count * weight
+        self.count = count
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+
+    @property
+    def std(self) -> np.ndarray:
+        """
+        The population standard deviation of each column
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.sqrt(np.where(self.count > 0, self.m2 / self.count, 0))
+
+    @property
+    def scale(self) -> np.ndarray:
+        """
+        The standard deviation of each column to normalize with, which is one for columns with
+        a standard deviation of zero, so that they are only centered
+        """
+        std = self.std
+        return np.where(std > 0, std, 1.0)
+
+    @property
+    def bounds(self) -> tuple:
+        """
+        The minimum and maximum of each column to scale with. Columns holding a single value
+        have their maximum widened to one above their minimum, and columns without any values
+        are given bounds of zero and one, so that scaling never divides by zero
+        """
+        empty = ~(np.isfinite(self.min) & np.isfinite(self.max))
+        mins = np.where(empty, 0.0, self.min)
+        maxs = np.where(empty, 1.0, self.max)
+        return mins, np.where(maxs > mins, maxs, mins + 1)
+
+
+class Counts:
+    """
+    Counts of distinct values, optionally bounded to the `capacity` most frequent values
+
+    When bounded, the least frequent values are discarded whenever more than `capacity`
+    distinct values are held, so counts of values near the cutoff are approximate
+    """
+
+    def __init__(self, capacity: int = None):
+        self.capacity = capacity
+        self.counts = collections.Counter()
+
+    def update(self, values) -> None:
+        """
+        Count an iterable of values
+        """
+        self.counts.update(values)
+        self._prune()
+
+    def merge(self, other) -> None:
+        """
+        Merge the counts of another chunk into these counts
+        """
+        self.counts.update(other.counts)
+        self._prune()
+
+    def _prune(self) -> None:
+        if self.capacity is not None and len(self.counts) > self.capacity:
+            self.counts = collections.Counter(
+                dict(self.counts.most_common(self.capacity)))
+
+    def most_common(self, n: int = None) -> list:
+        """
+        Get the `n` most frequent values, most frequent first. Ties are ordered by value, so
+        that the result does not depend on the order chunks were processed in
+        """
+        values = sorted(self.counts.items(), key=lambda item: (-item[1], str(item[0])))
+        return [value for value, _ in values[:n]]
+
+
+def get_capacity(max_values: int = None):
+    """
+    Get the number of distinct values to count when keeping at most `max_values` values
+    """
+    if max_values is None:
+        return None
+    return max(max_values * COUNT_CAPACITY_FACTOR, 1)
+
+
+def to_array(chunk) -> np.ndarray:
+    """
+    Convert a tabular chunk to a two-dimensional array
+    """
+    if isinstance(chunk, pd.DataFrame):
+        chunk = chunk.to_numpy()
+    chunk = np.asarray(chunk)
+    if chunk.ndim == 1:
+        chunk = chunk[:, np.newaxis]
+    if chunk.ndim != 2:
+        raise ValueError('Each chunk must be two-dimensional')
+    return chunk
+
+
+def map_chunks(function, chunks, args: tuple = (), workers: int = None):
+    """
+    Apply `function(chunk, *args)` to every chunk, yielding the results in order
+
+    Parameters
+    ----------
+    function : callable
+        Module-level function to apply
+    chunks : iterable
+        The chunks to process. Only a bounded number of chunks is read ahead
+    args : tuple (default ())
+        Additional arguments to pass to `function`
+    workers : int or None (default None)
+        The number of worker processes to use. If None or 1, chunks are processed in the
+        current process
+    """
+    if workers is not None and (not isinstance(workers, int) or workers < 1):
+        raise ValueError('workers must be a positive integer or None')
+    if workers is None or workers == 1:
+        for chunk in chunks:
+            yield function(chunk, *args)
+        return
+
+    # Spawned rather than forked, since TensorFlow is not fork-safe
+    with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn')
+    ) as executor:
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(executor.submit(function, chunk, *args))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def tabular_statistics(chunk, moment_columns: list, count_columns: list, capacity: int = None) -> tuple:
+    """
+    Compute the moments and value counts of the columns of a tabular chunk
+
+    Parameters
+    ----------
+    chunk : array-like or pd.DataFrame
+        Two-dimensional chunk of data
+    moment_columns : list or None
+        The numeric columns to compute moments of. If None, all columns are used
+    count_columns : list
+        The columns to count values of
+    capacity : int or None (default None)
+        The maximum number of distinct values to count in each column
+
+    Returns
+    -------
+    moments : Moments
+        The moments of `moment_columns`
+    counts : dict
+        Mapping from each of `count_columns` to its Counts
+    """
+    chunk = to_array(chunk)
+    if moment_columns is None:
+        moment_columns = list(range(chunk.shape[1]))
+    moments = Moments.from_chunk(chunk[:, moment_columns])
+    counts = {}
+    for column in count_columns:
+        counts[column] = Counts(capacity)
+        counts[column].update(
+            pd.Series(chunk[:, column]).dropna().value_counts(sort=False).to_dict())
+    return moments, counts
+
+
+def fit_tabular(chunks, moment_columns: list = None, count_columns: list = None, max_values: int = None, workers: int = None) -> tuple:
+    """
+    Compute the moments and value counts of the columns of a tabular dataset in one pass
+
+    Parameters
+    ----------
+    chunks : iterable
+        Iterable of two-dimensional arrays or DataFrames
+    moment_columns : list or None (default None)
+        The numeric columns to compute moments of. If None, all columns are used
+    count_columns : list or None (default None)
+        The columns to count values of
+    max_values : int or None (default None)
+        If provided, the number of most frequent values which need to be known for each
+        counted column, which bounds the number of distinct values counted
+    workers : int or None (default None)
+        The number of worker processes to use
+
+    Returns
+    -------
+    moments : Moments
+        The moments of `moment_columns`
+    counts : dict
+        Mapping from each of `count_columns` to its Counts
+    """
+    moments, counts = None, None
+    args = (moment_columns, count_columns or [], get_capacity(max_values))
+    for chunk_moments, chunk_counts in map_chunks(tabular_statistics, chunks, args, workers):
+        if moments is None:
+            moments, counts = chunk_moments, chunk_counts
+            continue
+        moments.merge(chunk_moments)
+        for column, column_counts in chunk_counts.items():
+            counts[column].merge(column_counts)
+    if moments is None:
+        raise ValueError('chunks must contain at least one chunk')
+    return moments, counts
+
+
+def to_python(value):
+    """
+    Convert NumPy scalars to the equivalent Python values, so that they can be serialized
+    """
+    return value.item() if isinstance(value, np.generic) else value
@@ -0,0 +1,200 @@
+from .Steps import AddValue, SubtractValue, MultiplyValue, DivideValue, ConvertToColor, Resize
+import tensorflow as tf
+import numpy as np
+import collections
+
+# Weights used by `tf.image.rgb_to_grayscale`
+_GRAYSCALE_WEIGHTS = np.array([0.2989, 0.5870, 0.1140], dtype=np.float32)
+
+# A run of consecutive arithmetic steps, folded into `output = image * scale + offset`
+Affine = collections.namedtuple('Affine', ['scale', 'offset'])
+
+
+class ImagePlan:
+    """
+    Batched execution plan for a list of image preprocessing steps
+
+    Each run of consecutive AddValue, SubtractValue, MultiplyValue, and DivideValue steps is
+    folded into a single affine operation, `output = image * scale + offset`, which is applied at
+    the position of the run. The run after the last color conversion or resize, which is the
+    only run of most step lists, is applied as the result is written into the output buffer.
+
+    Output buffers are preallocated float32 arrays which are reused for every batch of the same
+    shape. The array returned by `transform` is therefore overwritten by the next call, and
+    should be copied if it needs to be kept. Plans are not thread-safe.
+
+    Example usage:
+
+    >>> import numpy as np
+    >>> import aisquared
+    >>> plan = aisquared.config.preprocessing.image.ImagePlan(
+        [
+            aisquared.config.preprocessing.image.Resize([224, 224]),
+            aisquared.config.preprocessing.image.DivideValue(255.0)
+        ]
+    )
+    >>> plan.transform(np.zeros((32, 480, 640, 3), dtype=np.uint8)).shape
+    (32, 224, 224, 3)
+    """
+
+    def __init__(
+            self,
+            steps: list
+    ):
+        """
+        Parameters
+        ----------
+        steps : list
+            List of image preprocessing steps, applied in order
+        """
+        # Operations before the final run of arithmetic steps, which are ConvertToColor and
+        # Resize steps and Affine operations for earlier runs, and the final run's scale and offset
+        self.operations = []
+        self.scale = np.float32(1)
+        self.offset = np.float32(0)
+        for step in steps or []:
+            if isinstance(step, AddValue):
+                self.offset += np.float32(step.value)
+            elif isinstance(step, SubtractValue):
+                self.offset -= np.float32(step.value)
+            elif isinstance(step, MultiplyValue):
+                self.scale *= np.float32(step.value)
+                self.offset *= np.float32(step.value)
+            elif isinstance(step, DivideValue):
+                self.scale /= np.float32(step.value)
+                self.offset /= np.float32(step.value)
+            elif isinstance(step, (ConvertToColor, Resize)):
+                if self.scale != 1 or self.offset != 0:
+                    self.operations.append(Affine(self.scale, self.offset))
+                    self.scale, self.offset = np.float32(1), np.float32(0)
+                self.operations.append(step)
+            else:
+                raise TypeError(
+                    f'Each step must be one of {(AddValue, SubtractValue, MultiplyValue, DivideValue, ConvertToColor, Resize)}')
+        self._buffers = {}
+
+    def _buffer(self, shape: tuple) -> np.ndarray:
+        """
+        Get a float32 buffer of the given shape, reusing a previously allocated one if possible
+        """
+        buffer = self._buffers.get(shape[1:])
+        if buffer is None or buffer.shape[0] < shape[0]:
+            buffer = np.empty(shape, dtype=np.float32)
+            self._buffers[shape[1:]] = buffer
+        return buffer[:shape[0]]
+
+    @staticmethod
+    def _convert_color(images: np.ndarray, color: str) -> np.ndarray:
+        channels = images.shape[-1]
+        if color == 'RGB':
+            if channels == 1:
+                return np.repeat(images, 3, axis=-1)
+            return images[..., :3]
+        if channels == 1:
+            return images
+        gray = np.tensordot(images[..., :3].astype(np.float32, copy=False),
+                            _GRAYSCALE_WEIGHTS, axes=([-1], [0]))
+        return gray[..., np.newaxis]
+
+    @staticmethod
+    def _resize(images: np.ndarray, step: Resize) -> np.ndarray:
+        resized = tf.image.resize(
+            images,
+            step.size,
+            method=step.method,
+            preserve_aspect_ratio=step.preserve_aspect_ratio
+        )
+        return resized.numpy()
+
+    def _prepare(self, images: np.ndarray) -> np.ndarray:
+        """
+        Run the operations before the final run of arithmetic steps on a batch of images of
+        the same shape
+        """
+        for step in self.operations:
+            if isinstance(step, Affine):
+                images = np.multiply(images, step.scale, dtype=np.float32)
+                images += step.offset
+            elif isinstance(step, ConvertToColor):
+                images = self._convert_color(images, step.color)
+            else:
+                images = self._resize(images, step)
+        return images
+
+    def _affine(self, images: np.ndarray, out: np.ndarray) -> np.ndarray:
+        np.multiply(images, self.scale, out=out, casting='unsafe')
+        out += self.offset
+        return out
+
+    def transform(self, images):
+        """
+        Run the plan on a batch of images
+
+        Parameters
+        ----------
+        images : np.ndarray or list
+            Four-dimensional array of images with shape (batch, height, width, channels), or a
+            list of images with shape (height, width, channels) or (height, width), which may
+            differ in size
+
+        Returns
+        -------
+        output : np.ndarray or list
+            The float32 preprocessed images, as an array of shape (batch, height, width,
+            channels) taken from the buffer pool. If the preprocessed images differ in size,
+            which can happen when resizing with `preserve_aspect_ratio`, a list of arrays is
+            returned instead
+        """
+        if isinstance(images, np.ndarray) and images.ndim == 4:
+            prepared = self._prepare(images)
+            return self._affine(prepared, self._buffer(prepared.shape))
+
+        images = [np.asarray(image) for image in images]
+        images = [image[..., np.newaxis] if image.ndim ==
+                  2 else image for image in images]
+        if any([image.ndim != 3 for image in images]):
+            raise ValueError(
+                'Each image must have shape (height, width, channels) or (height, width)')
+
+        # Images of the same shape are converted and resized together
+        groups = {}
+        for i, image in enumerate(images):
+            groups.setdefault((image.shape, image.dtype.str), []).append(i)
+        prepared = [
+            (indexes, self._prepare(np.stack([images[i] for i in indexes])))
+            for indexes in groups.values()
+        ]
+
+        shapes = set([batch.shape[1:] for _, batch in prepared])
+        if len(shapes) != 1:
+            results = [None] * len(images)
+            for indexes, batch in prepared:
+                for i, image in zip(indexes, batch):
+                    results[i] = self._affine(
+                        image, np.empty(image.shape, dtype=np.float32))
+            return results
+
+        out = self._buffer((len(images),) + shapes.pop())
+        if len(prepared) == 1:
+            return self._affine(prepared[0][1], out)
+        for indexes, batch in prepared:
+            out[indexes] = batch * self.scale + self.offset
+        return out
+
+    def transform_batches(self, batches):
+        """
+        Run the plan over an iterable of batches of images, reusing the same output buffers for
+        every batch
+
+        Parameters
+        ----------
+        batches : iterable
+            Iterable of batches, each of which is accepted by `transform`
+
+        Yields
+        ------
+        output : np.ndarray or list
+            The float32 preprocessed images of each batch
+        """
+        for batch in batches:
+            yield self.transform(batch)
@@ -1,5 +1,7 @@
 from aisquared.base import BaseObject
 from .Steps import AddValue, SubtractValue, MultiplyValue, DivideValue, ConvertToColor, Resize
+from .ImagePlan import ImagePlan
+from .optimization import optimize_steps
 
 ALLOWED_STEPS = (
     AddValue,
@@ -15,6 +17,9 @@ class ImagePreprocesser(BaseObject):
     """
     Preprocesser object for image data
 
+    The steps can also be run in Python with `transform` and `transform_batches`, which use a
+    batched `ImagePlan`.
+
     Example usage:
 
     >>> import aisquared
@@ -60,6 +65,65 @@ class ImagePreprocesser(BaseObject):
         else:
             self.steps = self.steps + [step]
 
+    def get_plan(self) -> ImagePlan:
+        """
+        Compile the steps into a batched execution plan, which can be kept to reuse its output
+        buffers across batches
+        """
+        return ImagePlan(self.steps)
+
+    def transform(self, images):
+        """
+        Run the preprocessing steps on a batch of images
+
+        Parameters
+        ----------
+        images : np.ndarray or list
+            Four-dimensional array of images with shape (batch, height, width, channels), or a
+            list of images with shape (height, width, channels) or (height, width)
+
+        Returns
+        -------
+        output : np.ndarray or list
+            The float32 preprocessed images. See `ImagePlan.transform`
+        """
+        return self.get_plan().transform(images)
+
+    def transform_batches(self, batches):
+        """
+        Run the preprocessing steps over an iterable of batches of images, reusing the same
+        output buffers for every batch. Each yielded array is overwritten by the next batch
+
+        Parameters
+        ----------
+        batches : iterable
+            Iterable of batches, each of which is accepted by `transform`
+
+        Yields
+        ------
+        output : np.ndarray or list
+            The float32 preprocessed images of each batch
+        """
+        return self.get_plan().transform_batches(batches)
+
+    def optimize(self) -> list:
+        """
+        Optimize the steps in place, so that they do less work while producing the same output.
+        Consecutive arithmetic steps are folded into at most two steps and repeated steps
+        are removed
+
+        Returns
+        -------
+        changes : list
+            Descriptions of each change made
+        """
+        if self.steps is None:
+            return []
+        steps, changes = optimize_steps(self.steps)
+        if changes:
+            self.steps = steps
+        return changes
+
     def to_dict(self) -> dict:
         """
         Get the configuration object as a dictionary
@@ -3,4 +3,5 @@ The aisquared.config.preprocessing.image subpackage contains objects for configu
 """
 
 from .ImagePreprocessing import ImagePreprocesser
+from .ImagePlan import ImagePlan
 from .Steps import *
@@ -0,0 +1,108 @@
+"""
+Optimization of image preprocessing steps.
+
+Runs of consecutive AddValue, SubtractValue, MultiplyValue, and DivideValue steps are folded into
+at most one shift followed by at most one scaling step, runs which leave images unchanged are
+removed, and ConvertToColor and Resize steps which repeat the previous step are removed.
+"""
+
+from .Steps import AddValue, SubtractValue, MultiplyValue, DivideValue, ConvertToColor, Resize
+
+ARITHMETIC_STEPS = (AddValue, SubtractValue, MultiplyValue, DivideValue)
+
+# Resize methods which leave an image unchanged when resizing it to its own size
+INTERPOLATING_METHODS = ('bilinear', 'lanczos3', 'lanczos5', 'bicubic', 'nearest', 'area')
+
+
+def _describe(step) -> str:
+    if isinstance(step, ARITHMETIC_STEPS):
+        return f'{type(step).__name__}({step.value})'
+    return f'{type(step).__name__}({list(step.to_dict()["params"].values())})'
+
+
+def _is_repeated(step, previous) -> bool:
+    if type(step) is not type(previous) or step.to_dict() != previous.to_dict():
+        return False
+    return isinstance(step, ConvertToColor) or step.method in INTERPOLATING_METHODS
+
+
+def _fold(run: list) -> list:
+    """
+    Fold arithmetic steps into the equivalent shift and scaling steps
+    """
+    scale, offset = 1.0, 0.0
+    for step in run:
+        if isinstance(step, AddValue):
+            offset += step.value
+        elif isinstance(step, SubtractValue):
+            offset -= step.value
+        elif isinstance(step, MultiplyValue):
+            scale, offset = scale * step.value, offset * step.value
+        else:
+            scale, offset = scale / step.value, offset / step.value
+
+    # image * scale + offset == (image + offset / scale) * scale
+    folded = []
+    shift = offset / scale
+    if shift > 0:
+        folded.append(AddValue(shift))
+    elif shift < 0:
+        folded.append(SubtractValue(-shift))
+    if scale != 1:
+        if any([isinstance(step, DivideValue) for step in run]):
+            folded.append(DivideValue(1 / scale))
+        else:
+            folded.append(MultiplyValue(scale))
+    return folded
+
+
+def optimize_steps(steps: list) -> tuple:
+    """
+    Optimize a list of image preprocessing steps
+
+    Parameters
+    ----------
+    steps : list
+        List of image preprocessing steps. The steps are not modified
+
+    Returns
+    -------
+    steps : list
+        The optimized list of steps, which produces the same output
+    changes : list
+        Descriptions of each change made
+    """
+    steps = list(steps or [])
+    optimized, changes = [], []
+    i = 0
+    while i < len(steps):
+        step = steps[i]
+        if isinstance(step, ARITHMETIC_STEPS):
+            end = i
+            while end < len(steps) and isinstance(steps[end], ARITHMETIC_STEPS):
+                end += 1
+            run = steps[i:end]
+            # A run containing a multiplication by zero, or a division by zero, is left as is
+            if any([step.value == 0 for step in run if isinstance(step, (MultiplyValue, DivideValue))]):
+                optimized.extend(run)
+            else:
+                folded = _fold(run)
+                if not folded:
+                    changes.append(
+                        f'Removed {", ".join([_describe(s) for s in run])}, which leave images unchanged')
+                elif len(folded) < len(run):
+                    changes.append(
+                        f'Folded {", ".join([_describe(s) for s in run])} into {", ".join([_describe(s) for s in folded])}')
+                else:
+                    folded = run
+                optimized.extend(folded)
+            i = end
+            continue
+
+        if optimized and _is_repeated(step, optimized[-1]):
+            changes.append(
+                f'Removed {_describe(step)}, which repeats the previous step')
+        else:
+            optimized.append(step)
+        i += 1
+    return optimized, changes
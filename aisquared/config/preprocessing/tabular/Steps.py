@@ -1,5 +1,6 @@
 from typing import Union
 from aisquared.base import BaseObject
+from ..fitting import fit_tabular, to_python
 
 
 class ZScore(BaseObject):
@@ -83,6 +84,36 @@ class ZScore(BaseObject):
             raise TypeError('Each value of columns must be an int')
         self._columns = value
 
+    @classmethod
+    def fit(cls, chunks, columns: list = None, workers: int = None):
+        """
+        Create a ZScore step from the means and standard deviations of a dataset, computed in a
+        single streaming pass. Columns with a standard deviation of zero are given a standard
+        deviation of one, so that they are only centered
+
+        Example usage:
+
+        >>> import pandas as pd
+        >>> import aisquared
+        >>> step = aisquared.config.preprocessing.tabular.ZScore.fit(
+            pd.read_csv('data.csv', chunksize=100000),
+            columns=[0, 1, 2]
+        )
+
+        Parameters
+        ----------
+        chunks : iterable
+            Iterable of two-dimensional arrays or DataFrames
+        columns : None or list (default None)
+            If provided, a list of column indexes to fit and apply normalization to. If None,
+            all columns are used
+        workers : int or None (default None)
+            The number of processes to compute chunk statistics in. If None or 1, chunks are
+            processed in the current process
+        """
+        moments, _ = fit_tabular(chunks, columns, workers=workers)
+        return cls(moments.mean.tolist(), moments.scale.tolist(), columns)
+
     def to_dict(self) -> dict:
         """
         Get the configuration object as a dictionary
@@ -181,6 +212,29 @@ class MinMax(BaseObject):
                     'If passed, each value in columns must be an int')
         self._columns = value
 
+    @classmethod
+    def fit(cls, chunks, columns: list = None, workers: int = None):
+        """
+        Create a MinMax step from the minimum and maximum values of a dataset, computed in a
+        single streaming pass. Columns holding a single value are given a maximum of one above
+        their minimum, and columns without any values are given bounds of zero and one, so
+        that scaling never divides by zero
+
+        Parameters
+        ----------
+        chunks : iterable
+            Iterable of two-dimensional arrays or DataFrames
+        columns : None or list (default None)
+            If provided, a list of column indexes to fit and apply scaling to. If None, all
+            columns are used
+        workers : int or None (default None)
+            The number of processes to compute chunk statistics in. If None or 1, chunks are
+            processed in the current process
+        """
+        moments, _ = fit_tabular(chunks, columns, workers=workers)
+        mins, maxs = moments.bounds
+        return cls(mins.tolist(), maxs.tolist(), columns)
+
     def to_dict(self) -> dict:
         """
         Get the configuration object as a dictionary
@@ -249,6 +303,29 @@ class OneHot(BaseObject):
             raise TypeError('values must be list')
         self._values = value
 
+    @classmethod
+    def fit(cls, chunks, column: int, max_values: int = None, workers: int = None):
+        """
+        Create a OneHot step from the distinct values of a column of a dataset, counted in a
+        single streaming pass. Values are ordered from most to least frequent
+
+        Parameters
+        ----------
+        chunks : iterable
+            Iterable of two-dimensional arrays or DataFrames
+        column : int
+            Integer index of the column to fit and apply one hot encoding to
+        max_values : int or None (default None)
+            If provided, only the `max_values` most frequent values are kept. The number of
+            distinct values counted is then bounded, so the counts of rare values are
+            approximate
+        workers : int or None (default None)
+            The number of processes to count chunk values in. If None or 1, chunks are
+            processed in the current process
+        """
+        _, counts = fit_tabular(chunks, [], [column], max_values, workers)
+        return cls(column, [to_python(value) for value in counts[column].most_common(max_values)])
+
     def to_dict(self) -> dict:
         """
         Get the configuration object as a dictionary
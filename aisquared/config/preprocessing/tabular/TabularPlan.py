@@ -0,0 +1,293 @@
+from .Steps import ZScore, MinMax, OneHot, DropColumn
+import pandas as pd
+import numpy as np
+
+try:
+    import scipy.sparse
+except ImportError:
+    scipy = None
+
+DEFAULT_CHUNK_SIZE = 65536
+
+
+class TabularPlan:
+    """
+    Fused execution plan for a list of tabular preprocessing steps
+
+    The steps are compiled into a single affine transformation of each output column,
+    `output = input * scale + offset`, where each output column is either a numeric input
+    column or the indicator of a one hot encoded value. Running the plan takes a single pass
+    over the data, no matter how many steps there are.
+
+    With `sparse=True`, the output is a `scipy.sparse.csr_matrix`. One hot indicator columns are
+    then stored by index, so that each encoded column costs one entry per row rather than one
+    per category. Indicators which have been shifted by a later ZScore or MinMax step are no
+    longer zero for other categories, and are stored like numeric columns.
+
+    Example usage:
+
+    >>> import numpy as np
+    >>> import aisquared
+    >>> plan = aisquared.config.preprocessing.tabular.TabularPlan(
+        [
+            aisquared.config.preprocessing.tabular.ZScore([1], [2], [0]),
+            aisquared.config.preprocessing.tabular.OneHot(1, [2, 6])
+        ],
+        2
+    )
+    >>> plan.transform(np.array([[3, 2], [1, 6]]))
+    array([[1., 1., 0.],
+           [0., 0., 1.]], dtype=float32)
+    """
+
+    def __init__(
+            self,
+            steps: list,
+            num_columns: int
+    ):
+        """
+        Parameters
+        ----------
+        steps : list
+            List of ZScore, MinMax, OneHot, and DropColumn steps, applied in order
+        num_columns : int
+            The number of columns of the input data
+        """
+        if not isinstance(num_columns, int) or num_columns < 0:
+            raise ValueError('num_columns must be a non-negative integer')
+        self.num_columns = num_columns
+
+        # Each output column is tracked as [source column, one hot value or None, scale, offset]
+        columns = [[i, None, 1.0, 0.0] for i in range(num_columns)]
+        one_hot_values = {}
+        for step in steps or []:
+            if isinstance(step, (ZScore, MinMax)):
+                if isinstance(step, ZScore):
+                    centers, widths = step.means, step.stds
+                else:
+                    centers = step.mins
+                    widths = [mx - mn for mn, mx in zip(step.mins, step.maxs)]
+                indexes = step.columns if step.columns is not None else list(
+                    range(len(columns)))
+                if len(indexes) != len(centers):
+                    raise ValueError(
+                        f'{type(step).__name__} has {len(centers)} values but is applied to {len(indexes)} columns')
+                for index, center, width in zip(indexes, centers, widths):
+                    column = columns[self._check_index(index, columns)]
+                    # (x * scale + offset - center) / width, where a width of zero gives
+                    # infinite or NaN values, as it would when dividing at runtime
+                    with np.errstate(divide='ignore', invalid='ignore'):
+                        column[2] = np.float64(column[2]) / width
+                        column[3] = (np.float64(column[3]) - center) / width
+            elif isinstance(step, OneHot):
+                index = self._check_index(step.column, columns)
+                source, value, scale, offset = columns[index]
+                if value is not None or scale != 1.0 or offset != 0.0:
+                    raise ValueError(
+                        'OneHot can only be applied to columns which have not been transformed')
+                one_hot_values[source] = list(step.values)
+                columns[index:index + 1] = [
+                    [source, i, 1.0, 0.0] for i in range(len(step.values))
+                ]
+            elif isinstance(step, DropColumn):
+                del columns[self._check_index(step.column, columns)]
+            else:
+                raise TypeError(
+                    f'Each step must be one of {(ZScore, MinMax, OneHot, DropColumn)}')
+
+        self.num_outputs = len(columns)
+        self.sources = np.array([c[0] for c in columns], dtype=np.intp)
+        self.value_indexes = np.array(
+            [-1 if c[1] is None else c[1] for c in columns], dtype=np.intp)
+        self.scales = np.array([c[2] for c in columns], dtype=np.float32)
+        self.offsets = np.array([c[3] for c in columns], dtype=np.float32)
+        self.one_hot_values = one_hot_values
+
+        self.one_hot_mask = self.value_indexes != -1
+        self.numeric_outputs = np.flatnonzero(~self.one_hot_mask)
+        self.numeric_sources = self.sources[self.numeric_outputs]
+
+        # For each one hot encoded column, the output position of each value's indicator, or
+        # -1 if the indicator has since been dropped
+        self.one_hot_outputs = {
+            source: np.full(len(values), -1, dtype=np.intp) for source, values in one_hot_values.items()
+        }
+        for output in np.flatnonzero(self.one_hot_mask):
+            self.one_hot_outputs[self.sources[output]
+                                 ][self.value_indexes[output]] = output
+        # Hash tables from each one hot encoded value to its position, built once
+        self.one_hot_indexes = {
+            source: pd.Index(values) for source, values in one_hot_values.items()
+        }
+
+        # Columns stored in every row of sparse output, and one hot indicators which are only
+        # stored in rows where they are set
+        self.sparse_mask = self.one_hot_mask & (self.offsets == 0)
+        self.dense_outputs = np.flatnonzero(~self.sparse_mask)
+
+    @staticmethod
+    def _check_index(index: int, columns: list) -> int:
+        if index < -len(columns) or index >= len(columns):
+            raise IndexError(
+                f'Column {index} is out of range for data with {len(columns)} columns')
+        return index % len(columns)
+
+    @property
+    def is_elementwise(self) -> bool:
+        """
+        Whether every output column is a transformation of the input column at the same
+        position, in which case the plan can be run in place
+        """
+        return self.num_outputs == self.num_columns and not self.one_hot_values and bool(
+            np.array_equal(self.sources, np.arange(self.num_columns)))
+
+    def _check_input(self, X):
+        if isinstance(X, pd.DataFrame):
+            X = X.to_numpy()
+        X = np.asarray(X)
+        if X.ndim != 2:
+            raise ValueError('X must be two-dimensional')
+        if X.shape[1] != self.num_columns:
+            raise ValueError(
+                f'Expected {self.num_columns} columns, got {X.shape[1]}')
+        return X
+
+    def _encode(self, X: np.ndarray, out: np.ndarray) -> None:
+        """
+        Write the one hot indicator columns of a chunk into `out`, which holds the offsets
+        """
+        for source, index in self.one_hot_indexes.items():
+            if len(index) == 0:
+                continue
+            rows, targets = self._one_hot_targets(X, source)
+            out[rows, targets] += self.scales[targets]
+
+    def _one_hot_targets(self, X: np.ndarray, source: int) -> tuple:
+        """
+        Get the rows of a chunk where a one hot encoded column has a known value, and the
+        output position of the indicator set in each of them
+        """
+        codes = self.one_hot_indexes[source].get_indexer(X[:, source])
+        targets = np.where(
+            codes >= 0, self.one_hot_outputs[source][codes], -1)
+        rows = np.flatnonzero(targets >= 0)
+        return rows, targets[rows]
+
+    def _run_sparse(self, X: np.ndarray):
+        num_rows = X.shape[0]
+        out = np.empty((num_rows, self.dense_outputs.size), dtype=np.float32)
+        dense = np.zeros(self.num_outputs, dtype=np.intp) - 1
+        dense[self.dense_outputs] = np.arange(self.dense_outputs.size)
+
+        if self.numeric_outputs.size:
+            numeric = X[:, self.numeric_sources].astype(np.float32)
+            numeric *= self.scales[self.numeric_outputs]
+            numeric += self.offsets[self.numeric_outputs]
+            out[:, dense[self.numeric_outputs]] = numeric
+        shifted = self.one_hot_mask & ~self.sparse_mask
+        out[:, dense[shifted]] = self.offsets[shifted]
+
+        rows, columns, data = [], [], []
+        for source in self.one_hot_indexes:
+            if len(self.one_hot_indexes[source]) == 0:
+                continue
+            hit_rows, targets = self._one_hot_targets(X, source)
+            values = self.scales[targets]
+            is_dense = dense[targets] >= 0
+            # Shifted indicators are already stored, so only their scale is added
+            out[hit_rows[is_dense], dense[targets[is_dense]]] += values[is_dense]
+            rows.append(hit_rows[~is_dense])
+            columns.append(targets[~is_dense])
+            data.append(values[~is_dense])
+
+        rows.append(np.repeat(np.arange(num_rows), self.dense_outputs.size))
+        columns.append(np.tile(self.dense_outputs, num_rows))
+        data.append(out.ravel())
+        return scipy.sparse.csr_matrix(
+            (np.concatenate(data), (np.concatenate(rows), np.concatenate(columns))),
+            shape=(num_rows, self.num_outputs)
+        )
+
+    def _run(self, X: np.ndarray, out: np.ndarray) -> None:
+        if self.numeric_outputs.size:
+            numeric = X[:, self.numeric_sources]
+            if numeric.dtype != np.float32:
+                numeric = numeric.astype(np.float32)
+            numeric *= self.scales[self.numeric_outputs]
+            numeric += self.offsets[self.numeric_outputs]
+            out[:, self.numeric_outputs] = numeric
+        if self.one_hot_values:
+            out[:, self.one_hot_mask] = self.offsets[self.one_hot_mask]
+            self._encode(X, out)
+
+    def transform(self, X, copy: bool = True, chunk_size: int = None, sparse: bool = False):
+        """
+        Run the plan on a batch of data
+
+        Parameters
+        ----------
+        X : array-like or pd.DataFrame
+            Two-dimensional data, with columns in the order the steps expect. Columns which are
+            one hot encoded may hold any values; all other columns must be numeric
+        copy : bool (default True)
+            If False and X is a float32 array which the plan transforms element-wise, X is
+            transformed in place and returned
+        chunk_size : int or None (default None)
+            The number of rows to process at once, bounding the memory used by intermediate
+            results. If None, defaults to 65,536 rows
+        sparse : bool (default False)
+            Whether to return a `scipy.sparse.csr_matrix`, storing one hot indicators by index
+
+        Returns
+        -------
+        output : np.ndarray or scipy.sparse.csr_matrix
+            The float32 preprocessed data
+        """
+        X = self._check_input(X)
+        chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+        if not isinstance(chunk_size, int) or chunk_size < 1:
+            raise ValueError('chunk_size must be a positive integer')
+
+        if sparse:
+            if scipy is None:
+                raise ImportError('scipy must be installed for sparse output')
+            return scipy.sparse.vstack(
+                [self._run_sparse(X[start:start + chunk_size])
+                 for start in range(0, max(X.shape[0], 1), chunk_size)],
+                format='csr'
+            )
+
+        if not copy and self.is_elementwise and X.dtype == np.float32 and X.flags.writeable:
+            for start in range(0, X.shape[0], chunk_size):
+                chunk = X[start:start + chunk_size]
+                chunk *= self.scales
+                chunk += self.offsets
+            return X
+
+        out = np.empty((X.shape[0], self.num_outputs), dtype=np.float32)
+        for start in range(0, X.shape[0], chunk_size):
+            self._run(X[start:start + chunk_size],
+                      out[start:start + chunk_size])
+        return out
+
+    def transform_chunks(self, chunks, copy: bool = True, sparse: bool = False):
+        """
+        Run the plan over an iterable of row chunks, such as the chunks of a CSV file read with
+        `pd.read_csv(..., chunksize=...)`, for data larger than memory
+
+        Parameters
+        ----------
+        chunks : iterable
+            Iterable of two-dimensional arrays or DataFrames
+        copy : bool (default True)
+            Whether chunks may be transformed in place. See `transform`
+        sparse : bool (default False)
+            Whether to yield `scipy.sparse.csr_matrix` chunks. See `transform`
+
+        Yields
+        ------
+        output : np.ndarray or scipy.sparse.csr_matrix
+            The float32 preprocessed data of each chunk
+        """
+        for chunk in chunks:
+            yield self.transform(chunk, copy=copy, sparse=sparse)
@@ -1,5 +1,9 @@
 from .Steps import ZScore, MinMax, OneHot, DropColumn
+from .TabularPlan import TabularPlan
+from .optimization import optimize_steps
+from ..fitting import fit_tabular, to_python
 from aisquared.base import BaseObject
+import numpy as np
 
 ALLOWED_STEPS = (
     ZScore,
@@ -13,7 +17,8 @@ class TabularPreprocesser(BaseObject):
     """
     Preprocesser object for tabular data
 
-    Example usage:
+    The steps can also be run in Python with `transform`, which compiles them into a fused
+    `TabularPlan`, to validate or batch-score data before the configuration is shipped.
 
     Example usage:
 
@@ -54,6 +59,178 @@ class TabularPreprocesser(BaseObject):
         else:
             self.steps = self.steps + [step]
 
+    @classmethod
+    def fit(
+        cls,
+        chunks,
+        zscore_columns: list = None,
+        minmax_columns: list = None,
+        one_hot_columns: list = None,
+        drop_columns: list = None,
+        max_values: int = None,
+        workers: int = None
+    ):
+        """
+        Create a preprocesser from the statistics of a dataset, computed in a single streaming
+        pass over all of its chunks. The resulting steps normalize and scale the given columns,
+        then one hot encode the given columns, then drop the given columns, with the column
+        indexes of each step adjusted for the columns added by one hot encoding
+
+        Example usage:
+
+        >>> import pandas as pd
+        >>> import aisquared
+        >>> preprocesser = aisquared.config.preprocessing.tabular.TabularPreprocesser.fit(
+            pd.read_csv('data.csv', chunksize=100000),
+            zscore_columns=[0, 1],
+            one_hot_columns=[2],
+            workers=4
+        )
+
+        Parameters
+        ----------
+        chunks : iterable
+            Iterable of two-dimensional arrays or DataFrames with the same columns
+        zscore_columns : list or None (default None)
+            Indexes of the columns to normalize with a fitted ZScore step. Columns with a
+            standard deviation of zero are only centered
+        minmax_columns : list or None (default None)
+            Indexes of the columns to scale with a fitted MinMax step
+        one_hot_columns : list or None (default None)
+            Indexes of the columns to one hot encode with fitted OneHot steps
+        drop_columns : list or None (default None)
+            Indexes of the columns to drop
+        max_values : int or None (default None)
+            If provided, the maximum number of values of each one hot encoded column, keeping
+            the most frequent values
+        workers : int or None (default None)
+            The number of processes to compute chunk statistics in. If None or 1, chunks are
+            processed in the current process
+        """
+        zscore_columns = list(zscore_columns or [])
+        minmax_columns = list(minmax_columns or [])
+        one_hot_columns = list(one_hot_columns or [])
+        drop_columns = list(drop_columns or [])
+        columns = zscore_columns + minmax_columns + one_hot_columns + drop_columns
+        if not all([isinstance(c, int) and c >= 0 for c in columns]):
+            raise ValueError('All column indexes must be non-negative integers')
+        if len(set(columns)) != len(columns):
+            raise ValueError('Each column can only be used once')
+
+        moment_columns = zscore_columns + minmax_columns
+        moments, counts = fit_tabular(
+            chunks, moment_columns, one_hot_columns, max_values, workers)
+        mins, maxs = moments.bounds
+        statistics = {
+            column: (mean, std, mn, mx) for column, mean, std, mn, mx in zip(
+                moment_columns, moments.mean.tolist(), moments.scale.tolist(), mins.tolist(), maxs.tolist())
+        }
+
+        preprocesser = cls()
+        if zscore_columns:
+            preprocesser.add_step(ZScore(
+                [statistics[c][0] for c in zscore_columns],
+                [statistics[c][1] for c in zscore_columns],
+                zscore_columns
+            ))
+        if minmax_columns:
+            preprocesser.add_step(MinMax(
+                [statistics[c][2] for c in minmax_columns],
+                [statistics[c][3] for c in minmax_columns],
+                minmax_columns
+            ))
+
+        # Encoding from the last column first leaves the indexes of earlier columns unchanged
+        widths = {}
+        for column in sorted(one_hot_columns, reverse=True):
+            values = [to_python(value)
+                      for value in counts[column].most_common(max_values)]
+            widths[column] = len(values)
+            preprocesser.add_step(OneHot(column, values))
+        for column in sorted(drop_columns, reverse=True):
+            shift = sum([width - 1 for c, width in widths.items() if c < column])
+            preprocesser.add_step(DropColumn(column + shift))
+        return preprocesser
+
+    def get_plan(self, num_columns: int) -> TabularPlan:
+        """
+        Compile the steps into a fused execution plan
+
+        Parameters
+        ----------
+        num_columns : int
+            The number of columns of the input data
+        """
+        return TabularPlan(self.steps, num_columns)
+
+    def transform(self, X, copy: bool = True, chunk_size: int = None, sparse: bool = False):
+        """
+        Run the preprocessing steps on a batch of data
+
+        Parameters
+        ----------
+        X : array-like or pd.DataFrame
+            Two-dimensional data, with columns in the order the steps expect
+        copy : bool (default True)
+            If False and X is a float32 array which the steps transform element-wise, X is
+            transformed in place and returned
+        chunk_size : int or None (default None)
+            The number of rows to process at once. If None, defaults to 65,536 rows
+        sparse : bool (default False)
+            Whether to return a `scipy.sparse.csr_matrix`, storing one hot indicators by index
+            so that wide categorical columns cost one entry per row. Requires scipy
+
+        Returns
+        -------
+        output : np.ndarray or scipy.sparse.csr_matrix
+            The float32 preprocessed data
+        """
+        plan = self.get_plan(np.shape(X)[-1] if np.ndim(X) == 2 else 0)
+        return plan.transform(X, copy=copy, chunk_size=chunk_size, sparse=sparse)
+
+    def transform_chunks(self, chunks, copy: bool = True, sparse: bool = False):
+        """
+        Run the preprocessing steps over an iterable of row chunks, such as the chunks of a CSV
+        file read with `pd.read_csv(..., chunksize=...)`, for data larger than memory
+
+        Parameters
+        ----------
+        chunks : iterable
+            Iterable of two-dimensional arrays or DataFrames with the same columns
+        copy : bool (default True)
+            Whether chunks may be transformed in place. See `transform`
+        sparse : bool (default False)
+            Whether to yield `scipy.sparse.csr_matrix` chunks. See `transform`
+
+        Yields
+        ------
+        output : np.ndarray or scipy.sparse.csr_matrix
+            The float32 preprocessed data of each chunk
+        """
+        plan = None
+        for chunk in chunks:
+            if plan is None:
+                plan = self.get_plan(np.shape(chunk)[-1])
+            yield plan.transform(chunk, copy=copy, sparse=sparse)
+
+    def optimize(self) -> list:
+        """
+        Optimize the steps in place, so that they do less work while producing the same output.
+        DropColumn steps are moved as early as possible and consecutive ZScore and MinMax
+        steps are folded into one
+
+        Returns
+        -------
+        changes : list
+            Descriptions of each change made
+        """
+        if self.steps is None:
+            return []
+        steps, changes = optimize_steps(self.steps)
+        if changes:
+            self.steps = steps
+        return changes
+
     def to_dict(self):
         """
         Get the configuration object as a dictionary
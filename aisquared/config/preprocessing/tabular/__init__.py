@@ -3,4 +3,5 @@ The aisquared.config.preprocessing.tabular subpackage contains objects for prepr
 """
 
 from .TabularPreprocessing import TabularPreprocesser
+from .TabularPlan import TabularPlan
 from .Steps import *
@@ -0,0 +1,177 @@
+"""
+Optimization of tabular preprocessing steps.
+
+DropColumn steps are moved as early as possible, runs of consecutive ZScore and MinMax steps are
+folded into a single ZScore step, and scaling of columns which are left unchanged is removed.
+"""
+
+from .Steps import ZScore, MinMax, OneHot, DropColumn
+
+
+def _describe(step) -> str:
+    if isinstance(step, (OneHot, DropColumn)):
+        return f'{type(step).__name__}({step.column})'
+    return f'{type(step).__name__}(columns={_columns(step)})'
+
+
+def _columns(step) -> list:
+    """
+    Get the column indexes a ZScore or MinMax step applies to
+    """
+    if step.columns is not None:
+        return list(step.columns)
+    values = step.means if isinstance(step, ZScore) else step.mins
+    return list(range(len(values)))
+
+
+def _affine(step) -> dict:
+    """
+    Get the scale and offset applied to each column by a ZScore or MinMax step, or None if a
+    column would be divided by zero or is indexed from the end
+    """
+    if isinstance(step, ZScore):
+        centers, widths = step.means, step.stds
+    else:
+        centers = step.mins
+        widths = [mx - mn for mn, mx in zip(step.mins, step.maxs)]
+    if any([width == 0 for width in widths]) or any([c < 0 for c in _columns(step)]):
+        return None
+    return {
+        column: (1 / width, -center / width) for column, center, width in zip(_columns(step), centers, widths)
+    }
+
+
+def _without_column(step, column: int):
+    """
+    Get a copy of a ZScore or MinMax step for the layout without `column`, or None if the step
+    only applies to that column
+    """
+    first, second = (step.means, step.stds) if isinstance(
+        step, ZScore) else (step.mins, step.maxs)
+    entries = [
+        (c - (c > column), a, b) for c, a, b in zip(_columns(step), first, second) if c != column
+    ]
+    if not entries:
+        return None
+    columns, first, second = [list(values) for values in zip(*entries)]
+    return type(step)(first, second, columns)
+
+
+def _push_drops(steps: list, changes: list) -> list:
+    steps = list(steps)
+    i = 0
+    while i < len(steps):
+        if not isinstance(steps[i], DropColumn):
+            i += 1
+            continue
+        original = steps[i]
+        column = original.column
+        position = i
+        # Columns are only tracked by non-negative index, since the number of columns is unknown
+        while position > 0 and column >= 0:
+            previous = steps[position - 1]
+            if isinstance(previous, (ZScore, MinMax)):
+                if any([c < 0 for c in _columns(previous)]):
+                    break
+                replacement = _without_column(previous, column)
+                if replacement is None:
+                    changes.append(
+                        f'Removed {_describe(previous)}, which only applied to dropped column {column}')
+                    del steps[position - 1]
+                    position -= 1
+                    continue
+            elif isinstance(previous, OneHot):
+                width = len(previous.values)
+                if previous.column < 0 or previous.column <= column < previous.column + width:
+                    break
+                if column < previous.column:
+                    replacement = OneHot(previous.column - 1, list(previous.values))
+                else:
+                    replacement = previous
+                    column = column - width + 1
+            else:
+                break
+            steps[position - 1], steps[position] = steps[position], replacement
+            position -= 1
+
+        if position != i:
+            drop = DropColumn(column)
+            steps[position] = drop
+            changes.append(
+                f'Moved {_describe(original)} from position {i} to position {position}' + (
+                    f' as {_describe(drop)}' if column != original.column else ''))
+        i = position + 1
+    return steps
+
+
+def _fold(steps: list, changes: list) -> list:
+    optimized = []
+    i = 0
+    while i < len(steps):
+        if not isinstance(steps[i], (ZScore, MinMax)):
+            optimized.append(steps[i])
+            i += 1
+            continue
+        end = i
+        while end < len(steps) and isinstance(steps[end], (ZScore, MinMax)):
+            end += 1
+        run = steps[i:end]
+        affines = [_affine(step) for step in run]
+        if any([affine is None for affine in affines]):
+            optimized.extend(run)
+            i = end
+            continue
+
+        combined = {}
+        for affine in affines:
+            for column, (scale, offset) in affine.items():
+                previous_scale, previous_offset = combined.get(column, (1.0, 0.0))
+                combined[column] = (previous_scale * scale,
+                                    previous_offset * scale + offset)
+        kept = {
+            column: (scale, offset) for column, (scale, offset) in combined.items() if (scale, offset) != (1.0, 0.0)
+        }
+        unchanged = len(kept) == len(combined)
+        if len(run) == 1 and unchanged:
+            optimized.extend(run)
+        elif not kept:
+            changes.append(
+                f'Removed {", ".join([_describe(step) for step in run])}, which leave all columns unchanged')
+        else:
+            columns = sorted(kept)
+            folded = ZScore(
+                [-kept[c][1] / kept[c][0] for c in columns],
+                [1 / kept[c][0] for c in columns],
+                columns
+            )
+            if len(run) > 1:
+                changes.append(
+                    f'Folded {", ".join([_describe(step) for step in run])} into {_describe(folded)}')
+            if not unchanged:
+                changes.append(
+                    f'Removed scaling of unchanged columns {sorted(set(combined) - set(kept))}')
+            optimized.append(folded)
+        i = end
+    return optimized
+
+
+def optimize_steps(steps: list) -> tuple:
+    """
+    Optimize a list of tabular preprocessing steps
+
+    Parameters
+    ----------
+    steps : list
+        List of ZScore, MinMax, OneHot, and DropColumn steps. The steps are not modified
+
+    Returns
+    -------
+    steps : list
+        The optimized list of steps, which produces the same output
+    changes : list
+        Descriptions of each change made
+    """
+    changes = []
+    steps = _push_drops(steps or [], changes)
+    steps = _fold(steps, changes)
+    return steps, changes
@@ -1,5 +1,8 @@
 from typing import Union
 from aisquared.base import BaseObject, ALLOWED_PADS
+from .Vocabulary import Vocabulary
+from ..fitting import Counts, map_chunks, get_capacity
+import os
 
 
 class Tokenize(BaseObject):
@@ -192,6 +195,11 @@ class ConvertToCase(BaseObject):
 class ConvertToVocabulary(BaseObject):
     """Text preprocessing object to convert tokens to integer vocabularies
 
+    The vocabulary is held as a `Vocabulary`, whatever it is given as. By default, it is
+    embedded in the configuration as JSON. If `binary` is True, it is instead stored as a
+    compact binary member of the '.air' archive, named by the SHA-256 digest of its contents,
+    which can be memory-mapped when loaded.
+
     Example usage:
 
     >>> import aisquared
@@ -204,28 +212,42 @@ class ConvertToVocabulary(BaseObject):
             }
         )
     )
+    >>> preprocesser.add_step(
+        aisquared.config.preprocessing.text.ConvertToVocabulary(
+            'vocab.txt',
+            binary=True
+        )
+    )
     """
 
     def __init__(
         self,
-        vocabulary: dict,
+        vocabulary: Union[dict, str, Vocabulary],
         start_character: int = 1,
         oov_character: int = 2,
-        max_vocab: int = None
+        max_vocab: int = None,
+        binary: bool = False
     ):
         """
         Parameters
         ----------
-        vocabulary : dict
-            Dictionary of string -> integer mappings
+        vocabulary : dict, path-like, Vocabulary, or tokenizer
+            Dictionary of string -> integer mappings, a file to load the vocabulary from (see
+            `Vocabulary.from_file`), a Vocabulary object, or a fitted tokenizer. Tokens of
+            plain-text files are given ids from 3, after the default start and out of
+            vocabulary characters; load the file with `Vocabulary.from_file` to use other ids
         start_character : int (default 1)
             The character to use for the start of an input sequence
         oov_character : int (default 2)
             The character to use for out of vocabulary tokens
         max_vocab : int or None (default None)
             The maximum vocabulary integer to use. If None, all vocabulary are used
+        binary : bool (default False)
+            Whether to store the vocabulary as a separate binary archive member instead of
+            embedding it in the configuration
         """
         super().__init__()
+        self.binary = binary
         self.vocabulary = vocabulary
         self.start_character = start_character
         self.oov_character = oov_character
@@ -237,14 +259,28 @@ class ConvertToVocabulary(BaseObject):
 
     @vocabulary.setter
     def vocabulary(self, value):
-        if not isinstance(value, dict):
-            raise TypeError('vocabulary must be dictionary')
-        if not all([isinstance(k, str) for k in value.keys()]):
-            raise ValueError('All keys in vocabulary must be strings')
-        if not all([isinstance(v, int) for v in value.values()]):
-            raise ValueError('All values in vocabulary must be integers')
+        if isinstance(value, (str, os.PathLike)):
+            value = Vocabulary.from_file(value)
+        elif isinstance(value, dict):
+            value = Vocabulary.from_dict(value)
+        elif not isinstance(value, Vocabulary):
+            try:
+                value = Vocabulary.from_tokenizer(value)
+            except TypeError:
+                raise TypeError(
+                    'vocabulary must be dictionary, path, Vocabulary, or tokenizer')
         self._vocabulary = value
 
+    @property
+    def binary(self):
+        return self._binary
+
+    @binary.setter
+    def binary(self, value):
+        if not isinstance(value, bool):
+            raise TypeError('binary must be bool')
+        self._binary = value
+
     @property
     def start_character(self):
         return self._start_character
@@ -276,14 +312,120 @@ class ConvertToVocabulary(BaseObject):
                 raise TypeError('max_vocab must be int')
         self._max_vocab = value
 
+    @classmethod
+    def fit(
+        cls,
+        chunks,
+        steps: list = None,
+        max_vocab: int = None,
+        start_character: int = 1,
+        oov_character: int = 2,
+        binary: bool = False,
+        workers: int = None
+    ):
+        """
+        Create a ConvertToVocabulary step from the tokens of a corpus, counted in a single
+        streaming pass. Tokens are given ids in order of decreasing frequency, starting after
+        the start and out of vocabulary characters
+
+        Example usage:
+
+        >>> import aisquared
+        >>> step = aisquared.config.preprocessing.text.ConvertToVocabulary.fit(
+            [['the first document', 'the second document']],
+            max_vocab=1000
+        )
+
+        Parameters
+        ----------
+        chunks : iterable
+            Iterable of lists of documents
+        steps : list or None (default None)
+            The text preprocessing steps applied before the vocabulary, which must include a
+            Tokenize step. If None, documents are tokenized with the default Tokenize step
+        max_vocab : int or None (default None)
+            If provided, only tokens given ids up to `max_vocab` are kept. The number of
+            distinct tokens counted is then bounded, so the counts of rare tokens are
+            approximate
+        start_character : int (default 1)
+            The character to use for the start of an input sequence
+        oov_character : int (default 2)
+            The character to use for out of vocabulary tokens
+        binary : bool (default False)
+            Whether to store the vocabulary as a separate binary archive member
+        workers : int or None (default None)
+            The number of processes to count tokens in. If None or 1, chunks are processed in
+            the current process
+        """
+        from .TextPlan import count_tokens
+
+        if steps is None:
+            steps = [Tokenize()]
+        first_id = max(start_character, oov_character) + 1
+        num_tokens = None
+        if max_vocab is not None:
+            num_tokens = max(max_vocab - first_id + 1, 0)
+
+        counts = Counts(get_capacity(num_tokens))
+        for chunk_counts in map_chunks(count_tokens, chunks, (steps, counts.capacity), workers):
+            counts.merge(chunk_counts)
+        tokens = counts.most_common(num_tokens)
+        return cls(
+            Vocabulary.from_arrays(tokens, range(first_id, first_id + len(tokens))),
+            start_character,
+            oov_character,
+            max_vocab,
+            binary
+        )
+
+    @property
+    def archive_name(self):
+        """
+        The name of the vocabulary within a compiled '.air' archive when stored as binary
+        """
+        if not self.binary:
+            return None
+        return f'{self.vocabulary.digest}.vocab'
+
+    def get_archive_members(self) -> list:
+        """
+        Get the files to be written into a compiled '.air' archive
+        """
+        if not self.binary:
+            return []
+        source = self.vocabulary.path
+        if source is None:
+            source = self.vocabulary.to_bytes()
+        # Stored uncompressed, so that the vocabulary can be memory-mapped from the archive
+        return [(self.archive_name, source, False)]
+
+    def has_archive_members(self) -> bool:
+        """
+        Whether the vocabulary is written into a compiled '.air' archive as a separate file
+        """
+        return self.binary
+
     def to_dict(self) -> dict:
         """
         Get the configuration object as a dictionary
         """
+        if self.binary:
+            return {
+                'className': 'ConvertToVocabulary',
+                'params': {
+                    'vocabulary': None,
+                    'vocabularyFile': self.archive_name,
+                    'vocabularyDigest': self.vocabulary.digest,
+                    'vocabularySize': len(self.vocabulary),
+                    'startCharacter': self.start_character,
+                    'oovCharacter': self.oov_character,
+                    'maxVocab': self.max_vocab
+                }
+            }
         return {
             'className': 'ConvertToVocabulary',
             'params': {
-                'vocabulary': self.vocabulary,
+                'vocabulary': self.vocabulary.to_dict(),
                 'startCharacter': self.start_character,
                 'oovCharacter': self.oov_character,
                 'maxVocab': self.max_vocab
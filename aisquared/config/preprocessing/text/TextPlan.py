@@ -0,0 +1,242 @@
+from .Steps import Tokenize, RemoveCharacters, ConvertToCase, ConvertToVocabulary, PadSequences, Trim
+from ..fitting import Counts
+import itertools
+import string
+import re
+import numpy as np
+
+DEFAULT_BATCH_SIZE = 1024
+
+_SENTENCE_PATTERN = re.compile(r'(?<=[.!?])\s+')
+
+
+def _compile_token_pattern(pattern: str) -> re.Pattern:
+    # The default token pattern is written without a raw string, so its word boundaries are
+    # backspace characters, which never match. They are read as the intended '\b' instead
+    return re.compile(pattern.replace('\x08', r'\b'))
+
+
+class TextPlan:
+    """
+    Streaming execution plan for a list of text preprocessing steps
+
+    Documents are processed in fixed-size batches. The token pattern is compiled once, string
+    operations are combined into a single function applied to each document, and the
+    vocabulary lookup and padding are done for a whole batch at once. Memory use depends only
+    on the batch size, not on the number of documents.
+
+    Example usage:
+
+    >>> import aisquared
+    >>> plan = aisquared.config.preprocessing.text.TextPlan(
+        [
+            aisquared.config.preprocessing.text.Tokenize(),
+            aisquared.config.preprocessing.text.ConvertToVocabulary({'hello': 3, 'world': 4}),
+            aisquared.config.preprocessing.text.PadSequences(length=4)
+        ]
+    )
+    >>> next(plan.transform(['hello world', 'goodbye world']))
+    array([[1, 3, 4, 0],
+           [1, 2, 4, 0]], dtype=int32)
+    """
+
+    def __init__(
+            self,
+            steps: list
+    ):
+        """
+        Parameters
+        ----------
+        steps : list
+            List of text preprocessing steps, applied in order. Steps which operate on strings
+            are applied to whole documents before a Tokenize step and to each token after it
+        """
+        self.document_steps = []
+        self.token_steps = []
+        self.tokenize = None
+        self.vocabulary = None
+        self.pad = None
+
+        for step in steps or []:
+            if self.pad is not None:
+                raise ValueError('PadSequences must be the last step')
+            if isinstance(step, (Trim, ConvertToCase, RemoveCharacters)):
+                if self.vocabulary is not None:
+                    raise ValueError(
+                        f'{type(step).__name__} cannot be applied after ConvertToVocabulary')
+                function = self._string_function(step)
+                if self.tokenize is None:
+                    self.document_steps.append(function)
+                else:
+                    self.token_steps.append(function)
+            elif isinstance(step, Tokenize):
+                if self.tokenize is not None:
+                    raise ValueError('Only one Tokenize step can be used')
+                self.tokenize = self._tokenize_function(step)
+            elif isinstance(step, ConvertToVocabulary):
+                if self.vocabulary is not None:
+                    raise ValueError(
+                        'Only one ConvertToVocabulary step can be used')
+                self.vocabulary = step
+            elif isinstance(step, PadSequences):
+                if self.vocabulary is None:
+                    raise ValueError(
+                        'PadSequences must follow ConvertToVocabulary')
+                self.pad = step
+            else:
+                raise TypeError(
+                    f'Each step must be one of {(Tokenize, RemoveCharacters, ConvertToCase, ConvertToVocabulary, PadSequences, Trim)}')
+
+        if self.vocabulary is not None:
+            if self.tokenize is None:
+                raise ValueError('ConvertToVocabulary must follow Tokenize')
+            self._lookup = self._lookup_function(self.vocabulary)
+
+    @staticmethod
+    def _string_function(step):
+        if isinstance(step, Trim):
+            return str.strip
+        if isinstance(step, ConvertToCase):
+            return str.lower if step.lowercase else str.upper
+        characters = ''
+        if step.remove_digits:
+            characters += string.digits
+        if step.remove_punctuation:
+            characters += string.punctuation
+        table = str.maketrans('', '', characters)
+        return lambda text: text.translate(table)
+
+    @staticmethod
+    def _tokenize_function(step):
+        pattern = _compile_token_pattern(step.token_pattern)
+
+        def split_words(text):
+            return pattern.findall(text) if step.split_words else [text]
+
+        if not step.split_sentences:
+            return split_words
+
+        def tokenize(text):
+            return [
+                token for sentence in _SENTENCE_PATTERN.split(text) for token in split_words(sentence)
+            ]
+        return tokenize
+
+    @staticmethod
+    def _lookup_function(step):
+        """
+        Get a function mapping a flat list of tokens to an int32 array of ids
+        """
+        oov = step.oov_character
+        max_vocab = step.max_vocab
+        vocabulary = step.vocabulary
+
+        def lookup(tokens):
+            ids = vocabulary.lookup(tokens, oov)
+            if max_vocab is not None:
+                ids[ids > max_vocab] = oov
+            return ids
+        return lookup
+
+    def _prepare(self, document: str):
+        for function in self.document_steps:
+            document = function(document)
+        if self.tokenize is None:
+            return document
+        tokens = self.tokenize(document)
+        for function in self.token_steps:
+            tokens = [function(token) for token in tokens]
+        return tokens
+
+    def _pad(self, ids: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        """
+        Pad and truncate a batch of concatenated sequences into a two-dimensional array
+        """
+        length = self.pad.length
+        output = np.full((lengths.size, length),
+                         self.pad.pad_character, dtype=np.int32)
+        starts = np.cumsum(lengths) - lengths
+        rows = np.repeat(np.arange(lengths.size), lengths)
+        positions = np.arange(ids.size) - np.repeat(starts, lengths)
+        kept = np.minimum(lengths, length)
+
+        # Positions within each sequence of the first element that is kept
+        if self.pad.truncate_location == 'pre':
+            first = lengths - kept
+        else:
+            first = np.zeros_like(lengths)
+        columns = positions - np.repeat(first, lengths)
+        if self.pad.pad_location == 'pre':
+            columns += np.repeat(length - kept, lengths)
+        keep = (positions >= np.repeat(first, lengths)) & (
+            positions < np.repeat(first + kept, lengths))
+        output[rows[keep], columns[keep]] = ids[keep]
+        return output
+
+    def _run(self, documents: list):
+        prepared = [self._prepare(document) for document in documents]
+        if self.vocabulary is None:
+            return prepared
+
+        lengths = np.fromiter(map(len, prepared), dtype=np.intp,
+                              count=len(prepared))
+        ids = self._lookup(list(itertools.chain.from_iterable(prepared)))
+        ids = np.insert(ids, np.cumsum(lengths) - lengths,
+                        self.vocabulary.start_character)
+        lengths += 1
+
+        if self.pad is None:
+            return np.split(ids, np.cumsum(lengths)[:-1])
+        return self._pad(ids, lengths)
+
+    def transform(self, documents, batch_size: int = None):
+        """
+        Run the plan over an iterable of documents
+
+        Parameters
+        ----------
+        documents : iterable of str
+            The documents to preprocess. Can be a generator, so that the corpus is never held
+            in memory at once
+        batch_size : int or None (default None)
+            The number of documents in each batch. If None, defaults to 1,024
+
+        Yields
+        ------
+        batch : np.ndarray or list
+            If the steps end with PadSequences, an int32 array of shape (batch size, length).
+            Otherwise, a list with the int32 ids, tokens, or text of each document
+        """
+        batch_size = batch_size or DEFAULT_BATCH_SIZE
+        if not isinstance(batch_size, int) or batch_size < 1:
+            raise ValueError('batch_size must be a positive integer')
+        documents = iter(documents)
+        while True:
+            batch = list(itertools.islice(documents, batch_size))
+            if not batch:
+                return
+            yield self._run(batch)
+
+
+def count_tokens(documents, steps: list, capacity: int = None) -> Counts:
+    """
+    Count the tokens a list of text preprocessing steps produces for a chunk of documents
+
+    Parameters
+    ----------
+    documents : iterable of str
+        The documents to count tokens of
+    steps : list
+        List of text preprocessing steps including a Tokenize step, which must not include
+        ConvertToVocabulary or PadSequences
+    capacity : int or None (default None)
+        The maximum number of distinct tokens to count
+    """
+    plan = TextPlan(steps)
+    if plan.tokenize is None or plan.vocabulary is not None:
+        raise ValueError(
+            'steps must include Tokenize and must not include ConvertToVocabulary')
+    counts = Counts(capacity)
+    counts.update(itertools.chain.from_iterable(
+        map(plan._prepare, documents)))
+    return counts
@@ -1,5 +1,7 @@
 from aisquared.base import BaseObject
 from .Steps import Tokenize, RemoveCharacters, ConvertToCase, ConvertToVocabulary, PadSequences, Trim
+from .TextPlan import TextPlan
+from .optimization import optimize_steps
 
 ALLOWED_STEPS = (
     Tokenize,
@@ -15,6 +17,9 @@ class TextPreprocesser(BaseObject):
     """
     Preprocesser object for natural language
 
+    The steps can also be run in Python with `transform`, which streams documents through a
+    `TextPlan` in fixed-size batches.
+
     Example usage:
 
     >>> import aisquared
@@ -60,6 +65,116 @@ class TextPreprocesser(BaseObject):
         else:
             self.steps = self.steps + [step]
 
+    @classmethod
+    def fit(
+        cls,
+        chunks,
+        steps: list = None,
+        max_vocab: int = None,
+        length: int = 128,
+        binary: bool = False,
+        workers: int = None
+    ):
+        """
+        Create a preprocesser with a vocabulary fitted to a corpus in a single streaming pass,
+        using `ConvertToVocabulary.fit`
+
+        Example usage:
+
+        >>> import aisquared
+        >>> preprocesser = aisquared.config.preprocessing.text.TextPreprocesser.fit(
+            [['the first document', 'the second document']],
+            steps=[
+                aisquared.config.preprocessing.text.ConvertToCase(),
+                aisquared.config.preprocessing.text.Tokenize()
+            ],
+            max_vocab=10000
+        )
+
+        Parameters
+        ----------
+        chunks : iterable
+            Iterable of lists of documents
+        steps : list or None (default None)
+            The text preprocessing steps applied before the vocabulary, which must include a
+            Tokenize step. If None, documents are tokenized with the default Tokenize step
+        max_vocab : int or None (default None)
+            The maximum vocabulary integer to keep
+        length : int or None (default 128)
+            The length to pad sequences to. If None, no PadSequences step is added
+        binary : bool (default False)
+            Whether to store the vocabulary as a separate binary archive member
+        workers : int or None (default None)
+            The number of processes to count tokens in. If None or 1, chunks are processed in
+            the current process
+        """
+        if steps is None:
+            steps = [Tokenize()]
+        vocabulary = ConvertToVocabulary.fit(
+            chunks, steps, max_vocab=max_vocab, binary=binary, workers=workers)
+        steps = list(steps) + [vocabulary]
+        if length is not None:
+            steps.append(PadSequences(length=length))
+        return cls(steps)
+
+    def get_plan(self) -> TextPlan:
+        """
+        Compile the steps into a streaming execution plan
+        """
+        return TextPlan(self.steps)
+
+    def transform(self, documents, batch_size: int = None):
+        """
+        Run the preprocessing steps over an iterable of documents
+
+        Parameters
+        ----------
+        documents : iterable of str
+            The documents to preprocess. Can be a generator, so that the corpus is never held
+            in memory at once
+        batch_size : int or None (default None)
+            The number of documents in each batch. If None, defaults to 1,024
+
+        Yields
+        ------
+        batch : np.ndarray or list
+            If the steps end with PadSequences, an int32 array of shape (batch size, length).
+            Otherwise, a list with the int32 ids, tokens, or text of each document
+        """
+        return self.get_plan().transform(documents, batch_size)
+
+    def get_archive_members(self) -> list:
+        """
+        Get the files to be written into a compiled '.air' archive
+        """
+        if self.steps is None:
+            return []
+        return [member for step in self.steps for member in step.get_archive_members()]
+
+    def has_archive_members(self) -> bool:
+        """
+        Whether any step has files to be written into a compiled '.air' archive
+        """
+        return self.steps is not None and any(step.has_archive_members() for step in self.steps)
+
+    def optimize(self) -> list:
+        """
+        Optimize the steps in place, so that they do less work while producing the same output.
+        Consecutive case conversions and character removals are merged and steps which do
+        nothing are removed
+
+        Returns
+        -------
+        changes : list
+            Descriptions of each change made
+        """
+        if self.steps is None:
+            return []
+        steps, changes = optimize_steps(self.steps)
+        if changes:
+            self.steps = steps
+        return changes
+
     def to_dict(self) -> dict:
         """
         Get the configuration object as a dictionary
@@ -0,0 +1,343 @@
+from aisquared.base.binary import pack_sections, section_offsets, has_magic, is_sorted_unique, sort_keys, search_keys, file_digest
+from collections.abc import Mapping
+import numpy as np
+import zipfile
+import hashlib
+import struct
+import json
+import os
+
+# Binary layout: magic, version, token width, token count, then the sorted fixed-width
+# UTF-8 tokens and their little-endian int32 ids, each aligned as described in
+# `aisquared.base.binary`
+_MAGIC = b'AISQVOCB'
+_VERSION = 1
+_HEADER = struct.Struct('<8sIIQ')
+_ID_DTYPE = np.dtype('<i4')
+_INT32_MIN, _INT32_MAX = np.iinfo(np.int32).min, np.iinfo(np.int32).max
+_ZIP_LOCAL_HEADER = struct.Struct('<4s5H3I2H')
+
+# Ids 0, 1, and 2 are used for padding, the start character, and out of vocabulary tokens by
+# default, so tokens read from plain-text files are given ids starting after them
+FIRST_ID = 3
+
+
+def validate_vocabulary(vocabulary: dict) -> None:
+    """
+    Check that a vocabulary maps strings to integers
+
+    Types are checked once per distinct type rather than once per entry, so that validating
+    very large vocabularies stays cheap
+    """
+    if not isinstance(vocabulary, dict):
+        raise TypeError('vocabulary must be dictionary')
+    if not all([issubclass(t, str) for t in set(map(type, vocabulary.keys()))]):
+        raise ValueError('All keys in vocabulary must be strings')
+    if not all([issubclass(t, (int, np.integer)) for t in set(map(type, vocabulary.values()))]):
+        raise ValueError('All values in vocabulary must be integers')
+
+
+class Vocabulary(Mapping):
+    """
+    Compact binary vocabulary, stored as a sorted array of UTF-8 tokens and an array of int32 ids
+
+    Vocabularies can be built from a dictionary, a file, or a fitted tokenizer, and are written
+    into compiled '.air' archives as a separate, uncompressed member, so that they can be
+    memory-mapped when loaded instead of being parsed from 'config.json'. They are read-only
+    mappings from tokens to ids, and compare equal to dictionaries with the same entries.
+
+    Example usage:
+
+    >>> import aisquared
+    >>> vocabulary = aisquared.config.preprocessing.text.Vocabulary.from_dict(
+        {'test': 3, 'vocabulary': 4}
+    )
+    >>> vocabulary.lookup(['vocabulary', 'unknown'], oov_character=2)
+    array([4, 2], dtype=int32)
+    """
+
+    def __init__(
+            self,
+            tokens: np.ndarray,
+            ids: np.ndarray,
+            path: str = None
+    ):
+        """
+        Parameters
+        ----------
+        tokens : np.ndarray
+            Sorted, unique, fixed-width bytes array of UTF-8 encoded tokens
+        ids : np.ndarray
+            Integer ids of the tokens, in the same order
+        path : path-like or None (default None)
+            The binary file the arrays are stored in, if any
+        """
+        tokens = np.asarray(tokens)
+        ids = np.asarray(ids)
+        if tokens.ndim != 1 or tokens.dtype.kind != 'S':
+            raise TypeError('tokens must be a one-dimensional bytes array')
+        if ids.shape != tokens.shape:
+            raise ValueError('tokens and ids must have the same length')
+        if ids.dtype.kind not in 'iu':
+            raise ValueError('All ids must be integers')
+        if ids.size and (ids.min() < _INT32_MIN or ids.max() > _INT32_MAX):
+            raise ValueError('All ids must fit in a 32-bit integer')
+        if not is_sorted_unique(tokens):
+            raise ValueError('tokens must be sorted and unique')
+        self._tokens = tokens
+        self._ids = ids if ids.dtype == _ID_DTYPE else ids.astype(_ID_DTYPE)
+        self._path = None if path is None else os.fspath(path)
+        self._digest = None
+
+    @classmethod
+    def from_arrays(cls, tokens, ids):
+        """
+        Create a vocabulary from unsorted tokens and their ids
+
+        Parameters
+        ----------
+        tokens : array-like of str
+            The tokens
+        ids : array-like of int
+            The id of each token
+        """
+        tokens = np.asarray(tokens)
+        ids = np.asarray(ids)
+        if tokens.size == 0:
+            return cls(np.empty(0, dtype='S1'), np.empty(0, dtype=_ID_DTYPE))
+        if tokens.dtype.kind != 'U':
+            raise ValueError('All tokens must be strings')
+        if ids.dtype.kind not in 'iu':
+            raise ValueError('All ids must be integers')
+        encoded, order = sort_keys(tokens)
+        if not is_sorted_unique(encoded):
+            raise ValueError('All tokens must be unique')
+        return cls(encoded, ids[order])
+
+    @classmethod
+    def from_dict(cls, vocabulary: dict):
+        """
+        Create a vocabulary from a dictionary of string -> integer mappings
+
+        Parameters
+        ----------
+        vocabulary : dict
+            Dictionary of string -> integer mappings
+        """
+        validate_vocabulary(vocabulary)
+        tokens = np.array(list(vocabulary.keys()), dtype=str)
+        ids = np.fromiter(vocabulary.values(), dtype=np.int64,
+                          count=len(vocabulary))
+        return cls.from_arrays(tokens, ids)
+
+    @classmethod
+    def from_tokenizer(cls, tokenizer):
+        """
+        Create a vocabulary from a fitted tokenizer
+
+        Keras tokenizers (`word_index`), Hugging Face tokenizers (`get_vocab()`), and scikit-learn
+        vectorizers (`vocabulary_`) are supported
+
+        Parameters
+        ----------
+        tokenizer : tokenizer object
+            The fitted tokenizer
+        """
+        if hasattr(tokenizer, 'get_vocab'):
+            vocabulary = tokenizer.get_vocab()
+        elif hasattr(tokenizer, 'word_index'):
+            vocabulary = tokenizer.word_index
+        elif hasattr(tokenizer, 'vocabulary_'):
+            vocabulary = tokenizer.vocabulary_
+        else:
+            raise TypeError(
+                'tokenizer must provide a vocabulary through `get_vocab()`, `word_index`, or `vocabulary_`')
+        return cls.from_dict(dict(vocabulary))
+
+    @classmethod
+    def from_file(cls, path: str, first_id: int = FIRST_ID):
+        """
+        Load a vocabulary from a file
+
+        Binary vocabulary files are memory-mapped. Files ending in '.json' are read as a
+        dictionary of string -> integer mappings, and any other file is read as one token per
+        line, with the token on the first line given `first_id` and each following line the
+        next id
+
+        Parameters
+        ----------
+        path : path-like
+            The file to load the vocabulary from
+        first_id : int (default 3)
+            The id of the first token of a plain-text file. The default follows the padding,
+            start, and out of vocabulary characters used by `ConvertToVocabulary` by default.
+            Use 0 for files whose line numbers are already the ids, such as those listing
+            their own padding and unknown tokens
+        """
+        if not isinstance(first_id, int) or first_id < 0:
+            raise ValueError('first_id must be a non-negative integer')
+        if has_magic(path, _MAGIC):
+            return cls._from_buffer(np.memmap(path, dtype=np.uint8, mode='r'), path)
+        if os.path.splitext(path)[-1].lower() == '.json':
+            with open(path, 'r', encoding='utf-8') as f:
+                return cls.from_dict(json.load(f))
+        with open(path, 'r', encoding='utf-8') as f:
+            tokens = f.read().splitlines()
+        return cls.from_arrays(np.array(tokens, dtype=str), np.arange(first_id, first_id + len(tokens)))
+
+    @classmethod
+    def from_archive(cls, file: str, arcname: str):
+        """
+        Load a vocabulary stored in a compiled '.air' archive
+
+        Uncompressed members are memory-mapped directly from the archive
+
+        Parameters
+        ----------
+        file : path-like
+            The '.air' archive
+        arcname : str
+            The name of the vocabulary member within the archive
+        """
+        with zipfile.ZipFile(file) as archive:
+            info = archive.getinfo(arcname)
+            if info.compress_type != zipfile.ZIP_STORED:
+                return cls._from_buffer(archive.read(arcname))
+        with open(file, 'rb') as f:
+            f.seek(info.header_offset)
+            header = _ZIP_LOCAL_HEADER.unpack(
+                f.read(_ZIP_LOCAL_HEADER.size))
+        offset = info.header_offset + _ZIP_LOCAL_HEADER.size + \
+            header[-2] + header[-1]
+        return cls._from_buffer(np.memmap(file, dtype=np.uint8, mode='r', offset=offset, shape=(info.file_size,)))
+
+    @classmethod
+    def _from_buffer(cls, buffer, path: str = None):
+        magic, version, width, count = _HEADER.unpack(
+            bytes(buffer[:_HEADER.size]))
+        if magic != _MAGIC:
+            raise ValueError('Not a binary vocabulary')
+        if version != _VERSION:
+            raise ValueError(f'Unsupported binary vocabulary version {version}')
+        tokens_offset, ids_offset = section_offsets(
+            _HEADER.size, [width * count])
+        tokens = np.frombuffer(buffer, dtype=f'S{width}',
+                               count=count, offset=tokens_offset)
+        ids = np.frombuffer(buffer, dtype=_ID_DTYPE,
+                            count=count, offset=ids_offset)
+        vocabulary = cls.__new__(cls)
+        vocabulary._tokens, vocabulary._ids = tokens, ids
+        vocabulary._path = None if path is None else os.fspath(path)
+        vocabulary._digest = None
+        return vocabulary
+
+    @property
+    def tokens(self) -> np.ndarray:
+        """
+        The sorted, UTF-8 encoded tokens
+        """
+        return self._tokens
+
+    @property
+    def ids(self) -> np.ndarray:
+        """
+        The int32 ids of the tokens
+        """
+        return self._ids
+
+    @property
+    def path(self):
+        """
+        The binary file the vocabulary is stored in, or None if it is only held in memory
+        """
+        return self._path
+
+    def __len__(self) -> int:
+        return self._tokens.size
+
+    def __getitem__(self, token: str) -> int:
+        if not isinstance(token, str) or self._tokens.size == 0:
+            raise KeyError(token)
+        encoded = token.encode('utf-8')
+        # As in `lookup`, the token is searched for after being cut to the stored width
+        position = int(np.searchsorted(
+            self._tokens, np.array(encoded, dtype=self._tokens.dtype)))
+        if position < self._tokens.size and self._tokens[position] == encoded:
+            return int(self._ids[position])
+        raise KeyError(token)
+
+    def __iter__(self):
+        return iter(np.char.decode(self._tokens, 'utf-8').tolist())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Vocabulary):
+            return self._tokens.dtype == other._tokens.dtype and np.array_equal(self._tokens, other._tokens) and np.array_equal(self._ids, other._ids)
+        if isinstance(other, Mapping):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    def to_bytes(self) -> bytes:
+        """
+        Get the vocabulary in its binary format
+        """
+        header = _HEADER.pack(
+            _MAGIC, _VERSION, self._tokens.dtype.itemsize, self._tokens.size)
+        return pack_sections(header, [self._tokens.tobytes(), self._ids.tobytes()])
+
+    def save(self, path: str) -> None:
+        """
+        Save the vocabulary in its binary format
+
+        Parameters
+        ----------
+        path : path-like
+            The file to save the vocabulary to
+        """
+        data = self.to_bytes()
+        with open(path, 'wb') as f:
+            f.write(data)
+        if self._digest is None:
+            self._digest = hashlib.sha256(data).hexdigest()
+
+    @property
+    def digest(self) -> str:
+        """
+        The SHA-256 digest of the vocabulary in its binary format. Vocabularies loaded from a
+        binary file are hashed by reading the file in chunks, so that the vocabulary is never
+        copied into memory as a whole
+        """
+        if self._digest is None:
+            if self._path is None:
+                self._digest = hashlib.sha256(self.to_bytes()).hexdigest()
+            else:
+                self._digest = file_digest(self._path)
+        return self._digest
+
+    def to_dict(self) -> dict:
+        """
+        Get the vocabulary as a dictionary of string -> integer mappings
+        """
+        tokens = np.char.decode(self._tokens, 'utf-8').tolist()
+        return dict(zip(tokens, self._ids.tolist()))
+
+    def lookup(self, tokens, oov_character: int = 2) -> np.ndarray:
+        """
+        Map tokens to their ids
+
+        Parameters
+        ----------
+        tokens : array-like of str
+            The tokens to look up
+        oov_character : int (default 2)
+            The id to use for tokens which are not in the vocabulary
+
+        Returns
+        -------
+        ids : np.ndarray
+            The int32 id of each token, with the same shape as `tokens`
+        """
+        tokens = np.asarray(tokens, dtype=str)
+        if self._tokens.size == 0 or tokens.size == 0:
+            return np.full(tokens.shape, oov_character, dtype=np.int32)
+        positions = search_keys(self._tokens, tokens)
+        return np.where(positions >= 0, self._ids[positions], oov_character).astype(np.int32)
@@ -4,3 +4,5 @@ The aisquared.config.preprocessing.text subpackage contains objects for preproce
 
 from .TextPreprocessing import TextPreprocesser
 from .Steps import *
+from .Vocabulary import Vocabulary
+from .TextPlan import TextPlan
@@ -0,0 +1,53 @@
+"""
+Optimization of text preprocessing steps.
+
+RemoveCharacters steps which remove nothing are removed, consecutive RemoveCharacters steps are
+merged, runs of consecutive ConvertToCase steps are reduced to the last one, and repeated Trim
+steps are removed.
+"""
+
+from .Steps import RemoveCharacters, ConvertToCase, Trim
+
+
+def _describe(step) -> str:
+    return f'{type(step).__name__}({list(step.to_dict()["params"].values())})'
+
+
+def optimize_steps(steps: list) -> tuple:
+    """
+    Optimize a list of text preprocessing steps
+
+    Parameters
+    ----------
+    steps : list
+        List of text preprocessing steps. The steps are not modified
+
+    Returns
+    -------
+    steps : list
+        The optimized list of steps, which produces the same output
+    changes : list
+        Descriptions of each change made
+    """
+    optimized, changes = [], []
+    for step in steps or []:
+        previous = optimized[-1] if optimized else None
+        if isinstance(step, RemoveCharacters) and not (step.remove_digits or step.remove_punctuation):
+            changes.append(f'Removed {_describe(step)}, which removes nothing')
+        elif isinstance(step, RemoveCharacters) and isinstance(previous, RemoveCharacters):
+            merged = RemoveCharacters(
+                previous.remove_digits or step.remove_digits,
+                previous.remove_punctuation or step.remove_punctuation
+            )
+            changes.append(
+                f'Merged {_describe(previous)}, {_describe(step)} into {_describe(merged)}')
+            optimized[-1] = merged
+        elif isinstance(step, ConvertToCase) and isinstance(previous, ConvertToCase):
+            changes.append(
+                f'Removed {_describe(previous)}, which is overridden by {_describe(step)}')
+            optimized[-1] = step
+        elif isinstance(step, Trim) and isinstance(previous, Trim):
+            changes.append('Removed Trim, which repeats the previous step')
+        else:
+            optimized.append(step)
+    return optimized, changes
@@ -53,7 +53,7 @@ class DashboardRendering(BaseObject):
         if label is None:
             label = id
 
-        self._steps.append(
+        self._steps = self._steps + [
             ContainerRendering(
                 label=label,
                 id=id,
@@ -66,7 +66,7 @@ class DashboardRendering(BaseObject):
                 position=position,
                 orientation=orientation
             )
-        )
+        ]
 
         return id
 
@@ -93,7 +93,7 @@ class DashboardRendering(BaseObject):
         if chart_name is None:
             label = id
 
-        self._steps.append(
+        self._steps = self._steps + [
             BarChartRendering(
                 label=label,
                 id=id,
@@ -109,7 +109,7 @@ class DashboardRendering(BaseObject):
                 xOffset=xOffset,
                 yOffset=yOffset
             )
-        )
+        ]
 
     def add_doughnut_chart(
         self,
@@ -136,7 +136,7 @@ class DashboardRendering(BaseObject):
         if chart_name is None:
             chart_name = id
 
-        self._steps.append(
+        self._steps = self._steps + [
             DoughnutChartRendering(
                 label=label,
                 id=id,
@@ -154,7 +154,7 @@ class DashboardRendering(BaseObject):
                 xOffset=xOffset,
                 yOffset=yOffset
             )
-        )
+        ]
 
     def add_html_tag(
         self,
@@ -174,7 +174,7 @@ class DashboardRendering(BaseObject):
         if label is None:
             label = id
 
-        self._steps.append(
+        self._steps = self._steps + [
             HTMLTagRendering(
                 label=label,
                 id=id,
@@ -187,7 +187,7 @@ class DashboardRendering(BaseObject):
                 prediction_name_value=prediction_name_value,
                 content=content
             )
-        )
+        ]
 
     def add_line_chart(
         self,
@@ -212,7 +212,7 @@ class DashboardRendering(BaseObject):
         if chart_name is None:
             chart_name = id
 
-        self._steps.append(
+        self._steps = self._steps + [
             LineChartRendering(
                 label=label,
                 id=id,
@@ -228,7 +228,7 @@ class DashboardRendering(BaseObject):
                 xOffset=xOffset,
                 yOffset=yOffset
             )
-        )
+        ]
 
     def add_pie_chart(
         self,
@@ -255,7 +255,7 @@ class DashboardRendering(BaseObject):
         if chart_name is None:
             chart_name = id
 
-        self._steps.append(
+        self._steps = self._steps + [
             PieChartRendering(
                 label=label,
                 id=id,
@@ -273,7 +273,7 @@ class DashboardRendering(BaseObject):
                 xOffset=xOffset,
                 yOffset=yOffset
             )
-        )
+        ]
 
     def add_table(
         self,
@@ -290,7 +290,7 @@ class DashboardRendering(BaseObject):
         if label is None:
             label = id
 
-        self._steps.append(
+        self._steps = self._steps + [
             TableRendering(
                 label=label,
                 id=id,
@@ -300,7 +300,7 @@ class DashboardRendering(BaseObject):
                 prediction_name_values=prediction_name_values,
                 table_name=table_name
             )
-        )
+        ]
 
     def to_dict(self):
         return [
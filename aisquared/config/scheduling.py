@@ -0,0 +1,219 @@
+"""
+Validation, analysis, and concurrent execution of the dependency graphs of GraphConfiguration
+objects.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+import multiprocessing
+import time
+
+ALLOWED_EXECUTORS = ('thread', 'process')
+
+
+def get_dependencies(nodes: list) -> dict:
+    """
+    Get the dependencies of each node of a graph as a list of node ids, keyed by node id
+    """
+    dependencies = {}
+    for node in nodes:
+        node_dependencies = node['dependencies']
+        if node_dependencies is None:
+            node_dependencies = []
+        elif isinstance(node_dependencies, int):
+            node_dependencies = [node_dependencies]
+        dependencies[node['id']] = list(node_dependencies)
+    return dependencies
+
+
+def topological_order(nodes: list) -> list:
+    """
+    Get the ids of the nodes of a graph in an order in which every node comes after all of its
+    dependencies
+
+    Raises
+    ------
+    ValueError
+        If node ids are repeated, if a node depends on a node which does not exist, or if the
+        graph contains a cycle
+    """
+    dependencies = get_dependencies(nodes)
+    if len(dependencies) != len(nodes):
+        raise ValueError('Each node id must be unique')
+    dependents = {node_id: [] for node_id in dependencies}
+    for node_id, node_dependencies in dependencies.items():
+        for dependency in node_dependencies:
+            if dependency not in dependents:
+                raise ValueError(
+                    f'Node {node_id} depends on node {dependency}, which does not exist')
+            dependents[dependency].append(node_id)
+
+    # Kahn's algorithm
+    remaining = {node_id: len(set(deps)) for node_id, deps in dependencies.items()}
+    ready = [node_id for node_id, count in remaining.items() if count == 0]
+    order = []
+    while ready:
+        node_id = ready.pop()
+        order.append(node_id)
+        for dependent in set(dependents[node_id]):
+            remaining[dependent] -= 1
+            if remaining[dependent] == 0:
+                ready.append(dependent)
+
+    if len(order) != len(dependencies):
+        cycle = sorted([node_id for node_id, count in remaining.items() if count > 0])
+        raise ValueError(f'The graph contains a cycle through nodes {cycle}')
+    return order
+
+
+def critical_path(nodes: list, costs: dict = None) -> tuple:
+    """
+    Get the critical path of a graph, the chain of dependent nodes with the highest total cost,
+    which bounds how fast the graph can run no matter how many nodes run concurrently
+
+    Parameters
+    ----------
+    nodes : list
+        The nodes of the graph
+    costs : dict or None (default None)
+        The cost of each node, such as its run time, keyed by node id. Nodes which are not
+        included cost 1
+
+    Returns
+    -------
+    path : list
+        The ids of the nodes on the critical path, in order
+    length : float
+        The total cost of the critical path
+    """
+    costs = costs or {}
+    dependencies = get_dependencies(nodes)
+    lengths, previous = {}, {}
+    for node_id in topological_order(nodes):
+        longest = max(dependencies[node_id], key=lambda d: lengths[d], default=None)
+        previous[node_id] = longest
+        lengths[node_id] = costs.get(node_id, 1) + (0 if longest is None else lengths[longest])
+    if not lengths:
+        return [], 0
+
+    node_id = max(lengths, key=lambda n: lengths[n])
+    length = lengths[node_id]
+    path = []
+    while node_id is not None:
+        path.append(node_id)
+        node_id = previous[node_id]
+    return path[::-1], length
+
+
+def get_priorities(nodes: list, costs: dict = None) -> dict:
+    """
+    Get the total cost of the most costly chain of nodes starting at each node. Running nodes
+    with higher priorities first keeps the critical path moving
+    """
+    costs = costs or {}
+    dependencies = get_dependencies(nodes)
+    priorities = {}
+    for node_id in reversed(topological_order(nodes)):
+        priorities.setdefault(node_id, 0)
+        priorities[node_id] += costs.get(node_id, 1)
+        for dependency in dependencies[node_id]:
+            priorities[dependency] = max(
+                priorities.get(dependency, 0), priorities[node_id])
+    return priorities
+
+
+def pass_through(inputs):
+    """
+    Return the inputs unchanged, for nodes which only run in the browser
+    """
+    return inputs
+
+
+def timed_call(function, inputs) -> tuple:
+    """
+    Call `function(inputs)`, returning the result and the number of seconds it took
+    """
+    start = time.perf_counter()
+    result = function(inputs)
+    return result, time.perf_counter() - start
+
+
+def run_graph(nodes: list, functions: dict, inputs, workers: int = None, executor: str = 'thread', costs: dict = None) -> tuple:
+    """
+    Run the nodes of a graph, running each node as soon as all of its dependencies have
+    finished, so that independent nodes run concurrently
+
+    A node without dependencies is passed `inputs`, a node with one dependency is passed the
+    result of that node, and a node with several dependencies is passed a list of their
+    results, in the order the dependencies are listed. With the 'thread' executor, results are
+    passed between nodes by reference and are never copied
+
+    Parameters
+    ----------
+    nodes : list
+        The nodes of the graph
+    functions : dict
+        The function to run for each node, keyed by node id
+    inputs : any
+        The inputs to the graph
+    workers : int or None (default None)
+        The maximum number of nodes to run at once. If None, the default of the executor is
+        used
+    executor : str (default 'thread')
+        Either 'thread', to run nodes in a thread pool, or 'process', to run nodes in a pool
+        of spawned processes, in which case functions, inputs, and results are pickled
+    costs : dict or None (default None)
+        The expected cost of each node, used to start nodes on the critical path first when
+        more nodes are ready than there are workers
+
+    Returns
+    -------
+    results : dict
+        The result of each node, keyed by node id
+    timings : dict
+        The number of seconds each node took to run, keyed by node id
+    """
+    if executor not in ALLOWED_EXECUTORS:
+        raise ValueError(f'executor must be one of {ALLOWED_EXECUTORS}')
+    if workers is not None and (not isinstance(workers, int) or workers < 1):
+        raise ValueError('workers must be a positive integer or None')
+
+    dependencies = get_dependencies(nodes)
+    priorities = get_priorities(nodes, costs)
+    dependents = {node_id: [] for node_id in dependencies}
+    for node_id, node_dependencies in dependencies.items():
+        for dependency in set(node_dependencies):
+            dependents[dependency].append(node_id)
+    remaining = {node_id: len(set(deps)) for node_id, deps in dependencies.items()}
+
+    if executor == 'thread':
+        pool = ThreadPoolExecutor(max_workers=workers)
+    else:
+        pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+    results, timings, futures = {}, {}, {}
+    with pool:
+        def submit(ready):
+            for node_id in sorted(ready, key=lambda n: -priorities[n]):
+                node_dependencies = dependencies[node_id]
+                if not node_dependencies:
+                    node_inputs = inputs
+                elif len(node_dependencies) == 1:
+                    node_inputs = results[node_dependencies[0]]
+                else:
+                    node_inputs = [results[d] for d in node_dependencies]
+                futures[pool.submit(timed_call, functions[node_id], node_inputs)] = node_id
+
+        submit([node_id for node_id, count in remaining.items() if count == 0])
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            ready = []
+            for future in done:
+                node_id = futures.pop(future)
+                results[node_id], timings[node_id] = future.result()
+                for dependent in dependents[node_id]:
+                    remaining[dependent] -= 1
+                    if remaining[dependent] == 0:
+                        ready.append(dependent)
+            submit(ready)
+    return results, timings
@@ -13,12 +13,44 @@ Here is an example of how to serve a simple keras model using these utilities:
 )
 App created successfullly. Serving and awaiting requests
 
+To coalesce concurrent requests into batched predictions, pass `max_batch_size`. Statistics of
+batch sizes, latencies, and throughput are then served at `/stats`:
+
+>>> serving.deploy_model('my_model', 'keras', max_batch_size=64, max_wait_ms=2)
+
+To serve with an asynchronous Starlette app under uvicorn instead of Flask and waitress, with
+inference on a bounded thread pool, backpressure, and request timeouts, use `engine='asgi'`:
+
+>>> serving.deploy_model('my_model', 'keras', engine='asgi', max_concurrency=4, timeout=10)
+
+To serve from several processes on the same port, use `workers`. The weights of scikit-learn
+and PyTorch models are then memory-mapped once for all workers:
+
+>>> serving.deploy_model('my_model', 'sklearn', workers=8)
+
 And to retrieve predictions from the model:
 
 >>> # From a separate terminal, assume data is already loaded
 >>> from aisquared import serving
 >>> serving.get_remote_predictions(data) # Do not need to change host or port if predicting from the same machine
 *predictions*
+
+Arrays can instead be sent and received in the binary NPY format, which avoids converting
+every value to and from text:
+
+>>> serving.get_remote_prediction(data, binary=True)
+
+To serve many models from one process, each loaded on its first request and evicted when
+least recently used, use `deploy_models` and pass the name of the model to predict with:
+
+>>> serving.deploy_models(
+    {
+        'churn': {'saved_model': 'churn_model', 'model_type': 'sklearn'},
+        'sentiment': {'saved_model': 'my_model', 'model_type': 'keras'}
+    },
+    max_loaded=8
+)
+>>> serving.get_remote_prediction(data, model='churn')
 """
 
 try:
@@ -29,5 +61,10 @@ try:
 except ImportError:
     pass
 
-from .deploy_model import deploy_model, load_beyondml_model, load_keras_model, load_pytorch_model, load_sklearn_model, load_tensorflow_model
+from .deploy_model import deploy_model, create_app, load_model, load_additional_functions, get_predict_function, load_beyondml_model, load_keras_model, load_pytorch_model, load_sklearn_model, load_tensorflow_model
 from .get_remote_prediction import get_remote_prediction
+from .batching import MicroBatcher
+from .wire import JSON_CONTENT_TYPE, NPY_CONTENT_TYPE, to_npy, from_npy
+from .asgi import create_asgi_app, serve_asgi
+from .workers import WorkerPool, export_shared_model, load_shared_model
+from .router import ModelRegistry, ServedModel, create_router_app, deploy_models
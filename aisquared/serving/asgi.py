@@ -0,0 +1,158 @@
+"""
+Asynchronous serving of models with an ASGI app, as an alternative to Flask and waitress.
+
+Requests are parsed on the event loop, while preprocessing, inference, and postprocessing run
+on a bounded thread pool, so that a slow model never blocks the server from accepting and
+parsing other requests.
+"""
+
+try:
+    from starlette.applications import Starlette
+    from starlette.responses import Response, PlainTextResponse
+    from starlette.routing import Route
+except ImportError:
+    Starlette = None
+
+try:
+    import uvicorn
+except ImportError:
+    uvicorn = None
+
+from concurrent.futures import ThreadPoolExecutor
+from .deploy_model import get_predict_function, prepare_inputs, format_predictions, read_request_data, RequestError
+from .wire import accepts_npy
+from .batching import MicroBatcher
+import contextlib
+import asyncio
+import json
+
+
+def create_asgi_app(
+        model,
+        model_type: str,
+        preprocess=None,
+        postprocess=None,
+        max_batch_size: int = None,
+        max_wait_ms: float = 5.0,
+        max_concurrency: int = 4,
+        max_pending: int = 64,
+        timeout: float = 30
+):
+    """
+    Create a Starlette app serving a loaded model at `/predict`, with the same request and
+    response format as the Flask app created by `create_app`
+
+    Parameters
+    ----------
+    model : model object
+        The loaded model
+    model_type : str
+        The type of model
+    preprocess : callable or None (default None)
+        Function applied to the data of each request before prediction
+    postprocess : callable or None (default None)
+        Function applied to the predictions of each request
+    max_batch_size : int or None (default None)
+        If provided, concurrent requests are coalesced into batches of up to this many rows
+        with a `MicroBatcher`, and statistics of the batches are served at `/stats`. Requests
+        waiting for their batch do not occupy a thread
+    max_wait_ms : float (default 5.0)
+        The maximum number of milliseconds a request waits for other requests to batch with
+    max_concurrency : int (default 4)
+        The number of threads running preprocessing, inference, and postprocessing
+    max_pending : int (default 64)
+        The maximum number of requests being handled at once. Further requests are rejected
+        with status 503 until others finish
+    timeout : float or None (default 30)
+        The number of seconds after which a request is abandoned with status 504. Inference
+        which has already started is not interrupted
+    """
+    if Starlette is None:
+        raise ImportError(
+            'starlette must be installed to use the asgi engine')
+    if not isinstance(max_concurrency, int) or max_concurrency < 1:
+        raise ValueError('max_concurrency must be a positive integer')
+    if not isinstance(max_pending, int) or max_pending < 1:
+        raise ValueError('max_pending must be a positive integer')
+
+    predict_function = get_predict_function(
+        model, model_type, max_batch_size is not None)
+    batcher = None
+    if max_batch_size is not None:
+        batcher = MicroBatcher(predict_function, max_batch_size, max_wait_ms)
+    executor = ThreadPoolExecutor(max_workers=max_concurrency)
+    pending = 0
+
+    def handle(data, binary: bool) -> tuple:
+        return format_predictions(
+            predict_function(prepare_inputs(data, model_type, preprocess)), postprocess, binary)
+
+    async def respond(data, binary: bool) -> Response:
+        loop = asyncio.get_running_loop()
+        try:
+            if batcher is None:
+                body, content_type = await loop.run_in_executor(executor, handle, data, binary)
+            else:
+                to_predict = await loop.run_in_executor(
+                    executor, prepare_inputs, data, model_type, preprocess)
+                predictions = await asyncio.wrap_future(batcher.submit(to_predict))
+                body, content_type = await loop.run_in_executor(
+                    executor, format_predictions, predictions, postprocess, binary)
+        except RequestError as e:
+            return PlainTextResponse(str(e), 400)
+        except Exception:
+            return PlainTextResponse('Error in performing prediction', 400)
+        return Response(body, media_type=content_type)
+
+    async def predict(request):
+        nonlocal pending
+        if pending >= max_pending:
+            return PlainTextResponse(
+                'Server is at capacity', 503, headers={'Retry-After': '1'})
+        pending += 1
+        try:
+            data = read_request_data(await request.body(), request.headers.get('content-type'))
+            binary = accepts_npy(request.headers.get('accept'))
+            return await asyncio.wait_for(respond(data, binary), timeout)
+        except asyncio.TimeoutError:
+            return PlainTextResponse('Prediction timed out', 504)
+        finally:
+            pending -= 1
+
+    async def stats(request):
+        if batcher is None:
+            return PlainTextResponse('Batching is not enabled', 404)
+        return Response(json.dumps(batcher.stats()), media_type='application/json')
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        yield
+        if batcher is not None:
+            batcher.close()
+        executor.shutdown(wait=False)
+
+    return Starlette(
+        routes=[
+            Route('/predict', predict, methods=['POST']),
+            Route('/stats', stats, methods=['GET'])
+        ],
+        lifespan=lifespan
+    )
+
+
+def serve_asgi(app, host: str = '127.0.0.1', port: int = 2244) -> None:
+    """
+    Serve an ASGI app with uvicorn
+
+    Parameters
+    ----------
+    app : ASGI app
+        The app to serve
+    host : str (default '127.0.0.1')
+        The host to serve on
+    port : int (default 2244)
+        The port to serve on
+    """
+    if uvicorn is None:
+        raise ImportError('uvicorn must be installed to use the asgi engine')
+    uvicorn.run(app, host=host, port=port, log_level='warning')
@@ -0,0 +1,289 @@
+"""
+Dynamic micro-batching of prediction requests.
+
+Requests arriving from concurrent callers are queued and coalesced into a single call of the
+prediction function, whose results are then split back up and returned to each caller.
+"""
+
+from concurrent.futures import Future
+import numpy as np
+import collections
+import threading
+import queue
+import time
+
+# Number of recent requests kept to compute latency percentiles
+STATS_WINDOW = 10000
+
+# Latency percentiles reported by `MicroBatcher.stats`
+PERCENTILES = (50, 90, 99)
+
+
+def num_rows(inputs) -> int:
+    """
+    Get the number of rows of a batch, which is either an array or a list of arrays with the
+    same number of rows, one for each input of a multi-input model
+    """
+    if isinstance(inputs, list):
+        return len(inputs[0])
+    return len(inputs)
+
+
+def signature(inputs) -> tuple:
+    """
+    Get the dtype and shape apart from the number of rows of a batch. Only batches with the
+    same signature can be concatenated
+    """
+    if isinstance(inputs, list):
+        return tuple([signature(i) for i in inputs])
+    return (inputs.dtype.str, inputs.shape[1:])
+
+
+def concatenate(batches: list):
+    """
+    Concatenate batches with the same signature along their rows
+    """
+    if len(batches) == 1:
+        return batches[0]
+    if isinstance(batches[0], list):
+        return [np.concatenate(inputs) for inputs in zip(*batches)]
+    return np.concatenate(batches)
+
+
+def split(outputs, sizes: list) -> list:
+    """
+    Split the outputs of a concatenated batch into the outputs of each batch, given the
+    number of rows of each. Outputs may be an array or a list of arrays
+    """
+    if len(sizes) == 1:
+        return [outputs]
+    indexes = np.cumsum(sizes)[:-1]
+    if isinstance(outputs, (list, tuple)):
+        return [list(parts) for parts in zip(*[np.split(np.asarray(o), indexes) for o in outputs])]
+    return np.split(np.asarray(outputs), indexes)
+
+
+def _percentiles(values) -> dict:
+    if not values:
+        return {}
+    milliseconds = np.percentile(np.array(values) * 1000, PERCENTILES)
+    return {f'p{p}': float(value) for p, value in zip(PERCENTILES, milliseconds)}
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent calls of a prediction function into batches
+
+    A worker thread takes the oldest queued request and keeps adding queued requests with the
+    same dtype and shape until the batch holds `max_batch_size` rows or the oldest request has
+    waited `max_wait_ms` milliseconds. The batch is then predicted on in a single call and each
+    caller receives the rows of the result belonging to its own request. Requests are never
+    split, so a request with more than `max_batch_size` rows is predicted on by itself.
+
+    Example usage:
+
+    >>> from aisquared.serving import MicroBatcher
+    >>> batcher = MicroBatcher(model.predict, max_batch_size=64, max_wait_ms=2)
+    >>> batcher.predict(np.array([[1.0, 2.0]]))  # Called concurrently from many threads
+    array([[0.73]])
+    >>> batcher.stats()['batch_sizes']
+    {1: {'batches': 3, ...}, 17: {'batches': 40, ...}}
+    """
+
+    def __init__(
+            self,
+            predict,
+            max_batch_size: int = 32,
+            max_wait_ms: float = 5.0
+    ):
+        """
+        Parameters
+        ----------
+        predict : callable
+            Function taking a batch, either an array or a list of arrays, and returning an
+            array or a list of arrays with one row for each row of the batch
+        max_batch_size : int (default 32)
+            The maximum number of rows to predict on at once
+        max_wait_ms : float (default 5.0)
+            The maximum number of milliseconds a request waits for other requests to arrive
+            before its batch is predicted on
+        """
+        if not isinstance(max_batch_size, int) or max_batch_size < 1:
+            raise ValueError('max_batch_size must be a positive integer')
+        if not isinstance(max_wait_ms, (int, float)) or max_wait_ms < 0:
+            raise ValueError('max_wait_ms must be a non-negative number')
+
+        self.predict_function = predict
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+
+        self._queue = queue.Queue()
+        self._pending = collections.deque()
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, inputs) -> Future:
+        """
+        Queue a batch of inputs to be predicted on
+
+        Parameters
+        ----------
+        inputs : array-like or list of array-like
+            The batch of inputs
+
+        Returns
+        -------
+        future : concurrent.futures.Future
+            Future resolving to the predictions for `inputs`
+        """
+        if self._closed:
+            raise RuntimeError('The batcher has been closed')
+        if isinstance(inputs, list) and inputs and isinstance(inputs[0], np.ndarray):
+            inputs = [np.asarray(i) for i in inputs]
+        else:
+            inputs = np.asarray(inputs)
+        future = Future()
+        self._queue.put((inputs, future, time.perf_counter()))
+        return future
+
+    def predict(self, inputs):
+        """
+        Predict on a batch of inputs, blocking until its batch has been predicted on
+
+        Parameters
+        ----------
+        inputs : array-like or list of array-like
+            The batch of inputs
+        """
+        return self.submit(inputs).result()
+
+    def _next(self, timeout: float = None):
+        if self._pending:
+            return self._pending.popleft()
+        return self._queue.get(timeout=timeout)
+
+    def _gather(self) -> list:
+        """
+        Wait for a request, then gather the requests to predict on with it
+        """
+        first = self._next()
+        if first is None:
+            return None
+        requests = [first]
+        first_signature = signature(first[0])
+        rows = num_rows(first[0])
+        deadline = first[2] + self.max_wait_ms / 1000
+        skipped = []
+        while rows < self.max_batch_size:
+            try:
+                request = self._next(
+                    timeout=max(deadline - time.perf_counter(), 0))
+            except queue.Empty:
+                break
+            if request is None:
+                self._queue.put(None)
+                break
+            request_rows = num_rows(request[0])
+            if signature(request[0]) != first_signature:
+                skipped.append(request)
+            elif rows + request_rows > self.max_batch_size:
+                skipped.append(request)
+                break
+            else:
+                requests.append(request)
+                rows += request_rows
+        # Requests which could not join the batch are the first to be considered for the next
+        self._pending.extendleft(reversed(skipped))
+        return requests
+
+    def _run(self) -> None:
+        while True:
+            requests = self._gather()
+            if requests is None:
+                return
+            # Requests cancelled while queued, such as after timing out, are dropped
+            requests = [r for r in requests if r[1].set_running_or_notify_cancel()]
+            if not requests:
+                continue
+            start = time.perf_counter()
+            sizes = [num_rows(inputs) for inputs, _, _ in requests]
+            try:
+                outputs = split(self.predict_function(
+                    concatenate([inputs for inputs, _, _ in requests])), sizes)
+            except Exception as e:
+                for _, future, _ in requests:
+                    future.set_exception(e)
+                continue
+            end = time.perf_counter()
+            for (_, future, _), output in zip(requests, outputs):
+                future.set_result(output)
+            self._record(requests, sum(sizes), start, end)
+
+    def _record(self, requests: list, rows: int, start: float, end: float) -> None:
+        with self._lock:
+            self._requests += len(requests)
+            self._rows += rows
+            self._batches += 1
+            self._waits.extend([start - arrival for _, _, arrival in requests])
+            self._latencies.extend([end - arrival for _, _, arrival in requests])
+            batch_stats = self._batch_sizes.setdefault(rows, [0, 0.0])
+            batch_stats[0] += 1
+            batch_stats[1] += end - start
+
+    def reset_stats(self) -> None:
+        """
+        Forget the statistics of previous requests
+        """
+        with self._lock:
+            self._requests = 0
+            self._rows = 0
+            self._batches = 0
+            self._waits = collections.deque(maxlen=STATS_WINDOW)
+            self._latencies = collections.deque(maxlen=STATS_WINDOW)
+            self._batch_sizes = {}
+            self._started = time.perf_counter()
+
+    def stats(self) -> dict:
+        """
+        Get statistics for tuning `max_batch_size` and `max_wait_ms`
+
+        Returns
+        -------
+        stats : dict
+            The number of requests, rows, and batches predicted on, the overall throughput in
+            rows per second, percentiles of the milliseconds requests spent queued and in
+            total, and, for each batch size, the number of batches, the mean milliseconds taken
+            to predict on them, and the resulting throughput in rows per second
+        """
+        with self._lock:
+            elapsed = time.perf_counter() - self._started
+            batch_sizes = {}
+            for size, (batches, seconds) in sorted(self._batch_sizes.items()):
+                batch_sizes[size] = {
+                    'batches': batches,
+                    'mean_predict_ms': seconds / batches * 1000,
+                    'rows_per_second': size * batches / seconds if seconds > 0 else None
+                }
+            return {
+                'requests': self._requests,
+                'rows': self._rows,
+                'batches': self._batches,
+                'mean_batch_size': self._rows / self._batches if self._batches else None,
+                'rows_per_second': self._rows / elapsed if elapsed > 0 else None,
+                'wait_ms': _percentiles(list(self._waits)),
+                'latency_ms': _percentiles(list(self._latencies)),
+                'batch_sizes': batch_sizes
+            }
+
+    def close(self) -> None:
+        """
+        Predict on the requests already queued, then stop the worker thread
+        """
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
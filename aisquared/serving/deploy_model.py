@@ -24,7 +24,10 @@ try:
 except ImportError:
     pass
 
-from importlib import import_module
+from importlib.util import spec_from_file_location, module_from_spec
+from aisquared.base.serialization import loads
+from .batching import MicroBatcher
+from .wire import JSON_CONTENT_TYPE, NPY_CONTENT_TYPE, to_npy, from_npy, is_npy, accepts_npy
 import json
 import os
 
@@ -36,6 +39,11 @@ _ALLOWED_TYPES = [
     'beyondml'
 ]
 
+ALLOWED_ENGINES = [
+    'waitress',
+    'asgi'
+]
+
 
 def load_beyondml_model(model: str, custom_objects: dict):
     """
@@ -47,16 +55,9 @@ def load_beyondml_model(model: str, custom_objects: dict):
     )
 
 
-def deploy_model(
-        saved_model: str,
-        model_type: str,
-        host: str = '127.0.0.1',
-        port: int = 2244,
-        custom_objects: dict = None,
-        additional_functions_file: str = None
-):
+def load_model(saved_model: str, model_type: str, custom_objects: dict = None):
     """
-    Deploy a model to a Flask server on the specified host
+    Load a saved model of one of the allowed model types
 
     Parameters
     ----------
@@ -64,108 +65,425 @@ def deploy_model(
         The path to the saved model directory or model file
     model_type : str
         The type of model
-    host : str (default '127.0.0.1')
-        The host to deploy to
-    port : int (default 2244)
-        The port to deploy to
     custom_objects : dict or None (default None)
         Any custom objects to load when using a BeyondML model
-    additional_functions_file : file-like or None (default None)
-        File name containing additional functions (which have to be named `preprocess` and `postprocess`, if created)
-        that are used during the prediction process
     """
     if model_type not in _ALLOWED_TYPES:
         raise ValueError(
             f'model_type must be one of {_ALLOWED_TYPES}, got {model_type}')
 
     if model_type == 'tensorflow':
-        model = load_tensorflow_model(saved_model)
+        return load_tensorflow_model(saved_model)
     elif model_type == 'sklearn':
-        model = load_sklearn_model(saved_model)
+        return load_sklearn_model(saved_model)
     elif model_type == 'pytorch':
-        model = load_pytorch_model(saved_model)
+        return load_pytorch_model(saved_model)
     elif model_type == 'keras':
-        model = load_keras_model(saved_model)
+        return load_keras_model(saved_model)
     elif model_type == 'beyondml':
-        model = load_beyondml_model(saved_model, custom_objects)
+        return load_beyondml_model(saved_model, custom_objects)
 
-    # Import preprocessing and postprocessing steps, if provided
-    if additional_functions_file:
-        file_name = os.path.splitext(
-            os.path.basename(additional_functions_file))[0]
-        dir_name = os.path.dirname(os.path.abspath(additional_functions_file))
-        module = import_module(file_name, dir_name)
 
+def load_additional_functions(additional_functions_file: str = None) -> tuple:
+    """
+    Import the `preprocess` and `postprocess` functions from a file, if it defines them
+
+    Parameters
+    ----------
+    additional_functions_file : file-like or None (default None)
+        File name containing additional functions, which have to be named `preprocess` and
+        `postprocess`
+
+    Returns
+    -------
+    preprocess : callable or None
+        The `preprocess` function, if defined
+    postprocess : callable or None
+        The `postprocess` function, if defined
+    """
+    if not additional_functions_file:
+        return None, None
+
+    # The file is imported from its path, so that files with the same name in different
+    # directories do not share a module
+    file_name = os.path.splitext(
+        os.path.basename(additional_functions_file))[0]
+    spec = spec_from_file_location(
+        file_name, os.path.abspath(additional_functions_file))
+    module = module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return getattr(module, 'preprocess', None), getattr(module, 'postprocess', None)
+
+
+def get_predict_function(model, model_type: str, batched: bool = False):
+    """
+    Get a function which converts a batch to the inputs expected by a model, predicts on it,
+    and returns the predictions as an array, or as a list of arrays for models with several
+    outputs
+
+    Parameters
+    ----------
+    model : model object
+        The loaded model
+    model_type : str
+        The type of model
+    batched : bool (default False)
+        Whether the function is called by a `MicroBatcher`. Keras models then predict with
+        `predict_on_batch`, which avoids the per-call overhead of `predict` on the already
+        batched inputs. Otherwise, `predict` is used
+    """
+    if model_type not in _ALLOWED_TYPES:
+        raise ValueError(
+            f'model_type must be one of {_ALLOWED_TYPES}, got {model_type}')
+
+    def to_outputs(predictions):
+        if isinstance(predictions, (list, tuple)):
+            return [np.asarray(p) for p in predictions]
+        return np.asarray(predictions)
+
+    if model_type == 'pytorch':
+        return lambda to_predict: model(torch.Tensor(np.asarray(to_predict))).detach().numpy()
+
+    predict = model.predict
+    if batched:
+        predict = getattr(model, 'predict_on_batch', predict)
+    if model_type == 'beyondml':
+        return lambda to_predict: to_outputs(predict([np.asarray(d) for d in to_predict]))
+    return lambda to_predict: to_outputs(predict(np.asarray(to_predict)))
+
+
+def to_list(predictions):
+    """
+    Convert predictions to lists so that they can be serialized
+    """
+    if isinstance(predictions, (list, tuple)):
+        return [to_list(p) for p in predictions]
+    return np.asarray(predictions).tolist()
+
+
+class RequestError(Exception):
+    """
+    Error in the data of a prediction request, which is returned with status 400
+    """
+
+
+def prepare_inputs(data, model_type: str, preprocess=None):
+    """
+    Get the inputs to predict on from the decoded body of a request
+
+    Parameters
+    ----------
+    data : dict
+        The decoded body of the request, with the inputs under 'data'
+    model_type : str
+        The type of model
+    preprocess : callable or None (default None)
+        Function applied to the inputs before they are converted to arrays
+
+    Raises
+    ------
+    RequestError
+        If the inputs are missing or cannot be converted to arrays
+    """
+    # try to get the data
+    try:
+        to_predict = data['data']
+        if preprocess:
+            to_predict = preprocess(to_predict)
+    except Exception:
+        raise RequestError('Data appears to be incorrectly formatted')
+
+    # try to get the data correctly formatted for prediction
+    try:
+        if model_type == 'beyondml':
+            to_predict = [
+                np.asarray(d) for d in to_predict
+            ]
+        elif model_type in ['tensorflow', 'keras', 'pytorch', 'sklearn']:
+            to_predict = np.asarray(to_predict)
+    except Exception:
+        raise RequestError(
+            'Data passed could not be correctly converted to numpy array for prediction')
+    return to_predict
+
+
+def format_predictions(predictions, postprocess=None, binary: bool = False) -> tuple:
+    """
+    Get the body and content type of the response to a request from its predictions
+
+    Parameters
+    ----------
+    predictions : np.ndarray or list of np.ndarray
+        The predictions for the request
+    postprocess : callable or None (default None)
+        Function applied to the predictions, as lists. Errors in `postprocess` are printed and
+        the predictions are returned without it
+    binary : bool (default False)
+        Whether the client accepts responses in the NPY format, in which case predictions
+        which form a single numeric array are sent as NPY rather than JSON
+
+    Returns
+    -------
+    body : str or bytes
+        The body of the response
+    content_type : str
+        Either `JSON_CONTENT_TYPE` or `NPY_CONTENT_TYPE`
+    """
+    if binary and postprocess is None and isinstance(predictions, np.ndarray) \
+            and predictions.dtype.kind in 'biufc':
+        return to_npy(predictions), NPY_CONTENT_TYPE
+
+    predictions = to_list(predictions)
+    if postprocess:
         try:
-            preprocess = module.preprocess
-        except AttributeError:
-            preprocess = None
+            predictions = postprocess(predictions)
+        except Exception as e:
+            print(e)
 
+    if binary:
         try:
-            postprocess = module.postprocess
-        except AttributeError:
-            postprocess = None
+            array = np.asarray(predictions)
+        except ValueError:
+            array = None
+        if array is not None and array.dtype.kind in 'biufc':
+            return to_npy(array), NPY_CONTENT_TYPE
+    return json.dumps({
+        'predictions': predictions
+    }), JSON_CONTENT_TYPE
+
+
+def read_request_data(body, content_type: str):
+    """
+    Decode the body of a request, sent either as JSON with the inputs under 'data' or as an
+    array in the NPY format, which is read without being copied. Returns None if the body
+    cannot be decoded
+    """
+    try:
+        if is_npy(content_type):
+            return {'data': from_npy(body)}
+        return loads(body)
+    except Exception:
+        return None
+
+
+def respond(model_type: str, predict_function, preprocess=None, postprocess=None):
+    """
+    Respond to the current Flask request with the predictions of a model
+
+    Parameters
+    ----------
+    model_type : str
+        The type of model
+    predict_function : callable
+        Function predicting on a batch, as returned by `get_predict_function`
+    preprocess : callable or None (default None)
+        Function applied to the data of the request before prediction
+    postprocess : callable or None (default None)
+        Function applied to the predictions of the request
+    """
+    try:
+        to_predict = prepare_inputs(
+            read_request_data(request.get_data(), request.content_type),
+            model_type,
+            preprocess
+        )
+    except RequestError as e:
+        return Response(str(e), 400)
+
+    # try to return the actual predictions
+    try:
+        body, content_type = format_predictions(
+            predict_function(to_predict),
+            postprocess,
+            accepts_npy(request.headers.get('Accept'))
+        )
+        return Response(body, content_type=content_type)
+    except Exception:
+        return Response(
+            'Error in performing prediction',
+            400
+        )
+
+
+def create_app(
+        model,
+        model_type: str,
+        preprocess=None,
+        postprocess=None,
+        max_batch_size: int = None,
+        max_wait_ms: float = 5.0
+):
+    """
+    Create the Flask app serving a loaded model at `/predict`
+
+    Parameters
+    ----------
+    model : model object
+        The loaded model
+    model_type : str
+        The type of model
+    preprocess : callable or None (default None)
+        Function applied to the data of each request before prediction
+    postprocess : callable or None (default None)
+        Function applied to the predictions of each request
+    max_batch_size : int or None (default None)
+        If provided, concurrent requests are coalesced into batches of up to this many rows
+        with a `MicroBatcher`, and statistics of the batches are served at `/stats`
+    max_wait_ms : float (default 5.0)
+        The maximum number of milliseconds a request waits for other requests to batch with
+    """
+    predict_function = get_predict_function(
+        model, model_type, max_batch_size is not None)
+    batcher = None
+    if max_batch_size is not None:
+        batcher = MicroBatcher(predict_function, max_batch_size, max_wait_ms)
+        predict_function = batcher.predict
 
     # Create the Flask app
     app = Flask(__name__)
+    app.config['batcher'] = batcher
 
     # Create the predict function
     @app.route('/predict', methods=['POST'])
     def predict():
+        return respond(model_type, predict_function, preprocess, postprocess)
 
-        # try to get the data
-        try:
-            data = request.get_json()
-            to_predict = data['data']
-            if preprocess:
-                to_predict = preprocess(to_predict)
-        except Exception:
-            return Response(
-                'Data appears to be incorrectly formatted',
-                400
-            )
-
-        # try to get the data correctly formatted for prediction
-        try:
-            if model_type == 'beyondml':
-                to_predict = [
-                    np.asarray(d) for d in to_predict
-                ]
-            elif model_type in ['tensorflow', 'keras', 'pytorch', 'sklearn']:
-                to_predict = np.asarray(to_predict)
-        except Exception:
-            return Response(
-                'Data passed could not be correctly converted to numpy array for prediction',
-                400
-            )
-
-        # try to return the actual predictions
+    @app.route('/stats', methods=['GET'])
+    def stats():
+        if batcher is None:
+            return Response('Batching is not enabled', 404)
+        return json.dumps(batcher.stats())
+
+    return app
+
+
+def deploy_model(
+        saved_model: str,
+        model_type: str,
+        host: str = '127.0.0.1',
+        port: int = 2244,
+        custom_objects: dict = None,
+        additional_functions_file: str = None,
+        max_batch_size: int = None,
+        max_wait_ms: float = 5.0,
+        engine: str = 'waitress',
+        max_concurrency: int = 4,
+        max_pending: int = 64,
+        timeout: float = 30,
+        workers: int = 1
+):
+    """
+    Deploy a model to a Flask server on the specified host, or to an asynchronous Starlette
+    server when `engine` is 'asgi'
+
+    Parameters
+    ----------
+    saved_model : Path-like
+        The path to the saved model directory or model file
+    model_type : str
+        The type of model
+    host : str (default '127.0.0.1')
+        The host to deploy to
+    port : int (default 2244)
+        The port to deploy to
+    custom_objects : dict or None (default None)
+        Any custom objects to load when using a BeyondML model
+    additional_functions_file : file-like or None (default None)
+        File name containing additional functions (which have to be named `preprocess` and `postprocess`, if created)
+        that are used during the prediction process
+    max_batch_size : int or None (default None)
+        If provided, concurrent requests are coalesced into a single prediction of up to this
+        many rows, and statistics of batch sizes, latencies, and throughput are served at
+        `/stats`. The server then uses at least `max_batch_size` threads, so that enough
+        requests can wait to be batched together
+    max_wait_ms : float (default 5.0)
+        The maximum number of milliseconds a request waits for other requests to batch with,
+        when `max_batch_size` is provided
+    engine : str (default 'waitress')
+        Either 'waitress', to serve a Flask app with waitress, or 'asgi', to serve a Starlette
+        app with uvicorn, which parses requests asynchronously and runs inference on a bounded
+        thread pool
+    max_concurrency : int (default 4)
+        The number of requests predicted on at once. With the 'waitress' engine, this is the
+        number of server threads, which is raised to `max_batch_size` when batching
+    max_pending : int (default 64)
+        With the 'asgi' engine, the maximum number of requests handled at once, beyond which
+        requests are rejected with status 503
+    timeout : float or None (default 30)
+        With the 'asgi' engine, the number of seconds after which a request is abandoned with
+        status 504
+    workers : int (default 1)
+        The number of processes serving the model on the same port, each of which runs its
+        own server with the settings above. See `WorkerPool`, which memory-maps the weights of
+        scikit-learn and PyTorch models once for all workers. `custom_objects` must then be
+        picklable
+    """
+    if engine not in ALLOWED_ENGINES:
+        raise ValueError(
+            f'engine must be one of {ALLOWED_ENGINES}, got {engine}')
+
+    if workers != 1:
+        from .workers import WorkerPool
+        pool = WorkerPool(
+            saved_model,
+            model_type,
+            workers,
+            host,
+            port,
+            custom_objects,
+            additional_functions_file,
+            engine,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            max_concurrency=max_concurrency,
+            max_pending=max_pending,
+            timeout=timeout
+        )
+        print(f'Workers created successfully. Serving and awaiting requests with {workers} workers.')
         try:
-            if model_type != 'pytorch':
-                predictions = np.asarray(model.predict(to_predict)).tolist()
-            elif model_type == 'pytorch':
-                predictions = model(torch.Tensor(to_predict)
-                                    ).detach().numpy().tolist()
-
-            if postprocess:
-                try:
-                    predictions = postprocess(predictions)
-                except Exception as e:
-                    print(e)
-            return json.dumps({
-                'predictions': predictions
-            })
-
-        except Exception:
-            return Response(
-                'Error in performing prediction',
-                400
-            )
+            pool.join()
+        finally:
+            pool.stop()
+        return
+
+    model = load_model(saved_model, model_type, custom_objects)
+
+    # Import preprocessing and postprocessing steps, if provided
+    preprocess, postprocess = load_additional_functions(
+        additional_functions_file)
+
+    if engine == 'asgi':
+        from .asgi import create_asgi_app, serve_asgi
+        app = create_asgi_app(
+            model,
+            model_type,
+            preprocess,
+            postprocess,
+            max_batch_size,
+            max_wait_ms,
+            max_concurrency,
+            max_pending,
+            timeout
+        )
+        print('App created successfully. Serving and awaiting requests.')
+        serve_asgi(app, host, port)
+        return
+
+    app = create_app(
+        model,
+        model_type,
+        preprocess,
+        postprocess,
+        max_batch_size,
+        max_wait_ms
+    )
 
     # run the app
     print('App created successfully. Serving and awaiting requests.')
     waitress.serve(
         app,
         host=host,
-        port=port
+        port=port,
+        threads=max_concurrency if max_batch_size is None else max(
+            max_concurrency, max_batch_size)
     )
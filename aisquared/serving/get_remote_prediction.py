@@ -1,4 +1,6 @@
 from typing import Union
+from urllib.parse import quote
+from .wire import NPY_CONTENT_TYPE, JSON_CONTENT_TYPE, to_npy, from_npy, is_npy
 import numpy as np
 import requests
 import json
@@ -7,8 +9,10 @@ import json
 def get_remote_prediction(
     data: Union[dict, str, np.ndarray, list],
     host: str = '127.0.0.1',
-    port: int = 2244
-) -> list:
+    port: int = 2244,
+    binary: bool = False,
+    model: str = None
+) -> Union[list, np.ndarray]:
     """
     Send data to use for prediction
 
@@ -20,6 +24,14 @@ def get_remote_prediction(
         The host to use
     port : int (default '2244')
         The port to use
+    binary : bool (default False)
+        Whether to send arrays, and accept predictions, in the binary NPY format rather than
+        as JSON. Only applies when data is an array or a list which converts to a numeric
+        array
+    model : str or None (default None)
+        The name of the model to predict with, when the server was started with
+        `deploy_models`. Data is then sent to `/models/<model>/predict`. If None, data is sent
+        to `/predict`, as served by `deploy_model`
 
     Notes
     -----
@@ -27,20 +39,40 @@ def get_remote_prediction(
       correctly formatted
     - If data is a string, it is expected to already be
       correctly formatted
+    - If `binary` is True and the server returns predictions in the
+      binary format, they are returned as a read-only array
 
     Returns
     -------
-    predictions : list
-        The predictions from the deployed model
+    predictions : list or np.ndarray
+        The predictions from the deployed model, decoded from JSON, or a read-only array if
+        `binary` is True and the server responded in the binary format
     """
     # Setup the url and headers
-    url = f'http://{host}:{port}/predict'
+    if model is None:
+        url = f'http://{host}:{port}/predict'
+    else:
+        url = f'http://{host}:{port}/models/{quote(model, safe="")}/predict'
     headers = {
         'Content-Type': 'application/json'
     }
 
+    # Send arrays in the binary format if requested
+    if binary:
+        headers['Accept'] = f'{NPY_CONTENT_TYPE}, {JSON_CONTENT_TYPE}'
+        if isinstance(data, (np.ndarray, list)):
+            try:
+                array = np.asarray(data)
+            except ValueError:
+                array = np.empty(0, dtype=object)
+            if array.dtype.kind in 'biufc':
+                data = to_npy(array)
+                headers['Content-Type'] = NPY_CONTENT_TYPE
+
     # Format the data
-    if isinstance(data, dict):
+    if isinstance(data, bytes):
+        pass
+    elif isinstance(data, dict):
         data = json.dumps(data)
     elif isinstance(data, str):
         data = data
@@ -67,5 +99,7 @@ def get_remote_prediction(
 
     if resp.status_code != 200:
         return resp
+    elif is_npy(resp.headers.get('Content-Type')):
+        return from_npy(resp.content)
     else:
         return resp.json()['predictions']
@@ -0,0 +1,250 @@
+"""
+Serving of many models from a single process, each at `/models/<name>/predict`.
+
+Models are loaded the first time they are requested, and only the most recently used models
+are kept in memory, so that a large number of small models can share one server and one copy
+of the libraries they depend on.
+"""
+
+try:
+    from flask import Flask, Response
+except ImportError:
+    pass
+
+try:
+    import waitress
+except ImportError:
+    pass
+
+from .deploy_model import _ALLOWED_TYPES, load_model, load_additional_functions, get_predict_function, respond
+import collections
+import threading
+import json
+
+# Settings which can be given for each model
+MODEL_SETTINGS = (
+    'saved_model',
+    'model_type',
+    'custom_objects',
+    'additional_functions_file'
+)
+
+ServedModel = collections.namedtuple(
+    'ServedModel', ['model_type', 'predict_function', 'preprocess', 'postprocess'])
+
+
+class ModelRegistry:
+    """
+    Registry of named models, which are loaded lazily and evicted when least recently used
+
+    Example usage:
+
+    >>> from aisquared.serving import ModelRegistry
+    >>> registry = ModelRegistry(
+        {
+            'churn': {'saved_model': 'churn_model', 'model_type': 'sklearn'},
+            'sentiment': {
+                'saved_model': 'sentiment_model',
+                'model_type': 'keras',
+                'additional_functions_file': 'sentiment_functions.py'
+            }
+        },
+        max_loaded=1
+    )
+    >>> registry.get('churn').predict_function(X)
+    >>> registry.loaded
+    ['churn']
+    """
+
+    def __init__(
+            self,
+            models: dict,
+            max_loaded: int = 8,
+            loader=None
+    ):
+        """
+        Parameters
+        ----------
+        models : dict
+            The settings of each model, keyed by name. The settings of a model are a
+            dictionary with the `saved_model` and `model_type` of the model and, optionally,
+            its `custom_objects` and `additional_functions_file`, as accepted by
+            `deploy_model`
+        max_loaded : int (default 8)
+            The maximum number of models kept in memory at once
+        loader : callable or None (default None)
+            Function taking `saved_model`, `model_type`, and `custom_objects` and returning the
+            loaded model. If None, `load_model` is used
+        """
+        if not isinstance(models, dict) or not models:
+            raise TypeError('models must be a non-empty dictionary')
+        for name, settings in models.items():
+            if not isinstance(name, str) or not name or '/' in name:
+                raise ValueError(
+                    f'Model names must be non-empty strings without slashes, got {name}')
+            if not isinstance(settings, dict):
+                raise TypeError(f'The settings of model {name} must be a dictionary')
+            unknown = [key for key in settings if key not in MODEL_SETTINGS]
+            if unknown:
+                raise ValueError(
+                    f'Unknown settings {unknown} for model {name}, expected {MODEL_SETTINGS}')
+            if 'saved_model' not in settings:
+                raise ValueError(f'saved_model must be given for model {name}')
+            if settings.get('model_type') not in _ALLOWED_TYPES:
+                raise ValueError(
+                    f'model_type of model {name} must be one of {_ALLOWED_TYPES}')
+        if not isinstance(max_loaded, int) or max_loaded < 1:
+            raise ValueError('max_loaded must be a positive integer')
+
+        self.models = models
+        self.max_loaded = max_loaded
+        self.loader = load_model if loader is None else loader
+        self._loaded = collections.OrderedDict()
+        self._lock = threading.Lock()
+        # Each model is loaded under its own lock, so that other models keep being served
+        # while it loads, and concurrent first requests only load it once
+        self._loading = {name: threading.Lock() for name in models}
+
+    @property
+    def names(self) -> list:
+        """
+        The names of all registered models
+        """
+        return list(self.models.keys())
+
+    @property
+    def loaded(self) -> list:
+        """
+        The names of the models in memory, least recently used first
+        """
+        with self._lock:
+            return list(self._loaded.keys())
+
+    def _lookup(self, name: str):
+        with self._lock:
+            served = self._loaded.get(name)
+            if served is not None:
+                self._loaded.move_to_end(name)
+            return served
+
+    def get(self, name: str) -> ServedModel:
+        """
+        Get a model, loading it if it is not in memory and evicting the least recently used
+        model if more than `max_loaded` models would be in memory
+
+        Parameters
+        ----------
+        name : str
+            The name of the model
+
+        Returns
+        -------
+        served : ServedModel
+            Named tuple of the `model_type`, `predict_function`, `preprocess`, and
+            `postprocess` of the model
+
+        Raises
+        ------
+        KeyError
+            If no model is registered under `name`
+        """
+        if name not in self.models:
+            raise KeyError(name)
+        served = self._lookup(name)
+        if served is not None:
+            return served
+
+        with self._loading[name]:
+            served = self._lookup(name)
+            if served is not None:
+                return served
+            settings = self.models[name]
+            model_type = settings['model_type']
+            model = self.loader(
+                settings['saved_model'], model_type, settings.get('custom_objects'))
+            preprocess, postprocess = load_additional_functions(
+                settings.get('additional_functions_file'))
+            served = ServedModel(
+                model_type, get_predict_function(model, model_type), preprocess, postprocess)
+            with self._lock:
+                self._loaded[name] = served
+                while len(self._loaded) > self.max_loaded:
+                    self._loaded.popitem(last=False)
+        return served
+
+    def unload(self, name: str) -> None:
+        """
+        Remove a model from memory, if it is loaded
+        """
+        with self._lock:
+            self._loaded.pop(name, None)
+
+
+def create_router_app(registry: ModelRegistry):
+    """
+    Create the Flask app serving each model of a registry at `/models/<name>/predict`, with the
+    same request and response format as `/predict` of the app created by `create_app`. The
+    names of the registered and loaded models are served at `/models`
+
+    Parameters
+    ----------
+    registry : ModelRegistry
+        The models to serve
+    """
+    app = Flask(__name__)
+
+    @app.route('/models/<name>/predict', methods=['POST'])
+    def predict(name):
+        try:
+            served = registry.get(name)
+        except KeyError:
+            return Response(f'No model named {name}', 404)
+        except Exception:
+            return Response('Error in loading model', 500)
+        return respond(*served)
+
+    @app.route('/models', methods=['GET'])
+    def models():
+        return Response(
+            json.dumps({'models': registry.names, 'loaded': registry.loaded}),
+            content_type='application/json'
+        )
+
+    return app
+
+
+def deploy_models(
+        models: dict,
+        host: str = '127.0.0.1',
+        port: int = 2244,
+        max_loaded: int = 8,
+        max_concurrency: int = 4
+):
+    """
+    Deploy many models to a single Flask server on the specified host, each at
+    `/models/<name>/predict`
+
+    Parameters
+    ----------
+    models : dict
+        The settings of each model, keyed by name, as accepted by `ModelRegistry`
+    host : str (default '127.0.0.1')
+        The host to deploy to
+    port : int (default 2244)
+        The port to deploy to
+    max_loaded : int (default 8)
+        The maximum number of models kept in memory at once. Models are loaded on their first
+        request, and the least recently used model is evicted when the limit is exceeded
+    max_concurrency : int (default 4)
+        The number of server threads
+    """
+    app = create_router_app(ModelRegistry(models, max_loaded))
+
+    # run the app
+    print('App created successfully. Serving and awaiting requests.')
+    waitress.serve(
+        app,
+        host=host,
+        port=port,
+        threads=max_concurrency
+    )
@@ -0,0 +1,82 @@
+"""
+Binary wire format for sending arrays to and from served models.
+
+Arrays are sent in the NPY format, a short header giving the dtype and shape of the array
+followed by its raw little- or big-endian data, which avoids converting every value to and from
+text as JSON does. Arrays are read directly from the request or response body without being
+copied. JSON remains the default, and the binary format is used only when a request is sent
+with the `NPY_CONTENT_TYPE` content type, or when the client accepts it in its `Accept`
+header.
+"""
+
+import numpy as np
+import io
+
+JSON_CONTENT_TYPE = 'application/json'
+NPY_CONTENT_TYPE = 'application/x-npy'
+
+
+def to_npy(array) -> bytes:
+    """
+    Serialize an array in the NPY format
+
+    Parameters
+    ----------
+    array : array-like
+        The array to serialize. Arrays of Python objects are not supported
+    """
+    array = np.asarray(array)
+    if array.dtype.hasobject:
+        raise ValueError('Arrays of objects cannot be sent in the NPY format')
+    buffer = io.BytesIO()
+    np.lib.format.write_array(buffer, array, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def from_npy(data) -> np.ndarray:
+    """
+    Read an array in the NPY format without copying its data
+
+    Parameters
+    ----------
+    data : bytes-like
+        The serialized array. The returned array shares its memory, and is read-only if
+        `data` is
+
+    Raises
+    ------
+    ValueError
+        If `data` is not a valid NPY array, or holds Python objects
+    """
+    data = memoryview(data).cast('B')
+    header = io.BytesIO(data[:min(len(data), 65536)])
+    try:
+        version = np.lib.format.read_magic(header)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(header)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(header)
+    except Exception as e:
+        raise ValueError(f'Not a valid NPY array: {e}')
+    if dtype.hasobject:
+        raise ValueError('Arrays of objects cannot be read from the NPY format')
+
+    count = int(np.prod(shape))
+    if header.tell() + count * dtype.itemsize > len(data):
+        raise ValueError('Not a valid NPY array: data is truncated')
+    array = np.frombuffer(data, dtype=dtype, count=count, offset=header.tell())
+    return array.reshape(shape, order='F' if fortran_order else 'C')
+
+
+def accepts_npy(accept: str) -> bool:
+    """
+    Get whether an `Accept` header allows responses in the NPY format
+    """
+    return accept is not None and NPY_CONTENT_TYPE in accept
+
+
+def is_npy(content_type: str) -> bool:
+    """
+    Get whether a `Content-Type` header is that of the NPY format
+    """
+    return content_type is not None and content_type.split(';')[0].strip() == NPY_CONTENT_TYPE
@@ -0,0 +1,273 @@
+"""
+Multi-process serving of models, with worker processes accepting connections from a single
+listening socket.
+
+Worker processes are spawned rather than forked, since TensorFlow is not fork-safe, so model
+weights cannot be shared by copy-on-write. Instead, scikit-learn and PyTorch models are loaded
+once and exported to a file which every worker memory-maps, so that the pages holding their
+weights are shared by all workers through the page cache. Other models are loaded by each
+worker.
+"""
+
+try:
+    import waitress
+except ImportError:
+    pass
+
+try:
+    import joblib
+except ImportError:
+    joblib = None
+
+try:
+    import torch
+except ImportError:
+    pass
+
+from .deploy_model import load_model, load_additional_functions, create_app
+import multiprocessing
+import tempfile
+import shutil
+import socket
+import os
+
+# Model types whose weights are memory-mapped by every worker
+SHARED_MODEL_TYPES = ('sklearn', 'pytorch')
+
+
+def export_shared_model(model, model_type: str, directory: str) -> str:
+    """
+    Save a model to a file which can be memory-mapped by `load_shared_model`
+
+    Parameters
+    ----------
+    model : model object
+        The loaded model
+    model_type : str
+        The type of model. Must be one of `SHARED_MODEL_TYPES`
+    directory : path-like
+        The directory to save the model to
+
+    Returns
+    -------
+    path : str
+        The file the model was saved to
+    """
+    if model_type == 'sklearn':
+        if joblib is None:
+            raise ImportError('joblib must be installed to share sklearn models')
+        path = os.path.join(directory, 'model.joblib')
+        # Arrays are only memory-mapped when stored uncompressed
+        joblib.dump(model, path, compress=0)
+        return path
+    if model_type == 'pytorch':
+        path = os.path.join(directory, 'model.pt')
+        torch.save(model, path)
+        return path
+    raise ValueError(f'model_type must be one of {SHARED_MODEL_TYPES}')
+
+
+def load_shared_model(path: str, model_type: str):
+    """
+    Load a model saved with `export_shared_model`, with its weights memory-mapped read-only
+
+    Parameters
+    ----------
+    path : path-like
+        The file the model was saved to
+    model_type : str
+        The type of model. Must be one of `SHARED_MODEL_TYPES`
+    """
+    if model_type == 'sklearn':
+        return joblib.load(path, mmap_mode='r')
+    if model_type == 'pytorch':
+        return torch.load(path, mmap=True, weights_only=False)
+    raise ValueError(f'model_type must be one of {SHARED_MODEL_TYPES}')
+
+
+def get_listening_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    """
+    Create a socket listening on a host and port, to be shared by worker processes
+    """
+    sock = socket.socket(
+        socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(
+        sock: socket.socket,
+        saved_model: str,
+        model_type: str,
+        custom_objects: dict,
+        additional_functions_file: str,
+        shared_path: str,
+        engine: str,
+        options: dict
+) -> None:
+    """
+    Load a model and serve it on a listening socket. Run in each worker process
+    """
+    if shared_path is not None:
+        model = load_shared_model(shared_path, model_type)
+    else:
+        model = load_model(saved_model, model_type, custom_objects)
+    preprocess, postprocess = load_additional_functions(
+        additional_functions_file)
+
+    if engine == 'asgi':
+        from .asgi import create_asgi_app
+        import uvicorn
+        app = create_asgi_app(
+            model, model_type, preprocess, postprocess, **options)
+        uvicorn.Server(uvicorn.Config(app, log_level='warning')).run(sockets=[sock])
+        return
+
+    max_batch_size = options['max_batch_size']
+    app = create_app(model, model_type, preprocess, postprocess,
+                     max_batch_size, options['max_wait_ms'])
+    threads = options['max_concurrency']
+    waitress.serve(
+        app,
+        sockets=[sock],
+        threads=threads if max_batch_size is None else max(
+            threads, max_batch_size)
+    )
+
+
+class WorkerPool:
+    """
+    Worker processes serving a model on the same host and port
+
+    All workers accept connections from one listening socket, so a new connection is taken by
+    whichever worker is first ready to accept it, which keeps busy workers from being handed
+    more connections than idle ones. Requests sent over a kept-alive connection are all
+    handled by the worker which accepted it.
+
+    Example usage:
+
+    >>> from aisquared.serving import WorkerPool
+    >>> with WorkerPool('my_model', 'sklearn', workers=8, port=2244) as pool:
+    ...     pool.join()
+    """
+
+    def __init__(
+            self,
+            saved_model: str,
+            model_type: str,
+            workers: int,
+            host: str = '127.0.0.1',
+            port: int = 2244,
+            custom_objects: dict = None,
+            additional_functions_file: str = None,
+            engine: str = 'waitress',
+            share_weights: bool = True,
+            max_batch_size: int = None,
+            max_wait_ms: float = 5.0,
+            max_concurrency: int = 4,
+            max_pending: int = 64,
+            timeout: float = 30
+    ):
+        """
+        Parameters
+        ----------
+        saved_model : Path-like
+            The path to the saved model directory or model file
+        model_type : str
+            The type of model
+        workers : int
+            The number of worker processes
+        host : str (default '127.0.0.1')
+            The host to serve on
+        port : int (default 2244)
+            The port to serve on. If 0, a free port is chosen
+        custom_objects : dict or None (default None)
+            Any custom objects to load when using a BeyondML model. Must be picklable
+        additional_functions_file : file-like or None (default None)
+            File name containing `preprocess` and `postprocess` functions
+        engine : str (default 'waitress')
+            The engine each worker serves with, either 'waitress' or 'asgi'
+        share_weights : bool (default True)
+            Whether to load scikit-learn and PyTorch models once and memory-map their weights
+            in every worker. Other models are always loaded by each worker
+        max_batch_size, max_wait_ms, max_concurrency, max_pending, timeout
+            Settings of each worker, as accepted by `deploy_model`
+        """
+        if not isinstance(workers, int) or workers < 1:
+            raise ValueError('workers must be a positive integer')
+
+        self._directory = None
+        self.socket = None
+        self.processes = []
+        options = {
+            'max_batch_size': max_batch_size,
+            'max_wait_ms': max_wait_ms,
+            'max_concurrency': max_concurrency,
+            'max_pending': max_pending,
+            'timeout': timeout
+        }
+        # Anything already started, including the shared model file, is cleaned up if the
+        # model cannot be loaded or exported, or the workers cannot be started
+        try:
+            shared_path = None
+            if share_weights and model_type in SHARED_MODEL_TYPES:
+                self._directory = tempfile.mkdtemp(prefix='aisquared-serving-')
+                shared_path = export_shared_model(
+                    load_model(saved_model, model_type, custom_objects), model_type, self._directory)
+
+            self.socket = get_listening_socket(host, port)
+            context = multiprocessing.get_context('spawn')
+            for _ in range(workers):
+                process = context.Process(
+                    target=run_worker,
+                    args=(self.socket, saved_model, model_type, custom_objects,
+                          additional_functions_file, shared_path, engine, options),
+                    daemon=True
+                )
+                process.start()
+                self.processes.append(process)
+        except BaseException:
+            self.close()
+            raise
+
+    @property
+    def port(self) -> int:
+        """
+        The port the workers serve on
+        """
+        return self.socket.getsockname()[1]
+
+    def join(self) -> None:
+        """
+        Wait for every worker to exit
+        """
+        for process in self.processes:
+            process.join()
+
+    def stop(self) -> None:
+        """
+        Stop the workers, close their socket, and delete any shared model file
+        """
+        for process in self.processes:
+            process.terminate()
+        self.join()
+        if self.socket is not None:
+            self.socket.close()
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+
+    def close(self) -> None:
+        """
+        Stop the workers and release everything the pool holds. Equivalent to `stop`
+        """
+        self.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,65 @@
+"""
+Benchmark of the JSON backends used to serialize configurations.
+
+Builds a `ModelConfiguration` containing a 500,000 token `ConvertToVocabulary` step and reports
+the time taken by `to_json` and the size of its output for every installed backend, in both
+the default and compact output modes.
+
+Usage:
+
+    python benchmarks/json_serialization.py [--tokens 500000] [--repeat 5]
+"""
+
+import argparse
+import timeit
+import aisquared
+from aisquared.base import get_available_json_backends, get_json_backend, set_json_backend
+
+
+def build_config(num_tokens: int) -> aisquared.config.ModelConfiguration:
+    vocabulary = {f'token{i}': i + 3 for i in range(num_tokens)}
+    preprocesser = aisquared.config.preprocessing.text.TextPreprocesser(
+        [
+            aisquared.config.preprocessing.text.Tokenize(),
+            aisquared.config.preprocessing.text.ConvertToVocabulary(
+                vocabulary),
+            aisquared.config.preprocessing.text.PadSequences()
+        ]
+    )
+    return aisquared.config.ModelConfiguration(
+        'JSONBenchmark',
+        aisquared.config.harvesting.TextHarvester(),
+        preprocesser,
+        aisquared.config.analytic.LocalModel('model.keras', 'text'),
+        aisquared.config.postprocessing.Regression(),
+        aisquared.config.rendering.DocumentRendering()
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tokens', type=int, default=500000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    config = build_config(args.tokens)
+    default_backend = get_json_backend()
+
+    print(f'{"backend":<10}{"compact":<10}{"size (MB)":>12}{"encode (ms)":>14}')
+    for backend in get_available_json_backends():
+        set_json_backend(backend)
+        for compact in [False, True]:
+            if not compact and backend != 'json':
+                # Default output always uses the standard library
+                continue
+            size = len(config.to_json(compact).encode('utf-8'))
+            seconds = min(timeit.repeat(
+                lambda: config.to_json(compact), number=1, repeat=args.repeat))
+            print(
+                f'{backend:<10}{str(compact):<10}{size / 1e6:>12.2f}{seconds * 1e3:>14.1f}')
+    set_json_backend(None)
+    print(f'\nDefault compact backend: {default_backend}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark of micro-batching for served models.
+
+Builds a small dense Keras model and predicts on single-row requests sent by concurrent
+callers, first one request at a time and then through a `MicroBatcher` for each
+`max_batch_size`. Reports the throughput and latency percentiles of each setting, which trace
+the latency/throughput curve used to tune `max_batch_size` and `max_wait_ms` for
+`deploy_model`.
+
+Usage:
+
+    python benchmarks/micro_batching.py [--clients 64] [--requests 4000] [--max-wait-ms 2]
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import tensorflow as tf
+import numpy as np
+import argparse
+import time
+from aisquared.serving import MicroBatcher, get_predict_function
+
+
+def build_model() -> tf.keras.Model:
+    model = tf.keras.Sequential([
+        tf.keras.layers.Input((64,)),
+        tf.keras.layers.Dense(512, activation='relu'),
+        tf.keras.layers.Dense(512, activation='relu'),
+        tf.keras.layers.Dense(10, activation='softmax')
+    ])
+    model.predict(np.zeros((1, 64)), verbose=0)
+    return model
+
+
+def run(predict, clients: int, num_requests: int) -> tuple:
+    row = np.random.rand(1, 64).astype(np.float32)
+    latencies = []
+
+    def call(_):
+        start = time.perf_counter()
+        predict(row)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as executor:
+        list(executor.map(call, range(num_requests)))
+    elapsed = time.perf_counter() - start
+    p50, p99 = np.percentile(np.array(latencies) * 1000, [50, 99])
+    return num_requests / elapsed, p50, p99
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--requests', type=int, default=4000)
+    parser.add_argument('--max-wait-ms', type=float, default=2)
+    args = parser.parse_args()
+
+    model = build_model()
+    predict = get_predict_function(model, 'keras')
+    batched_predict = get_predict_function(model, 'keras', batched=True)
+
+    print(f'{"max_batch_size":<16}{"requests/s":>12}{"p50 (ms)":>10}{"p99 (ms)":>10}')
+    throughput, p50, p99 = run(predict, args.clients, args.requests)
+    print(f'{"none":<16}{throughput:>12.0f}{p50:>10.2f}{p99:>10.2f}')
+    for max_batch_size in [4, 16, 64, 256]:
+        batcher = MicroBatcher(batched_predict, max_batch_size, args.max_wait_ms)
+        throughput, p50, p99 = run(batcher.predict, args.clients, args.requests)
+        batcher.close()
+        print(f'{max_batch_size:<16}{throughput:>12.0f}{p50:>10.2f}{p99:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark of the engines used to serve models with `deploy_model`.
+
+Serves a small dense Keras model in a separate process with each engine, then sends
+single-row requests from 1, 16, and 256 concurrent clients, each with its own keep-alive
+connection, and reports the throughput, latency percentiles, and number of failed requests.
+Both engines predict on at most `--max-concurrency` requests at once. The clients run in
+threads of a single process, so results at high concurrency are bounded by the client as well
+as by the server.
+
+Usage:
+
+    python benchmarks/serving_engines.py [--requests 2000] [--max-concurrency 4] [--max-batch-size 64]
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import subprocess
+import threading
+import argparse
+import requests
+import socket
+import time
+import sys
+
+CONCURRENCIES = (1, 16, 256)
+
+
+def serve(engine: str, port: int, max_concurrency: int, max_batch_size: int) -> None:
+    import tensorflow as tf
+    import waitress
+    from aisquared.serving import create_app, create_asgi_app, serve_asgi
+
+    model = tf.keras.Sequential([
+        tf.keras.layers.Input((64,)),
+        tf.keras.layers.Dense(512, activation='relu'),
+        tf.keras.layers.Dense(512, activation='relu'),
+        tf.keras.layers.Dense(10, activation='softmax')
+    ])
+    if engine == 'asgi':
+        app = create_asgi_app(model, 'keras', max_batch_size=max_batch_size,
+                              max_concurrency=max_concurrency, max_pending=1024)
+        serve_asgi(app, port=port)
+    else:
+        app = create_app(model, 'keras', max_batch_size=max_batch_size)
+        threads = max_concurrency if max_batch_size is None else max(
+            max_concurrency, max_batch_size)
+        waitress.serve(app, port=port, threads=threads,
+                       connection_limit=1024, _quiet=True)
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_server(url: str) -> None:
+    for _ in range(600):
+        try:
+            requests.post(url, json={'data': [[0.0] * 64]}, timeout=30)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    raise RuntimeError('Server did not start')
+
+
+def run(url: str, clients: int, num_requests: int) -> tuple:
+    body = {'data': np.random.rand(1, 64).tolist()}
+    local = threading.local()
+    latencies, failures = [], []
+
+    def call(_):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        start = time.perf_counter()
+        response = local.session.post(url, json=body, timeout=60)
+        if response.status_code == 200:
+            latencies.append(time.perf_counter() - start)
+        else:
+            failures.append(response.status_code)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as executor:
+        list(executor.map(call, range(num_requests)))
+    elapsed = time.perf_counter() - start
+    p50, p99 = np.percentile(np.array(latencies) * 1000, [50, 99])
+    return len(latencies) / elapsed, p50, p99, len(failures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--max-concurrency', type=int, default=4)
+    parser.add_argument('--max-batch-size', type=int, default=None)
+    parser.add_argument('--serve', choices=['waitress', 'asgi'], help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.max_concurrency, args.max_batch_size)
+        return
+
+    print(f'{"engine":<10}{"clients":>8}{"requests/s":>12}{"p50 (ms)":>10}{"p99 (ms)":>10}{"failed":>8}')
+    for engine in ['waitress', 'asgi']:
+        port = get_free_port()
+        command = [sys.executable, __file__, '--serve', engine, '--port', str(port),
+                   '--max-concurrency', str(args.max_concurrency)]
+        if args.max_batch_size is not None:
+            command += ['--max-batch-size', str(args.max_batch_size)]
+        server = subprocess.Popen(
+            command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            url = f'http://127.0.0.1:{port}/predict'
+            wait_for_server(url)
+            for clients in CONCURRENCIES:
+                throughput, p50, p99, failed = run(url, clients, args.requests)
+                print(
+                    f'{engine:<10}{clients:>8}{throughput:>12.0f}{p50:>10.2f}{p99:>10.2f}{failed:>8}')
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,10 @@
+import io
 import os
+import time
 import json
+import zipfile
 import pytest
+import numpy as np
 import aisquared
 import tensorflow as tf
 
@@ -128,3 +132,324 @@ def test_imageclassification(tmp_path):
         renderer
     )
     config.compile(os.path.join(tmp_path, config.name))
+
+
+def _simple_config(tmp_path, name='CacheTest'):
+    input_layer = tf.keras.layers.Input((4,))
+    x = tf.keras.layers.Dense(1, activation='sigmoid')(input_layer)
+    model = tf.keras.models.Model(input_layer, x)
+    model.save(os.path.join(tmp_path, 'cache_model.keras'))
+
+    analytic = aisquared.config.analytic.LocalModel(
+        os.path.join(tmp_path, 'cache_model.keras'), 'tabular')
+    return aisquared.config.ModelConfiguration(
+        name,
+        aisquared.config.harvesting.InputHarvester('text'),
+        analytic=analytic,
+        postprocessing_steps=aisquared.config.postprocessing.BinaryClassification(
+            ['zero', 'one']),
+        rendering_steps=aisquared.config.rendering.DocumentRendering()
+    )
+
+
+def test_build_cache(tmp_path, monkeypatch):
+    config = _simple_config(tmp_path)
+    cache = aisquared.config.BuildCache(os.path.join(tmp_path, 'cache'))
+    config.compile(os.path.join(tmp_path, 'first.air'), cache_dir=cache)
+    assert len(os.listdir(cache.cache_dir)) == 1
+
+    def fail(*args, **kwargs):
+        raise AssertionError('model should not be reloaded on a cache hit')
+
+    monkeypatch.setattr(tf.keras.models, 'load_model', fail)
+    config.compile(os.path.join(tmp_path, 'second.air'), cache_dir=cache)
+    with zipfile.ZipFile(os.path.join(tmp_path, 'first.air')) as first, zipfile.ZipFile(os.path.join(tmp_path, 'second.air')) as second:
+        assert sorted(first.namelist()) == sorted(second.namelist())
+        for name in first.namelist():
+            assert first.read(name) == second.read(name)
+
+    # A different dtype is a different entry
+    monkeypatch.undo()
+    config.compile(os.path.join(tmp_path, 'third.air'),
+                   dtype='float16', cache_dir=cache)
+    assert len(os.listdir(cache.cache_dir)) == 2
+
+
+def test_build_cache_eviction(tmp_path):
+    config = _simple_config(tmp_path)
+    cache = aisquared.config.BuildCache(
+        os.path.join(tmp_path, 'cache'), max_size=1)
+    config.compile(os.path.join(tmp_path, 'first.air'), cache_dir=cache)
+    first_key = os.listdir(cache.cache_dir)[0]
+    config.compile(os.path.join(tmp_path, 'second.air'),
+                   dtype='float16', cache_dir=cache)
+    assert first_key not in os.listdir(cache.cache_dir)
+    assert len(os.listdir(cache.cache_dir)) == 1
+
+
+def test_parallel_compile(tmp_path):
+    models = []
+    for i in range(2):
+        input_layer = tf.keras.layers.Input((4,))
+        x = tf.keras.layers.Dense(i + 1)(input_layer)
+        model = tf.keras.models.Model(input_layer, x)
+        model.save(os.path.join(tmp_path, f'parallel_{i}.keras'))
+        models.append(aisquared.config.analytic.LocalModel(
+            os.path.join(tmp_path, f'parallel_{i}.keras'), 'tabular'))
+
+    config = aisquared.config.ModelConfiguration(
+        'ParallelTest',
+        aisquared.config.harvesting.InputHarvester('text'),
+        analytic=models,
+        rendering_steps=aisquared.config.rendering.DocumentRendering()
+    )
+    config.compile(os.path.join(tmp_path, 'serial.air'))
+    config.compile(os.path.join(tmp_path, 'parallel.air'), workers=2)
+    with zipfile.ZipFile(os.path.join(tmp_path, 'serial.air')) as serial, zipfile.ZipFile(os.path.join(tmp_path, 'parallel.air')) as parallel:
+        assert sorted(serial.namelist()) == sorted(parallel.namelist())
+        for name in serial.namelist():
+            assert serial.read(name) == parallel.read(name)
+
+
+def test_compile_to_buffer(tmp_path):
+    config = _simple_config(tmp_path)
+    buffer = io.BytesIO()
+    config.compile(buffer, compression_level=0)
+    with zipfile.ZipFile(buffer) as archive:
+        assert json.loads(archive.read('config.json')) == config.to_dict()
+        assert 'cache_model.keras/model.json' in archive.namelist()
+        assert all(
+            info.compress_type == zipfile.ZIP_STORED for info in archive.infolist())
+
+    # Compiling is reproducible
+    config.compile(os.path.join(tmp_path, 'first.air'))
+    config.compile(os.path.join(tmp_path, 'second.air'))
+    with open(os.path.join(tmp_path, 'first.air'), 'rb') as first, open(os.path.join(tmp_path, 'second.air'), 'rb') as second:
+        assert first.read() == second.read()
+    assert not os.path.exists(os.path.join(tmp_path, 'first'))
+
+
+def test_compile_many(tmp_path, monkeypatch):
+    base = _simple_config(tmp_path)
+    configs = []
+    for i in range(3):
+        config = _simple_config(tmp_path, f'Customer{i}')
+        config.url = f'https://customer{i}.example.com/*'
+        configs.append(config)
+
+    loads = []
+    load_model = tf.keras.models.load_model
+
+    def counting_load(*args, **kwargs):
+        loads.append(args)
+        return load_model(*args, **kwargs)
+
+    monkeypatch.setattr(tf.keras.models, 'load_model', counting_load)
+    timings = aisquared.config.compile_many(
+        configs, os.path.join(tmp_path, 'build'), workers=2)
+    assert len(loads) == 1
+    assert sorted(timings) == sorted(
+        os.path.join(tmp_path, 'build', f'Customer{i}.air') for i in range(3))
+
+    base.name = 'Customer0'
+    base.url = 'https://customer0.example.com/*'
+    base.compile(os.path.join(tmp_path, 'single.air'))
+    with open(os.path.join(tmp_path, 'single.air'), 'rb') as single, open(os.path.join(tmp_path, 'build', 'Customer0.air'), 'rb') as batched:
+        assert single.read() == batched.read()
+
+    with pytest.raises(ValueError):
+        aisquared.config.compile_many(
+            [configs[0], configs[0]], os.path.join(tmp_path, 'build'))
+
+
+def test_external_onnx(tmp_path):
+    path = os.path.join(tmp_path, 'model.onnx')
+    with open(path, 'wb') as f:
+        f.write(b'not really an onnx model')
+
+    analytic = aisquared.config.analytic.OnnxModel(
+        path, [1, 4], 'output', inline=False)
+    config = aisquared.config.ModelConfiguration(
+        'OnnxTest',
+        aisquared.config.harvesting.InputHarvester('text'),
+        analytic=[analytic, analytic],
+        rendering_steps=aisquared.config.rendering.DocumentRendering()
+    )
+    buffer = io.BytesIO()
+    config.compile(buffer)
+    with zipfile.ZipFile(buffer) as archive:
+        assert sorted(archive.namelist()) == sorted(
+            ['config.json', analytic.archive_name])
+        assert archive.read(
+            analytic.archive_name) == b'not really an onnx model'
+        params = json.loads(archive.read('config.json'))[
+            'params']['analytics'][0]['params']
+        assert params['onnxFile'] == analytic.archive_name
+
+
+def test_binary_vocabulary_member(tmp_path):
+    vocabulary = {f'token{i}': i + 3 for i in range(1000)}
+    config = aisquared.config.ModelConfiguration(
+        'BinaryVocabulary',
+        aisquared.config.harvesting.InputHarvester('text'),
+        aisquared.config.preprocessing.text.TextPreprocesser([
+            aisquared.config.preprocessing.text.Tokenize(),
+            aisquared.config.preprocessing.text.ConvertToVocabulary(
+                vocabulary, binary=True)
+        ]),
+        aisquared.config.analytic.DeployedAnalytic(
+            'https://example.com', 'POST', 'text', body={}),
+        None,
+        aisquared.config.rendering.DocumentRendering()
+    )
+    filename = str(tmp_path / 'vocab.air')
+    config.compile(filename)
+
+    with zipfile.ZipFile(filename) as archive:
+        params = json.loads(archive.read('config.json'))[
+            'params']['preprocessingSteps'][0]['steps'][1]['params']
+        assert params['vocabulary'] is None
+        assert archive.getinfo(
+            params['vocabularyFile']).compress_type == zipfile.ZIP_STORED
+
+    loaded = aisquared.config.preprocessing.text.Vocabulary.from_archive(
+        filename, params['vocabularyFile'])
+    base = loaded.tokens
+    while not isinstance(base, np.memmap):
+        base = base.base
+    assert loaded.to_dict() == vocabulary
+
+
+def test_binary_lookup_member(tmp_path):
+    table = {str(i).zfill(5): {'nbo': i} for i in range(1000)}
+    with open(os.path.join(tmp_path, 'analytic.json'), 'w') as f:
+        json.dump(table, f)
+    config = aisquared.config.GraphConfiguration('BinaryLookup')
+    harvester_id = config.add_node(
+        aisquared.config.harvesting.TextHarvester('regex', r'\D(\d{5})\D'))
+    config.add_node(aisquared.config.analytic.LocalAnalytic(
+        os.path.join(tmp_path, 'analytic.json'), 'text', binary=True), harvester_id)
+    filename = str(tmp_path / 'lookup.air')
+    config.compile(filename)
+
+    with zipfile.ZipFile(filename) as archive:
+        params = json.loads(archive.read('config.json'))['nodes'][1]['step']['params']
+        assert archive.getinfo(
+            params['lookupFile']).compress_type == zipfile.ZIP_STORED
+        assert not any([name.endswith('analytic.json') for name in archive.namelist()])
+        loaded = aisquared.config.analytic.LookupTable._from_buffer(
+            archive.read(params['lookupFile']))
+    assert loaded.lookup(['00042']) == [{'nbo': 42}]
+
+
+def test_run(tmp_path):
+    config = _simple_config(tmp_path, 'RunTest')
+    config.preprocessing_steps = aisquared.config.preprocessing.tabular.TabularPreprocesser(
+        [aisquared.config.preprocessing.tabular.ZScore([1, 1, 1, 1], [2, 2, 2, 2])])
+    X = np.random.rand(64, 4).astype(np.float32)
+    outputs, timings = config.run(X)
+    model = config.analytic[0].model
+    probabilities = model.predict_on_batch((X - 1) / 2)[:, 0]
+    assert outputs.tolist() == np.where(probabilities >= 0.5, 'one', 'zero').tolist()
+    assert set(timings) == {'preprocessing', 'analytic', 'postprocessing'}
+
+    results = list(config.run_batches(np.array_split(X, 4)))
+    assert len(results) == 4
+    assert np.concatenate([batch for batch, _ in results]).tolist() == outputs.tolist()
+    assert config.analytic[0].model is model
+
+    # Sparse batches are passed to the model without being densified
+    pipeline = config.get_pipeline(sparse=True)
+    assert pipeline._preprocess(X).format == 'csr'
+    assert pipeline.run(X)[0].tolist() == outputs.tolist()
+
+    with open(os.path.join(tmp_path, 'analytic.json'), 'w') as f:
+        json.dump({'a': 1, 'b': 2}, f)
+    config = aisquared.config.ModelConfiguration(
+        'LookupTest',
+        analytic=aisquared.config.analytic.LocalAnalytic(
+            os.path.join(tmp_path, 'analytic.json'), 'text')
+    )
+    assert config.run(['a', 'c'])[0] == [1, None]
+
+    config.analytic = [config.analytic[0], config.analytic[0]]
+    with pytest.raises(ValueError):
+        config.run(['a'])
+
+
+def _sleep(seconds):
+    def function(inputs):
+        time.sleep(seconds)
+        return inputs
+    return function
+
+
+def test_graph_run(tmp_path):
+    config = aisquared.config.GraphConfiguration('GraphRunTest')
+    harvester_id = config.add_node(
+        aisquared.config.harvesting.InputHarvester('text'))
+    first = aisquared.config.postprocessing.Regression(10, 20)
+    first_id = config.add_node(first, harvester_id)
+    second_id = config.add_node(
+        aisquared.config.postprocessing.Regression(0, 2), harvester_id)
+    joined_id = config.add_node(
+        aisquared.config.rendering.DocumentRendering(), [first_id, second_id])
+    with pytest.raises(ValueError):
+        config.add_node(aisquared.config.rendering.DocumentRendering(), 10)
+
+    results, timings = config.run(np.array([0.0, 0.5]))
+    assert results[joined_id][0].tolist() == [10, 15]
+    assert results[joined_id][1].tolist() == [0, 1]
+    assert results[joined_id][0] is results[first_id]
+    assert set(timings) == {harvester_id, first_id, second_id, joined_id}
+    assert config.get_critical_path() == ([harvester_id, first_id, joined_id], 3)
+
+    start = time.perf_counter()
+    results, timings = config.run(
+        np.array([0.0]),
+        functions={first_id: _sleep(0.5), second_id: _sleep(0.5)}
+    )
+    assert time.perf_counter() - start < 0.9
+    assert config.get_critical_path({second_id: 2})[0] == [
+        harvester_id, second_id, joined_id]
+
+    results, _ = config.run(np.array([1.0]), workers=2, executor='process')
+    assert results[joined_id][0].tolist() == [20]
+
+    # Steps changed after being added would run differently from how they compile
+    first.max = 30
+    with pytest.raises(ValueError):
+        config.run(np.array([1.0]))
+    first.max = 20
+    nodes = config.nodes
+    config.nodes = nodes[:-1]
+    with pytest.raises(ValueError):
+        config.run(np.array([1.0]))
+    config.nodes = nodes
+
+    config.nodes[harvester_id]['dependencies'] = joined_id
+    with pytest.raises(ValueError):
+        config.validate()
+    with pytest.raises(ValueError):
+        config.compile(os.path.join(tmp_path, 'cycle.air'))
+
+
+def test_air_writer_collisions(tmp_path):
+    os.makedirs(tmp_path / 'a')
+    os.makedirs(tmp_path / 'b')
+    for directory, contents in [('a', b'first'), ('b', b'second')]:
+        with open(tmp_path / directory / 'model.onnx', 'wb') as f:
+            f.write(contents)
+    filename = str(tmp_path / 'collisions.air')
+    with aisquared.config.AirWriter(filename) as writer:
+        writer.write_file(str(tmp_path / 'a' / 'model.onnx'))
+        # Repeating a member with the same file or contents is skipped
+        writer.write_file(str(tmp_path / 'a' / 'model.onnx'))
+        writer.write_members([('model.onnx', b'first'), ('data.bin', b'data'), ('data.bin', b'data')])
+        with pytest.raises(ValueError):
+            writer.write_file(str(tmp_path / 'b' / 'model.onnx'))
+        with pytest.raises(ValueError):
+            writer.write_members([('data.bin', b'other')])
+    with zipfile.ZipFile(filename) as archive:
+        assert sorted(archive.namelist()) == ['data.bin', 'model.onnx']
+        assert archive.read('model.onnx') == b'first'
@@ -1,5 +1,13 @@
+import os
+import sys
+import json
+import base64
+import hashlib
 import pytest
 import aisquared
+import requests
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 
 def test_analytic_init():
@@ -43,3 +51,237 @@ def test_analytic_init():
         }],
         period=1
     )
+
+
+def test_onnx_model(tmp_path):
+    path = os.path.join(tmp_path, 'model.onnx')
+    with open(path, 'wb') as f:
+        f.write(b'not really an onnx model')
+
+    inline = aisquared.config.analytic.OnnxModel(path, [1, 4], 'output')
+    assert base64.b64decode(inline.to_dict()['params']['onnxData']) == b'not really an onnx model'
+    assert inline.get_archive_members() == []
+    assert not inline.has_archive_members()
+
+    external = aisquared.config.analytic.OnnxModel(
+        path, [1, 4], 'output', inline=False)
+    params = external.to_dict()['params']
+    assert params['onnxData'] is None
+    assert params['onnxDigest'] == hashlib.sha256(
+        b'not really an onnx model').hexdigest()
+    assert params['onnxFile'] == params['onnxDigest'] + '.onnx'
+    assert external.get_archive_members() == [(params['onnxFile'], path)]
+
+    # The file is not read until it is needed, even to tell whether it is an archive member
+    missing = aisquared.config.analytic.OnnxModel(
+        os.path.join(tmp_path, 'missing.onnx'), [1, 4], 'output', inline=False)
+    assert missing.has_archive_members()
+    config = aisquared.config.ModelConfiguration(
+        'test', aisquared.config.harvesting.TextHarvester(), None, [inline, missing], None, None)
+    assert config.get_model_filenames() == [path]
+    assert config.has_archive_members()
+
+    # File digests are bounded, replaced when the file is rewritten, and released with sessions
+    module = sys.modules['aisquared.config.analytic.OnnxModel']
+    digests = module._DIGESTS
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    external.to_dict()
+    assert len([k for k in digests if k[0] == os.path.realpath(path)]) == 1
+    external.close()
+    assert not [k for k in digests if k[0] == os.path.realpath(path)]
+    for i in range(module.MAX_DIGESTS + 2):
+        other = os.path.join(tmp_path, f'model_{i}.onnx')
+        with open(other, 'wb') as f:
+            f.write(b'model %d' % i)
+        aisquared.config.analytic.OnnxModel(
+            other, [1, 4], 'output', inline=False).to_dict()
+    assert len(digests) == module.MAX_DIGESTS
+    module.clear_sessions()
+    assert not digests
+
+
+def test_lookup_table(tmp_path):
+    table = {
+        '11111': {'name': 'John Doe', 'nbo': 1},
+        '22222': [1, 2.5, None],
+        'ünïcode': 'value',
+        'long key': 4
+    }
+    lookup = aisquared.config.analytic.LookupTable.from_dict(table)
+    assert lookup.lookup(['22222', 'missing', '11111', 'ünïcode', 'long', 'long key']) == [
+        [1, 2.5, None], None, {'name': 'John Doe', 'nbo': 1}, 'value', None, 4]
+    assert lookup.find([['11111', 'x']]).shape == (1, 2)
+    assert lookup.to_dict() == table
+
+    path = os.path.join(tmp_path, 'table.lookup')
+    lookup.save(path)
+    loaded = aisquared.config.analytic.LookupTable.from_file(path)
+    assert loaded.path == path
+    # Memory-mapped tables are hashed from their file without being copied into memory
+    loaded.to_bytes = None
+    assert loaded.digest == lookup.digest
+    del loaded.to_bytes
+    assert loaded.to_dict() == table
+    assert loaded.lookup([11111, 3], default=0) == [table['11111'], 0]
+    assert aisquared.config.analytic.LookupTable.from_dict({}).lookup(['a']) == [None]
+
+    json_path = os.path.join(tmp_path, 'table.json')
+    with open(json_path, 'w') as f:
+        json.dump(table, f)
+    analytic = aisquared.config.analytic.LocalAnalytic(
+        json_path, 'text', binary=True)
+    params = analytic.to_dict()['params']
+    assert params['lookupFile'] == lookup.digest + '.lookup'
+    assert params['lookupSize'] == 4
+    assert analytic.get_archive_members()[0][1] == lookup.to_bytes()
+    assert analytic.predict(['11111', '33333']) == [table['11111'], None]
+    assert aisquared.config.analytic.LocalAnalytic(
+        path, 'text', binary=True).get_archive_members() == [(params['lookupFile'], path, False)]
+
+
+def _save_matmul_model(onnx, path, weights, batch_size):
+    helper = onnx.helper
+    graph = helper.make_graph(
+        [helper.make_node('MatMul', ['input', 'weights'], ['output'])],
+        'matmul',
+        [helper.make_tensor_value_info(
+            'input', onnx.TensorProto.FLOAT, [batch_size, weights.shape[0]])],
+        [helper.make_tensor_value_info(
+            'output', onnx.TensorProto.FLOAT, [batch_size, weights.shape[1]])],
+        [onnx.numpy_helper.from_array(weights, 'weights')]
+    )
+    model = helper.make_model(
+        graph, opset_imports=[helper.make_opsetid('', 13)])
+    model.ir_version = 8
+    onnx.save(model, path)
+
+
+def test_onnx_predict(tmp_path):
+    onnx = pytest.importorskip('onnx')
+    pytest.importorskip('onnxruntime')
+    import numpy as np
+
+    weights = np.random.rand(4, 3).astype(np.float32)
+    X = np.random.rand(10, 4)
+    expected = X.astype(np.float32) @ weights
+    for batch_size in ['batch', 1, 3]:
+        path = os.path.join(tmp_path, f'model_{batch_size}.onnx')
+        _save_matmul_model(onnx, path, weights, batch_size)
+        model = aisquared.config.analytic.OnnxModel(
+            path, [1, 4], 'output', intra_op_threads=1)
+        result = model.predict(X)
+        assert result.dtype == np.float32
+        assert np.allclose(result, expected, atol=1e-6)
+
+        out = np.empty((10, 3), dtype=np.float32)
+        assert model.predict(X, out=out) is out
+        assert np.allclose(out, expected, atol=1e-6)
+
+        # Sessions are shared by models of the same file and thread settings
+        assert model.session is aisquared.config.analytic.OnnxModel(
+            path, [1, 4], 'output', intra_op_threads=1).session
+        assert model.session is not aisquared.config.analytic.OnnxModel(
+            path, [1, 4], 'output', intra_op_threads=2).session
+
+    # Sessions of a rewritten file are released, as are those of a closed model
+    sessions = sys.modules['aisquared.config.analytic.OnnxModel']._SESSIONS
+    session = model.session
+    _save_matmul_model(onnx, path, weights * 2, 3)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert model.session is not session
+    assert np.allclose(model.predict(X), expected * 2, atol=1e-6)
+    assert len([k for k in sessions if k[0] == os.path.realpath(path)]) == 1
+    model.close()
+    assert not [k for k in sessions if k[0] == os.path.realpath(path)]
+
+    with pytest.raises(ValueError):
+        aisquared.config.analytic.OnnxModel(
+            path, [1, 4], 'missing').predict(X)
+    with pytest.raises(ValueError):
+        aisquared.config.analytic.OnnxModel(
+            path, [1, 4], 'output', intra_op_threads=0)
+
+
+class _EchoHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in endpoint returning the length of each input, or an error for the input 'error'
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        inputs = body['request']['inputs']
+        if inputs == 'error' or 'error' in inputs:
+            self.send_response(500)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        outputs = [len(i) for i in inputs] if isinstance(
+            inputs, list) else len(inputs)
+        data = json.dumps({'result': {'outputs': outputs, 'prompt': body['prompt'],
+                                      'token': self.headers['X-Token']}}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_deployed_model_client():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _EchoHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        model = aisquared.config.analytic.DeployedModel(
+            f'http://127.0.0.1:{server.server_port}/predict',
+            'text',
+            headers={'X-Token': 'secret'},
+            body_setup={'request': {'inputs': '{DATAPOINT}'},
+                        'prompt': 'Classify "{DATAPOINT}"'},
+            return_key='result.outputs'
+        )
+        texts = ['a', 'bb', 'c "quoted"', 'dddd', 'ü'] * 5
+        expected = [len(t) for t in texts]
+        assert model.predict(texts) == expected
+
+        client = model.get_client(batch_size=3, concurrency=2)
+        assert json.loads(client.build_body('x "y"')) == {
+            'request': {'inputs': 'x "y"'}, 'prompt': 'Classify "x "y""'}
+        with client:
+            assert client.predict(texts) == expected
+            stats = client.stats()
+            assert stats['requests'] == 9
+            assert stats['datapoints'] == len(texts)
+            assert stats['errors'] == 0
+            assert 0 < stats['p50_ms'] <= stats['p99_ms'] <= stats['max_ms']
+            assert client.predict_one(['a', 'bb']) == [1, 2]
+
+            model.return_key = 'result'
+            assert client.extract({'result': 1, 'other': 2}) == 1
+            assert model.get_client().predict_one('abc')['token'] == 'secret'
+
+            with pytest.raises(requests.HTTPError):
+                client.predict(['a', 'error'])
+            assert client.stats()['errors'] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    with pytest.raises(ValueError):
+        model.get_client(batch_size=0)
+
+    # Only values equal to the replace value are insertion points, whatever the replace value
+    body_setup = {'inputs': None, 'model': 'null-ull', 'prompt': '', 'default': 'ul'}
+    client = aisquared.config.analytic.DeployedModel(
+        'http://localhost', 'text', body_setup=body_setup, body_setup_replace_value=None).get_client()
+    assert json.loads(client.build_body('x')) == {
+        'inputs': 'x', 'model': 'null-ull', 'prompt': '', 'default': 'ul'}
+    client = aisquared.config.analytic.DeployedModel(
+        'http://localhost', 'text', body_setup=body_setup, body_setup_replace_value='').get_client()
+    assert json.loads(client.build_body('x')) == {
+        'inputs': None, 'model': 'null-ull', 'prompt': 'x', 'default': 'ul'}
@@ -1,3 +1,4 @@
+import json
 import pytest
 import aisquared
 
@@ -56,3 +57,92 @@ def test_qualifiers():
         'ne',
         'nin'
     ]
+
+
+def test_serialization_cache():
+    aisquared.base.BaseObject.enable_cache()
+    try:
+        step = aisquared.config.preprocessing.tabular.ZScore([0], [1])
+        preprocesser = aisquared.config.preprocessing.tabular.TabularPreprocesser(
+            [step])
+        config = aisquared.config.ModelConfiguration(
+            'CacheTest',
+            preprocessing_steps=preprocesser,
+            analytic=aisquared.config.analytic.LocalModel('model', 'tabular')
+        )
+        first = config.to_dict()
+        assert config.to_dict() is first
+        assert config.to_json() is config.to_json()
+
+        # Changing a descendant invalidates every ancestor
+        step.means = [5]
+        second = config.to_dict()
+        assert second is not first
+        assert second['params']['preprocessingSteps'][0]['steps'][0]['params']['means'] == [5]
+
+        # Unchanged subtrees are reused
+        config.description = 'changed'
+        assert config.to_dict()['params']['analytics'][0] is second['params']['analytics'][0]
+    finally:
+        aisquared.base.BaseObject.enable_cache(False)
+
+    assert config.to_dict() is not config.to_dict()
+
+    # Changes made while caching is disabled are seen once it is enabled again
+    step.means = [7]
+    aisquared.base.BaseObject.enable_cache()
+    try:
+        assert config.to_dict()['params']['preprocessingSteps'][0]['steps'][0]['params']['means'] == [7]
+    finally:
+        aisquared.base.BaseObject.enable_cache(False)
+
+
+def test_serialization_cache_nested():
+    aisquared.base.BaseObject.enable_cache()
+    try:
+        steps = [aisquared.config.preprocessing.tabular.ZScore([0], [1]) for _ in range(2)]
+        analytics = [aisquared.config.analytic.DeployedModel(f'http://{i}', 'secret') for i in range(2)]
+        config = aisquared.config.ModelConfiguration(
+            'NestedCacheTest',
+            preprocessing_steps=[[aisquared.config.preprocessing.tabular.TabularPreprocesser([s])] for s in steps],
+            analytic=[[a] for a in analytics]
+        )
+        first = config.to_json()
+
+        # Objects inside nested lists invalidate the configuration holding them
+        analytics[1].url = 'http://changed'
+        assert 'http://changed' in config.to_json()
+        steps[1].means = [5]
+        assert config.to_dict()['params']['preprocessingSteps'][1][0]['steps'][0]['params']['means'] == [5]
+        assert config.to_json() != first
+    finally:
+        aisquared.base.BaseObject.enable_cache(False)
+
+
+def test_json_backends():
+    obj = aisquared.config.preprocessing.text.ConvertToVocabulary(
+        {'this': 3, 'is': 4, 'a/test': 5, 'café': 6})
+    assert obj.to_json() == json.dumps(obj.to_dict())
+    for backend in aisquared.base.get_available_json_backends():
+        aisquared.base.set_json_backend(backend)
+        try:
+            compact = obj.to_json(compact=True)
+            assert ' ' not in compact
+            assert json.loads(compact) == obj.to_dict()
+        finally:
+            aisquared.base.set_json_backend(None)
+
+    # Non-finite floats are written the same way by every backend
+    values = {'values': [float('nan'), float('inf'), -float('inf'), None, 1.5]}
+    expected = json.dumps(values, separators=(',', ':'))
+    for backend in aisquared.base.get_available_json_backends():
+        aisquared.base.set_json_backend(backend)
+        try:
+            assert aisquared.base.serialization.dumps(values, compact=True) == expected
+            assert aisquared.base.serialization.dumpb_each([values, None]) == [
+                expected.encode('utf-8'), b'null']
+        finally:
+            aisquared.base.set_json_backend(None)
+
+    with pytest.raises(ValueError):
+        aisquared.base.set_json_backend('pickle')
@@ -1,5 +1,6 @@
 from typing import Type
 import pytest
+import numpy as np
 import aisquared
 
 
@@ -50,3 +51,65 @@ def test_postprocesser_init():
         24,
         round=True
     )
+
+
+def _greedy_nms(boxes, scores, classes, iou_threshold):
+    kept = []
+    for i in np.argsort(-scores, kind='stable'):
+        overlaps = [
+            j for j in kept if classes[j] == classes[i] and aisquared.config.postprocessing.execution.box_iou(
+                boxes[[i, j]][np.newaxis])[0, 0, 1] > iou_threshold
+        ]
+        if not overlaps:
+            kept.append(i)
+    return kept
+
+
+def test_postprocesser_transform():
+    binary = aisquared.config.postprocessing.BinaryClassification(
+        ['no', 'yes'], 0.7)
+    assert binary.transform([0.1, 0.7, 0.9]).tolist() == ['no', 'yes', 'yes']
+    assert binary.transform([[0.9, 0.1], [0.2, 0.8]]).tolist() == ['no', 'yes']
+    with pytest.raises(ValueError):
+        binary.transform(np.zeros((2, 3)))
+
+    multiclass = aisquared.config.postprocessing.MulticlassClassification(
+        ['a', 'b', 1])
+    labels = multiclass.transform([[0.1, 0.7, 0.2], [0.1, 0.2, 0.7]])
+    assert labels.tolist() == ['b', 1]
+    with pytest.raises(ValueError):
+        multiclass.transform(np.zeros((2, 2)))
+
+    regression = aisquared.config.postprocessing.Regression(10, 20, round=True)
+    assert regression.transform([0, 0.25, 0.5, 1]).tolist() == [10, 13, 15, 20]
+    assert aisquared.config.postprocessing.Regression().transform(
+        [0.25]).tolist() == [0.25]
+
+    rng = np.random.default_rng(0)
+    corners = rng.uniform(0, 0.8, (8, 50, 2))
+    boxes = np.concatenate(
+        [corners, corners + rng.uniform(0.05, 0.3, (8, 50, 2))], axis=-1)
+    scores = rng.uniform(size=(8, 50))
+    classes = rng.integers(0, 3, (8, 50))
+    detection = aisquared.config.postprocessing.ObjectDetection(
+        ['a', 'b', 'c'], 0.3)
+    detections = detection.transform(boxes, scores, classes, iou_threshold=0.2)
+    for image in range(8):
+        candidates = np.nonzero(scores[image] >= 0.3)[0]
+        expected = candidates[_greedy_nms(
+            boxes[image, candidates], scores[image, candidates], classes[image, candidates], 0.2)]
+        selected = detections['index'] == image
+        assert np.array_equal(detections['scores'][selected], scores[image, expected])
+        assert np.array_equal(detections['boxes'][selected], boxes[image, expected])
+    assert set(detections['labels'].tolist()) <= {'a', 'b', 'c'}
+
+    class_scores = np.zeros((8, 50, 3))
+    class_scores[np.arange(8)[:, np.newaxis], np.arange(50), classes] = scores
+    assert np.array_equal(
+        detection.transform(boxes, class_scores, iou_threshold=0.2)['classes'],
+        detections['classes']
+    )
+    unsuppressed = detection.transform(boxes, scores, classes, iou_threshold=None)
+    assert len(unsuppressed['index']) == (scores >= 0.3).sum()
+    with pytest.raises(ValueError):
+        detection.transform(boxes, scores)
@@ -1,5 +1,9 @@
+import warnings
 import pytest
+import numpy as np
+import pandas as pd
 import aisquared
+import tensorflow as tf
 
 
 def test_steps_init():
@@ -55,3 +59,343 @@ def test_processers_init():
         text.add_step(
             aisquared.config.preprocessing.image.SubtractValue(10)
         )
+
+
+def test_binary_vocabulary(tmp_path):
+    vocabulary = {'this': 3, 'is': 4, 'a': 5, 'test': 6, 'café': 7}
+    binary = aisquared.config.preprocessing.text.Vocabulary.from_dict(
+        vocabulary)
+    assert len(binary) == 5
+    assert binary.to_dict() == vocabulary
+    assert binary == vocabulary
+    assert binary['café'] == 7 and 'tests' not in binary and binary.get('t') is None
+    assert binary.lookup(['test', 'café', 'tests', 't', 'missing'], 2).tolist() == [
+        6, 7, 2, 2, 2]
+
+    path = str(tmp_path / 'vocab.bin')
+    binary.save(path)
+    loaded = aisquared.config.preprocessing.text.Vocabulary.from_file(path)
+    assert loaded == binary
+    assert loaded.path == path
+    loaded.to_bytes = None
+    assert loaded.digest == binary.digest
+    del loaded.to_bytes
+
+    with open(tmp_path / 'vocab.txt', 'w') as f:
+        f.write('\n'.join(['[PAD]', 'hello', 'world']))
+    lines = aisquared.config.preprocessing.text.Vocabulary.from_file(
+        str(tmp_path / 'vocab.txt'))
+    # Ids start after the padding, start, and out of vocabulary characters
+    assert lines.to_dict() == {'[PAD]': 3, 'hello': 4, 'world': 5}
+    lines = aisquared.config.preprocessing.text.Vocabulary.from_file(
+        str(tmp_path / 'vocab.txt'), first_id=0)
+    assert lines.to_dict() == {'[PAD]': 0, 'hello': 1, 'world': 2}
+    step = aisquared.config.preprocessing.text.ConvertToVocabulary(
+        str(tmp_path / 'vocab.txt'))
+    assert step.vocabulary['[PAD]'] == 3
+
+    class Tokenizer:
+        word_index = vocabulary
+
+    step = aisquared.config.preprocessing.text.ConvertToVocabulary(
+        Tokenizer(), binary=True)
+    assert step.vocabulary == binary
+    assert step.to_dict()['params']['vocabulary'] is None
+    assert step.to_dict()['params']['vocabularyFile'] == binary.digest + '.vocab'
+    step.binary = False
+    assert step.to_dict()['params']['vocabulary'] == vocabulary
+    assert isinstance(step.vocabulary, aisquared.config.preprocessing.text.Vocabulary)
+    assert isinstance(aisquared.config.preprocessing.text.ConvertToVocabulary(
+        vocabulary).vocabulary, aisquared.config.preprocessing.text.Vocabulary)
+
+    with pytest.raises(ValueError):
+        aisquared.config.preprocessing.text.ConvertToVocabulary({'a': 1.5})
+    with pytest.raises(ValueError):
+        aisquared.config.preprocessing.text.ConvertToVocabulary({3: 3})
+    with pytest.raises(TypeError):
+        aisquared.config.preprocessing.text.ConvertToVocabulary(3)
+
+
+def test_tabular_transform():
+    tabular = aisquared.config.preprocessing.tabular
+    preprocesser = tabular.TabularPreprocesser([
+        tabular.MinMax([0, 0, 0], [2, 4, 8], [0, 1, 2]),
+        tabular.OneHot(3, ['cat', 'dog']),
+        tabular.DropColumn(0),
+        tabular.ZScore([1], [2], [3])
+    ])
+    df = pd.DataFrame({
+        'a': [1., 2., 0.],
+        'b': [2., 4., 0.],
+        'c': [4., 8., 2.],
+        'd': ['dog', 'fish', 'cat']
+    })
+    expected = np.array([
+        [0.5, 0.5, 0, 0],
+        [1, 1, 0, -0.5],
+        [0, 0.25, 1, -0.5]
+    ], dtype=np.float32)
+    output = preprocesser.transform(df)
+    assert output.dtype == np.float32
+    np.testing.assert_allclose(output, expected)
+    np.testing.assert_allclose(preprocesser.transform(df, chunk_size=2), expected)
+    np.testing.assert_allclose(
+        np.concatenate(list(preprocesser.transform_chunks([df[:2], df[2:]]))), expected)
+
+    X = np.random.rand(100, 3).astype(np.float32)
+    original = X.copy()
+    zscore = tabular.TabularPreprocesser([tabular.ZScore([1, 2, 3], [2, 4, 8])])
+    output = zscore.transform(X, copy=False, chunk_size=7)
+    assert output is X
+    np.testing.assert_allclose(output, (original - [1, 2, 3]) / [2, 4, 8], rtol=1e-6)
+
+    with pytest.raises(IndexError):
+        preprocesser.transform(np.zeros((2, 3)))
+    with pytest.raises(ValueError):
+        tabular.TabularPreprocesser([
+            tabular.ZScore([1], [2], [0]),
+            tabular.OneHot(0, [1, 2])
+        ]).transform(np.zeros((2, 1)))
+
+
+def test_text_transform():
+    text = aisquared.config.preprocessing.text
+    vocabulary = {'hello': 3, 'world': 4, 'again': 5}
+    for binary in [False, True]:
+        preprocesser = text.TextPreprocesser([
+            text.Trim(),
+            text.ConvertToCase(),
+            text.RemoveCharacters(),
+            text.Tokenize(),
+            text.ConvertToVocabulary(vocabulary, max_vocab=4, binary=binary),
+            text.PadSequences(length=4, pad_location='pre',
+                              truncate_location='pre')
+        ])
+        documents = (doc for doc in [
+            ' Hello, World 42! ',
+            'a',
+            'hello hello again world world'
+        ])
+        batches = list(preprocesser.transform(documents, batch_size=2))
+        assert [batch.shape for batch in batches] == [(2, 4), (1, 4)]
+        assert batches[0].dtype == np.int32
+        np.testing.assert_array_equal(
+            np.concatenate(batches),
+            [[0, 1, 3, 4], [0, 0, 0, 1], [3, 2, 4, 4]]
+        )
+
+    tokens = text.TextPreprocesser([text.Tokenize(), text.ConvertToCase()])
+    assert next(tokens.transform(['Hello World'])) == [['hello', 'world']]
+
+    with pytest.raises(ValueError):
+        text.TextPreprocesser([text.ConvertToVocabulary(vocabulary)]).get_plan()
+
+
+def test_image_transform():
+    image = aisquared.config.preprocessing.image
+    preprocesser = image.ImagePreprocesser([
+        image.SubtractValue(10),
+        image.ConvertToColor('B+W'),
+        image.Resize([16, 16], method='area'),
+        image.DivideValue(2),
+        image.MultiplyValue(3),
+        image.AddValue(1)
+    ])
+    images = np.random.randint(0, 255, (4, 20, 24, 3)).astype(np.uint8)
+    expected = tf.image.resize(
+        tf.image.rgb_to_grayscale(images.astype(np.float32) - 10), [16, 16], method='area'
+    ).numpy() / 2 * 3 + 1
+    output = preprocesser.transform(images)
+    assert output.shape == (4, 16, 16, 1)
+    assert output.dtype == np.float32
+    np.testing.assert_allclose(output, expected, rtol=1e-4, atol=1e-2)
+
+    plan = preprocesser.get_plan()
+    first = plan.transform(images)
+    second = plan.transform(list(images[:2]))
+    assert first.base is second.base
+    np.testing.assert_allclose(second, expected[:2], rtol=1e-4, atol=1e-2)
+
+    # Arithmetic steps are applied at their position, before the color conversion
+    shifted = image.ImagePlan([image.AddValue(100), image.ConvertToColor('B+W')])
+    np.testing.assert_allclose(
+        shifted.transform(np.zeros((1, 2, 2, 3), dtype=np.uint8)),
+        tf.image.rgb_to_grayscale(np.full((1, 2, 2, 3), 100, dtype=np.float32)).numpy(),
+        rtol=1e-6
+    )
+    assert shifted.transform(np.zeros((1, 2, 2, 3), dtype=np.uint8))[0, 0, 0, 0] != 100
+
+    resize = image.ImagePlan([image.Resize([10, 10], 'lanczos3', True)])
+    outputs = resize.transform([images[0], images[1, :10]])
+    assert [output.shape for output in outputs] == [(8, 10, 3), (4, 10, 3)]
+
+
+def test_optimize():
+    tabular = aisquared.config.preprocessing.tabular
+    steps = [
+        tabular.ZScore([1, 2, 3], [2, 2, 2], [0, 1, 2]),
+        tabular.MinMax([0, 0, 0], [2, 4, 1], [0, 1, 2]),
+        tabular.OneHot(3, ['a', 'b']),
+        tabular.ZScore([0, 0], [1, 1], [0, 4]),
+        tabular.DropColumn(2),
+        tabular.DropColumn(4)
+    ]
+    preprocesser = tabular.TabularPreprocesser(steps)
+    X = np.array([
+        [1., 2., 3., 'a', 7],
+        [4., 5., 6., 'b', 8],
+        [0, 1, 2, 'c', 9]
+    ], dtype=object)
+    expected = preprocesser.transform(X)
+    changes = preprocesser.optimize()
+    assert len(changes) == 4
+    assert [type(step) for step in preprocesser.steps] == [
+        tabular.DropColumn, tabular.DropColumn, tabular.ZScore, tabular.OneHot]
+    assert preprocesser.steps[1].column == 3
+    np.testing.assert_allclose(preprocesser.transform(X), expected)
+    assert preprocesser.optimize() == []
+
+    image = aisquared.config.preprocessing.image
+    preprocesser = image.ImagePreprocesser([
+        image.SubtractValue(1),
+        image.AddValue(1),
+        image.Resize([8, 8]),
+        image.Resize([8, 8]),
+        image.SubtractValue(127.5),
+        image.DivideValue(127.5),
+        image.MultiplyValue(2)
+    ])
+    images = np.random.randint(0, 255, (2, 10, 10, 3)).astype(np.uint8)
+    expected = preprocesser.transform(images).copy()
+    assert len(preprocesser.optimize()) == 3
+    assert [step.to_dict() for step in preprocesser.steps] == [
+        image.Resize([8, 8]).to_dict(),
+        image.SubtractValue(127.5).to_dict(),
+        image.DivideValue(63.75).to_dict()
+    ]
+    np.testing.assert_allclose(preprocesser.transform(images), expected, rtol=1e-5)
+
+    text = aisquared.config.preprocessing.text
+    preprocesser = text.TextPreprocesser([
+        text.Trim(),
+        text.Trim(),
+        text.ConvertToCase(False),
+        text.ConvertToCase(True),
+        text.RemoveCharacters(True, False),
+        text.RemoveCharacters(False, True),
+        text.RemoveCharacters(False, False),
+        text.Tokenize()
+    ])
+    config = aisquared.config.ModelConfiguration(
+        'Optimized',
+        aisquared.config.harvesting.InputHarvester('text'),
+        preprocesser,
+        aisquared.config.analytic.DeployedAnalytic(
+            'https://example.com', 'POST', 'text', body={})
+    )
+    assert len(config.optimize()) == 4
+    assert [step['className'] for step in config.to_dict()['params']['preprocessingSteps'][0]['steps']] == [
+        'Trim', 'ConvertToCase', 'RemoveCharacters', 'Tokenize']
+
+
+def test_tabular_sparse_transform():
+    tabular = aisquared.config.preprocessing.tabular
+    categories = [f'category{i}' for i in range(1000)]
+    preprocesser = tabular.TabularPreprocesser([
+        tabular.ZScore([0.5, 0.5], [0.2, 0.2], [0, 2]),
+        tabular.OneHot(1, categories),
+        tabular.MinMax([0], [2], [1]),
+        tabular.ZScore([1], [2], [2])
+    ])
+    X = np.empty((300, 3), dtype=object)
+    X[:, 0] = np.random.rand(300)
+    X[:, 1] = np.random.choice(categories[:3] + ['unknown'], 300)
+    X[:, 2] = np.random.rand(300)
+
+    output = preprocesser.transform(X, sparse=True, chunk_size=64)
+    assert output.format == 'csr'
+    assert output.shape == (300, 1002)
+    # Two numeric columns and one shifted indicator in every row, plus at most one indicator
+    assert output.nnz <= 300 * 4
+    np.testing.assert_allclose(output.toarray(), preprocesser.transform(X), rtol=1e-6)
+
+
+def test_fit():
+    rng = np.random.default_rng(0)
+    X = np.column_stack([
+        rng.normal(5, 2, 1000),
+        rng.uniform(-1, 3, 1000),
+        rng.integers(0, 4, 1000),
+        rng.normal(size=1000),
+        np.ones(1000)
+    ])
+    chunks = [X[i:i + 137] for i in range(0, 1000, 137)]
+
+    zscore = aisquared.config.preprocessing.tabular.ZScore.fit(
+        chunks, [0, 1, 4])
+    assert np.allclose(zscore.means, X[:, [0, 1, 4]].mean(axis=0))
+    assert np.allclose(zscore.stds[:2], X[:, [0, 1]].std(axis=0))
+    assert zscore.stds[2] == 1.0
+    minmax = aisquared.config.preprocessing.tabular.MinMax.fit(
+        (pd.DataFrame(chunk) for chunk in chunks))
+    assert np.allclose(minmax.mins, X.min(axis=0))
+    assert np.allclose(minmax.maxs[:4], X[:, :4].max(axis=0))
+    # Constant and empty columns are widened rather than scaled by a zero range
+    assert minmax.maxs[4] == 2.0
+    constant = np.column_stack([np.full(10, 3.0), np.full(10, np.nan)])
+    minmax = aisquared.config.preprocessing.tabular.MinMax.fit([constant])
+    assert minmax.mins == [3.0, 0.0] and minmax.maxs == [4.0, 1.0]
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        output = aisquared.config.preprocessing.tabular.TabularPreprocesser(
+            [minmax]).get_plan(2).transform(constant)
+    assert (output[:, 0] == 0).all()
+    one_hot = aisquared.config.preprocessing.tabular.OneHot.fit(
+        chunks, 2, max_values=2)
+    assert one_hot.values == pd.Series(
+        X[:, 2]).value_counts().index[:2].tolist()
+
+    preprocesser = aisquared.config.preprocessing.tabular.TabularPreprocesser.fit(
+        chunks,
+        zscore_columns=[0],
+        minmax_columns=[1],
+        one_hot_columns=[2],
+        drop_columns=[3, 4]
+    )
+    output = preprocesser.transform(X)
+    assert output.shape == (1000, 6)
+    assert np.allclose(output[:, 0], (X[:, 0] - X[:, 0].mean()) / X[:, 0].std(), atol=1e-5)
+    assert output[:, 1].min() == 0 and output[:, 1].max() == 1
+    assert (output[:, 2:].sum(axis=1) == 1).all()
+    with pytest.raises(ValueError):
+        aisquared.config.preprocessing.tabular.TabularPreprocesser.fit(
+            chunks, zscore_columns=[0], drop_columns=[0])
+    with pytest.raises(ValueError):
+        aisquared.config.preprocessing.tabular.ZScore.fit([])
+
+    parallel = aisquared.config.preprocessing.tabular.TabularPreprocesser.fit(
+        iter(chunks),
+        zscore_columns=[0],
+        minmax_columns=[1],
+        one_hot_columns=[2],
+        drop_columns=[3, 4],
+        workers=2
+    )
+    assert np.allclose(parallel.transform(X), output)
+
+    documents = ['The cat sat', 'the dog sat', 'the end']
+    vocabulary = aisquared.config.preprocessing.text.ConvertToVocabulary.fit(
+        [documents[:2], documents[2:]],
+        steps=[
+            aisquared.config.preprocessing.text.ConvertToCase(),
+            aisquared.config.preprocessing.text.Tokenize()
+        ],
+        max_vocab=5
+    )
+    assert vocabulary.vocabulary == {'the': 3, 'sat': 4, 'cat': 5}
+    assert vocabulary.max_vocab == 5
+    preprocesser = aisquared.config.preprocessing.text.TextPreprocesser.fit(
+        [documents], length=4, binary=True)
+    assert isinstance(preprocesser.steps[-1],
+                      aisquared.config.preprocessing.text.PadSequences)
+    assert len(preprocesser.steps[-2].vocabulary) == 6
@@ -0,0 +1,313 @@
+import os
+import json
+import time
+import pytest
+import tempfile
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+serving = pytest.importorskip('aisquared.serving')
+
+
+class _SumModel:
+    """
+    Stand-in model recording the size of each batch it predicts on
+    """
+
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.batch_sizes = []
+
+    def predict(self, inputs):
+        self.batch_sizes.append(len(inputs))
+        time.sleep(self.delay)
+        return np.asarray(inputs).sum(axis=1, keepdims=True)
+
+
+def test_get_predict_function():
+    class Model(_SumModel):
+        def predict_on_batch(self, inputs):
+            return np.zeros((len(inputs), 1))
+
+    # predict_on_batch is only used on batches gathered by a MicroBatcher
+    model = Model()
+    assert serving.get_predict_function(model, 'keras')([[1, 2]]).tolist() == [[3]]
+    assert serving.get_predict_function(model, 'keras', batched=True)([[1, 2]]).tolist() == [[0]]
+
+
+def test_micro_batcher():
+    model = _SumModel(delay=0.01)
+    batcher = serving.MicroBatcher(
+        model.predict, max_batch_size=8, max_wait_ms=50)
+    inputs = [np.full((1 + i % 3, 2), i, dtype=float) for i in range(24)]
+    with ThreadPoolExecutor(24) as executor:
+        results = list(executor.map(batcher.predict, inputs))
+    for i, result in enumerate(results):
+        assert np.array_equal(result, np.full((1 + i % 3, 1), 2 * i))
+    assert max(model.batch_sizes) <= 8
+    assert len(model.batch_sizes) < len(inputs)
+
+    stats = batcher.stats()
+    assert stats['requests'] == 24
+    assert stats['rows'] == sum(len(i) for i in inputs)
+    assert sum(s['batches'] for s in stats['batch_sizes'].values()) == stats['batches']
+    assert stats['latency_ms']['p50'] >= stats['wait_ms']['p50']
+
+    # Requests with different shapes are never batched together, and larger requests than
+    # max_batch_size are predicted on by themselves
+    futures = [batcher.submit(np.ones((1, 3))), batcher.submit(np.ones((1, 2))),
+               batcher.submit(np.ones((20, 2)))]
+    assert [f.result().shape for f in futures] == [(1, 1), (1, 1), (20, 1)]
+
+    def fail(inputs):
+        raise RuntimeError('failed')
+    failing = serving.MicroBatcher(fail)
+    with pytest.raises(RuntimeError):
+        failing.predict(np.ones((1, 2)))
+    failing.close()
+    batcher.close()
+    with pytest.raises(RuntimeError):
+        batcher.submit(np.ones((1, 2)))
+
+
+def test_create_app(tmp_path):
+    pytest.importorskip('flask')
+    functions_file = os.path.join(tmp_path, 'functions.py')
+    with open(functions_file, 'w') as f:
+        f.write('def postprocess(predictions):\n    return [p[0] for p in predictions]\n')
+    preprocess, postprocess = serving.load_additional_functions(functions_file)
+    assert preprocess is None
+
+    model = _SumModel(delay=0.01)
+    app = serving.create_app(model, 'sklearn', preprocess, postprocess,
+                             max_batch_size=16, max_wait_ms=20)
+    client = app.test_client()
+
+    def predict(i):
+        response = client.post('/predict', json={'data': [[i, 1], [i, 2]]})
+        return json.loads(response.data)['predictions']
+
+    with ThreadPoolExecutor(16) as executor:
+        results = list(executor.map(predict, range(16)))
+    assert results == [[i + 1, i + 2] for i in range(16)]
+    assert len(model.batch_sizes) < 16
+    assert json.loads(client.get('/stats').data)['requests'] == 16
+    assert client.post('/predict', json={'other': 1}).status_code == 400
+
+    # Without batching, each request is predicted on separately
+    app = serving.create_app(_SumModel(), 'sklearn')
+    response = app.test_client().post('/predict', json={'data': [[1, 2]]})
+    assert json.loads(response.data)['predictions'] == [[3]]
+    assert app.test_client().get('/stats').status_code == 404
+
+
+def _serve_asgi(app):
+    uvicorn = pytest.importorskip('uvicorn')
+    server = uvicorn.Server(uvicorn.Config(
+        app, host='127.0.0.1', port=0, log_level='warning'))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, thread, f'http://127.0.0.1:{port}'
+
+
+def test_create_asgi_app():
+    pytest.importorskip('starlette')
+    requests = pytest.importorskip('requests')
+
+    model = _SumModel(delay=0.01)
+    app = serving.create_asgi_app(
+        model, 'sklearn', max_batch_size=16, max_wait_ms=20, max_concurrency=2)
+    server, thread, url = _serve_asgi(app)
+    try:
+        def predict(i):
+            response = requests.post(
+                f'{url}/predict', json={'data': [[i, 1], [i, 2]]})
+            return response.json()['predictions']
+
+        with ThreadPoolExecutor(16) as executor:
+            results = list(executor.map(predict, range(16)))
+        assert results == [[[i + 1], [i + 2]] for i in range(16)]
+        assert len(model.batch_sizes) < 16
+        assert requests.get(f'{url}/stats').json()['requests'] == 16
+        response = requests.post(f'{url}/predict', data=b'not json')
+        assert response.status_code == 400
+        assert response.text == 'Data appears to be incorrectly formatted'
+    finally:
+        server.should_exit = True
+        thread.join()
+
+    # Requests beyond max_pending are rejected, and requests past the timeout are abandoned
+    app = serving.create_asgi_app(
+        _SumModel(delay=0.5), 'sklearn', max_pending=1, timeout=0.2)
+    server, thread, url = _serve_asgi(app)
+    try:
+        with ThreadPoolExecutor(2) as executor:
+            statuses = sorted(executor.map(lambda _: requests.post(
+                f'{url}/predict', json={'data': [[1, 2]]}).status_code, range(2)))
+        assert statuses == [503, 504]
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+def test_worker_pool(tmp_path, monkeypatch):
+    requests = pytest.importorskip('requests')
+    mlflow_sklearn = pytest.importorskip('mlflow.sklearn')
+    linear_model = pytest.importorskip('sklearn.linear_model')
+
+    model = linear_model.LinearRegression().fit(
+        np.random.rand(20, 3), np.random.rand(20))
+    saved_model = os.path.join(tmp_path, 'model')
+    mlflow_sklearn.save_model(model, saved_model)
+    functions_file = os.path.join(tmp_path, 'functions.py')
+    with open(functions_file, 'w') as f:
+        f.write('import os\nimport time\n\n\ndef preprocess(data):\n    time.sleep(0.05)\n'
+                '    return data\n\n\ndef postprocess(predictions):\n'
+                '    return [os.getpid(), predictions]\n')
+
+    # Weights of shared models are memory-mapped
+    path = serving.export_shared_model(model, 'sklearn', tmp_path)
+    assert isinstance(serving.load_shared_model(
+        path, 'sklearn').coef_, np.memmap)
+
+    # Shared model files are deleted when the pool is closed, or when it fails to start
+    temp_dir = os.path.join(tmp_path, 'temp')
+    os.mkdir(temp_dir)
+    monkeypatch.setattr(tempfile, 'tempdir', temp_dir)
+    with pytest.raises(Exception):
+        serving.WorkerPool(os.path.join(tmp_path, 'missing'), 'sklearn', 2, port=0)
+    assert os.listdir(temp_dir) == []
+
+    with serving.WorkerPool(saved_model, 'sklearn', 2, port=0,
+                            additional_functions_file=functions_file) as pool:
+        assert len(os.listdir(temp_dir)) == 1
+        url = f'http://127.0.0.1:{pool.port}/predict'
+        for _ in range(600):
+            try:
+                requests.post(url, json={'data': [[1, 2, 3]]})
+                break
+            except requests.ConnectionError:
+                time.sleep(0.1)
+
+        def predict(_):
+            return requests.post(url, json={'data': [[1, 2, 3]]}).json()['predictions']
+        with ThreadPoolExecutor(16) as executor:
+            results = list(executor.map(predict, range(48)))
+        assert set([pid for pid, _ in results]) == set(
+            [p.pid for p in pool.processes])
+        assert np.allclose([p for _, p in results], model.predict([[1, 2, 3]]))
+    assert not any([p.is_alive() for p in pool.processes])
+    assert os.listdir(temp_dir) == []
+
+    with pytest.raises(ValueError):
+        serving.WorkerPool(saved_model, 'sklearn', 0)
+
+
+def test_npy_wire_format():
+    array = np.arange(24, dtype='>f4').reshape(2, 3, 4)
+    data = serving.to_npy(array)
+    result = serving.from_npy(data)
+    assert np.array_equal(result, array) and result.dtype == array.dtype
+    assert not result.flags.owndata
+    assert np.array_equal(serving.from_npy(
+        serving.to_npy(np.asfortranarray(array))), array)
+    for invalid in [b'not npy', data[:-1]]:
+        with pytest.raises(ValueError):
+            serving.from_npy(invalid)
+    with pytest.raises(ValueError):
+        serving.to_npy(np.array([{}, 1], dtype=object))
+
+    app = serving.create_app(_SumModel(), 'sklearn')
+    client = app.test_client()
+    response = client.post('/predict', data=serving.to_npy(np.ones((3, 2))),
+                           content_type=serving.NPY_CONTENT_TYPE,
+                           headers={'Accept': serving.NPY_CONTENT_TYPE})
+    assert response.content_type == serving.NPY_CONTENT_TYPE
+    assert np.array_equal(serving.from_npy(response.data), np.full((3, 1), 2.0))
+
+    # JSON remains the default for requests and responses
+    response = client.post('/predict', data=serving.to_npy(np.ones((1, 2))),
+                           content_type=serving.NPY_CONTENT_TYPE)
+    assert json.loads(response.data)['predictions'] == [[2.0]]
+    response = client.post('/predict', data=b'not npy',
+                           content_type=serving.NPY_CONTENT_TYPE)
+    assert response.status_code == 400
+
+
+def test_get_remote_prediction_binary():
+    pytest.importorskip('starlette')
+    app = serving.create_asgi_app(_SumModel(), 'sklearn')
+    server, thread, url = _serve_asgi(app)
+    port = int(url.rsplit(':', 1)[1])
+    try:
+        data = np.random.rand(5, 3)
+        predictions = serving.get_remote_prediction(
+            data, port=port, binary=True)
+        assert isinstance(predictions, np.ndarray)
+        assert np.allclose(predictions, data.sum(axis=1, keepdims=True))
+        assert np.allclose(serving.get_remote_prediction(
+            data, port=port), predictions)
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+def test_model_registry(tmp_path):
+    pytest.importorskip('flask')
+    waitress = pytest.importorskip('waitress')
+
+    # Functions files with the same name in different directories are kept apart
+    models = {}
+    for name, offset in [('first', 10), ('second', 20), ('third', 30)]:
+        directory = os.path.join(tmp_path, name)
+        os.mkdir(directory)
+        functions_file = os.path.join(directory, 'functions.py')
+        with open(functions_file, 'w') as f:
+            f.write(
+                f'def postprocess(predictions):\n    return [p[0] + {offset} for p in predictions]\n')
+        models[name] = {'saved_model': name, 'model_type': 'sklearn',
+                        'additional_functions_file': functions_file}
+
+    loads = []
+
+    def loader(saved_model, model_type, custom_objects):
+        loads.append(saved_model)
+        time.sleep(0.05)
+        return _SumModel()
+
+    registry = serving.ModelRegistry(models, max_loaded=2, loader=loader)
+    with ThreadPoolExecutor(4) as executor:
+        list(executor.map(registry.get, ['first'] * 4))
+    assert loads == ['first']
+    registry.get('second')
+    registry.get('first')
+    registry.get('third')
+    assert registry.loaded == ['first', 'third']
+    assert loads == ['first', 'second', 'third']
+    with pytest.raises(KeyError):
+        registry.get('missing')
+    for invalid in [{'a/b': {'saved_model': 'a', 'model_type': 'sklearn'}},
+                    {'a': {'saved_model': 'a', 'model_type': 'other'}},
+                    {'a': {'saved_model': 'a', 'model_type': 'sklearn', 'other': 1}}]:
+        with pytest.raises(ValueError):
+            serving.ModelRegistry(invalid)
+
+    server = waitress.create_server(
+        serving.create_router_app(registry), host='127.0.0.1', port=0)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    try:
+        port = server.effective_port
+        assert serving.get_remote_prediction(
+            [[1, 2]], port=port, model='second') == [23.0]
+        assert serving.get_remote_prediction(
+            [[1, 2]], port=port, model='first') == [13.0]
+        assert registry.loaded == ['second', 'first']
+        assert serving.get_remote_prediction(
+            [[1, 2]], port=port, model='missing').status_code == 404
+    finally:
+        server.close()